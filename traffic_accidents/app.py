@@ -1,63 +1,84 @@
+import os
 from flask import Flask
 from flask_smorest import Api
 from flask_jwt_extended import JWTManager
-from db import db
+from db import db, configure_database
 from flask_cors import CORS
-from datetime import datetime, timedelta
+from werkzeug.middleware.proxy_fix import ProxyFix
+from datetime import datetime
 from blocklist import blocklist
 # Import Models
 from models import user
 from models.user import User 
 from models.accident import Accident
+from models.incident import Incident
 from models.comment import Comment
+from models.comment_vote import CommentVote
 from models.route import Route
+from models.accident_change import AccidentChange
+from models.accident_rollup import AccidentRollup
+from models.heatmap_cell import HeatmapCell
+from models.revoked_token import RevokedToken
+from models.points import PointsLedger, PointsDaily
+from models.outbox_email import OutboxEmail
+from models.checkin import CheckIn, CheckInSummary
 
 # Import Blueprints
 from resources.auth import blp as AuthBlueprint
 from resources.accident import blp as AccidentBlueprint
+from resources.incident import blp as IncidentBlueprint
 from resources.comment import blp as CommentBlueprint
 from resources.user import blp as UserBlueprint
 from resources.navigation import blp as NavBlueprint
-def create_app():
+from resources.analytics import blp as AnalyticsBlueprint
+from utils.user_cache import get_user_snapshot
+from commands import register_commands, init_database
+from config import config_by_name
+from utils import background, event_broker, passwords, query_plans  # query_plans registers the full-scan check
+from utils.mailer import outbox
+from utils.checkins import checkin_buffer
+from utils.rate_limit import add_rate_limit_headers
+# Under gunicorn the on_starting and post_fork hooks (gunicorn.conf.py) set up the
+# schema once and start the workers' threads after forking, whatever the profile
+SERVER_MANAGED = {"INIT_DB_ON_START": False, "START_BACKGROUND_ON_CREATE": False}
+
+def create_app(config_name=None, overrides=None):
+    """Builds the app for the "development", "testing" or "production" profile (default: $APP_ENV).
+
+    `overrides` are applied on top of the profile, e.g. SERVER_MANAGED.
+    """
+    config_name = config_name or os.environ.get("APP_ENV", "development")
     app = Flask(__name__)
-    CORS(app)
-
-    app.config.update({
-    "API_TITLE": "Traffic Accident API",
-    "API_VERSION": "v1",
-    "OPENAPI_VERSION": "3.0.3",
-    "OPENAPI_URL_PREFIX": "/",
-    "OPENAPI_SWAGGER_UI_PATH": "/swagger-ui",
-    "OPENAPI_SWAGGER_UI_URL": "https://cdn.jsdelivr.net/npm/swagger-ui-dist/",
-    "SQLALCHEMY_DATABASE_URI": "sqlite:///data.db",
-    "SQLALCHEMY_TRACK_MODIFICATIONS": False,
-    "JWT_SECRET_KEY": "super-secret-key", # Change this in production!
-    "MAIL_SERVER": "smtp.gmail.com",
-    "MAIL_PORT": 587,
-    "MAIL_USE_TLS": True,
-    "MAIL_USERNAME": "jaouher.chouchane0@gmail.com",
-    "MAIL_PASSWORD": "gmdxvrizbueipbes",
-    
-    # --- ADD THESE NEW JWT CONFIGS ---
-    "JWT_ACCESS_TOKEN_EXPIRES": timedelta(minutes=15),
-    "JWT_REFRESH_TOKEN_EXPIRES": timedelta(days=30),
-    "JWT_BLACKLIST_ENABLED": True,
-    "JWT_BLACKLIST_TOKEN_CHECKS": ["access", "refresh"],
-})
+    CORS(app, expose_headers=[
+        "X-Next-Cursor", "X-Next-Start", "X-Changes-Token", "X-Heatmap-Grid", "ETag",
+        "Retry-After", "X-RateLimit-Limit", "X-RateLimit-Remaining", "X-RateLimit-Reset",
+    ])
 
+    app.config.from_object(config_by_name[config_name])
+    app.config.update(overrides or {})
+    if config_name == "production" and app.config["JWT_SECRET_KEY"] == "super-secret-key":
+        raise RuntimeError("Set JWT_SECRET_KEY before running the production profile.")
+
+    if app.config["PROXY_COUNT"]:
+        # Rate limits key on the client address, not the proxy's
+        count = app.config["PROXY_COUNT"]
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=count, x_proto=count)
+    app.after_request(add_rate_limit_headers)
+
+    configure_database(app)
     db.init_app(app)
     jwt = JWTManager(app)
     api = Api(app)
     # --- BLOCKLIST CHECK ---
     @jwt.token_in_blocklist_loader
     def check_if_token_in_blocklist(jwt_header, jwt_payload):
-        return jwt_payload["jti"] in blocklist
+        return blocklist.is_revoked(jwt_payload["jti"])
     @jwt.revoked_token_loader
     def revoked_token_callback(jwt_header, jwt_payload):
         return {"message": "The token has been revoked.", "error": "token_revoked"}, 401
     @jwt.additional_claims_loader
     def add_claims_to_jwt(identity):
-        user = User.query.get(identity)
+        user = get_user_snapshot(identity)
         if user and user.role == "admin":
             return {"is_admin": True, "role": "admin"}
         if user and user.role == "officer":
@@ -67,8 +88,9 @@ def create_app():
     # --- BAN SECURITY CHECK ---
     @jwt.user_lookup_loader
     def user_lookup_callback(_jwt_header, jwt_data):
+        # Cached (role, status, banned_until); handlers load the full row themselves if needed
         identity = jwt_data["sub"]
-        user = User.query.get(identity)
+        user = get_user_snapshot(identity)
     
         if user and user.banned_until:
             # ONLY block them if the ban time is still in the FUTURE
@@ -79,12 +101,21 @@ def create_app():
     # Register Blueprints
     api.register_blueprint(AuthBlueprint)
     api.register_blueprint(AccidentBlueprint)
+    api.register_blueprint(IncidentBlueprint)
     api.register_blueprint(CommentBlueprint)
     api.register_blueprint(UserBlueprint)
     api.register_blueprint(NavBlueprint)
+    api.register_blueprint(AnalyticsBlueprint)
+    # AccidentMarker (GET /accidents?view=marker) reaches the spec through IncidentDetail.reports
+
+    register_commands(app)
 
-    with app.app_context():
-        db.create_all()
+    if app.config["INIT_DB_ON_START"]:
+        with app.app_context():
+            init_database()
+
+    if app.config["START_BACKGROUND_ON_CREATE"]:
+        start_background(app)
 
     @app.route('/')
     def home():
@@ -92,7 +123,26 @@ def create_app():
     
     return app
 
+
+def start_background(app):
+    """Starts per-process workers. Call after forking, never in a preloading master."""
+    # Picks up mail queued before a restart and retries failed sends
+    outbox.start(app)
+    event_broker.get_broker(app).start(app)
+    checkin_buffer.start(app)
+
+
+def shutdown_background():
+    """Lets queued photo jobs, buffered check-ins and the current outbox batch finish before the process exits."""
+    # Open event streams would otherwise hold the worker until graceful_timeout
+    event_broker.shutdown()
+    checkin_buffer.stop()
+    background.shutdown(wait=True)
+    outbox.stop()
+    passwords.shutdown()
+
+
 if __name__ == "__main__":
     app = create_app()
-    # 0.0.0.0 tells Flask to listen to all network interfaces
-    app.run(debug=True, host="0.0.0.0", port=5000)
\ No newline at end of file
+    # Development server only; production runs gunicorn (see gunicorn.conf.py)
+    app.run(debug=app.debug, host="0.0.0.0", port=5000)
\ No newline at end of file
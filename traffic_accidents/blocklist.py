@@ -1,7 +1,81 @@
+import threading
+import time
+from datetime import datetime, timezone
+from flask import current_app
 from flask_jwt_extended import get_jwt
 from flask_smorest import abort
 from functools import wraps
-blocklist = set()
+from sqlalchemy import delete, insert, select
+from sqlalchemy.exc import IntegrityError
+from db import db
+from models.revoked_token import RevokedToken
+from utils.log_tail import settled
+
+
+class RevocationStore:
+    """Revoked JTIs shared through the database, checked from a per-process cache.
+
+    Every worker keeps the unexpired revoked JTIs in memory and pulls new rows
+    at most every JWT_REVOCATION_SYNC_SECONDS, so the per-request check is a
+    dict lookup. A revocation made by another worker is therefore honoured
+    within that interval; one made by this worker applies immediately.
+    Expired rows are purged from the table every JWT_REVOCATION_PURGE_SECONDS.
+    """
+
+    def __init__(self):
+        self._revoked = {}  # jti -> expires_at (naive UTC)
+        self._last_id = 0
+        self._last_sync = 0.0
+        self._last_purge = 0.0
+        self._lock = threading.Lock()
+
+    def revoke(self, jti, exp):
+        """Persists a revocation; `exp` is the token's exp claim (epoch seconds)."""
+        expires_at = datetime.fromtimestamp(exp, timezone.utc).replace(tzinfo=None)
+        try:
+            with db.engine.begin() as conn:
+                conn.execute(insert(RevokedToken).values(jti=jti, expires_at=expires_at, revoked_at=datetime.utcnow()))
+        except IntegrityError:
+            pass  # already revoked
+        with self._lock:
+            self._revoked[jti] = expires_at
+
+    def is_revoked(self, jti):
+        self._sync()
+        return jti in self._revoked
+
+    def _sync(self):
+        config = current_app.config
+        now = time.monotonic()
+        if now - self._last_sync < config.get("JWT_REVOCATION_SYNC_SECONDS", 2):
+            return
+        with self._lock:
+            if now - self._last_sync < config.get("JWT_REVOCATION_SYNC_SECONDS", 2):
+                return
+            utcnow = datetime.utcnow()
+            with db.engine.begin() as conn:
+                rows = conn.execute(
+                    select(RevokedToken.id, RevokedToken.jti, RevokedToken.expires_at, RevokedToken.revoked_at)
+                    .where(RevokedToken.id > self._last_id)
+                    .order_by(RevokedToken.id)
+                ).all()
+                if now - self._last_purge >= config.get("JWT_REVOCATION_PURGE_SECONDS", 300):
+                    conn.execute(delete(RevokedToken).where(RevokedToken.expires_at < utcnow))
+                    self._last_purge = now
+            for _, jti, expires_at, _ in rows:
+                self._revoked[jti] = expires_at
+            # Everything read counts, but the next sync reads again from the first
+            # id that may still be committing (utils/log_tail.py)
+            count = settled([(row.id, row.revoked_at) for row in rows], self._last_id)
+            if count:
+                self._last_id = rows[count - 1].id
+            # Expired tokens are rejected by the JWT layer anyway, so forget them
+            self._revoked = {jti: exp for jti, exp in self._revoked.items() if exp >= utcnow}
+            self._last_sync = now
+
+
+blocklist = RevocationStore()
+
 def admin_required(fn):
     @wraps(fn)
     def wrapper(*args, **kwargs):
@@ -9,4 +83,4 @@ def admin_required(fn):
         if jwt_data.get("role") != "admin":
             abort(403, message="Admin area. Access denied.")
         return fn(*args, **kwargs)
-    return wrapper
\ No newline at end of file
+    return wrapper
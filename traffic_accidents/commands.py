@@ -0,0 +1,101 @@
+import click
+from datetime import datetime, timedelta
+from sqlalchemy import func
+import migrations
+from db import db
+from models.accident import backfill_geohashes
+from models.accident_change import AccidentChange
+from utils.analytics import rebuild_rollups, ensure_rollups
+from utils.heatmap import rebuild_heatmap, ensure_heatmap
+from utils.gamification import backfill_badge_masks
+from utils.mailer import outbox
+from utils.checkins import compact_checkins
+from utils.ingest import ingest_accidents, INGEST_FORMATS
+from models.user import User
+
+
+def init_database():
+    """Applies pending migrations and fills derived tables. Needs an app context."""
+    applied = migrations.upgrade()
+    backfill_geohashes()
+    ensure_rollups()
+    ensure_heatmap()
+    backfill_badge_masks()
+    return applied
+
+
+def register_commands(app):
+
+    @app.cli.command("init-db")
+    def init_db_command():
+        """Creates or upgrades the database schema. Run once per deploy."""
+        for version in init_database():
+            click.echo(f"Applied migration {version:04d}.")
+        click.echo("Database ready.")
+
+    @app.cli.command("db-status")
+    def db_status_command():
+        """Lists applied and pending migrations."""
+        applied = migrations.applied_versions()
+        for module in migrations.available():
+            state = "applied" if module.VERSION in applied else "pending"
+            click.echo(f"{module.VERSION:04d} {state:8} {module.DESCRIPTION}")
+
+    @app.cli.command("prune-changes")
+    @click.option("--days", default=7, show_default=True, help="Keep this many days of change history.")
+    def prune_changes(days):
+        """Drops old entries from the accident change log."""
+        cutoff = datetime.utcnow() - timedelta(days=days)
+        # Always keep the newest entry so issued tokens stay comparable
+        newest = db.session.query(func.max(AccidentChange.seq)).scalar() or 0
+        deleted = AccidentChange.query.filter(
+            AccidentChange.created_at < cutoff,
+            AccidentChange.seq < newest
+        ).delete(synchronize_session=False)
+        db.session.commit()
+        click.echo(f"Pruned {deleted} change log entries.")
+
+    @app.cli.command("compact-checkins")
+    @click.option("--days", type=int, help="Keep this many days of check-ins (default: CHECKIN_RETENTION_DAYS).")
+    def compact_checkins_command(days):
+        """Folds old check-ins into per-location daily summaries."""
+        if days is None:
+            days = app.config.get("CHECKIN_RETENTION_DAYS", 90)
+        compacted, day_count = compact_checkins(days)
+        click.echo(f"Compacted {compacted} check-ins from {day_count} days.")
+
+    @app.cli.command("rebuild-rollups")
+    def rebuild_rollups_command():
+        """Recomputes the analytics rollups from the accidents table."""
+        rows = rebuild_rollups()
+        click.echo(f"Rebuilt {rows} rollup rows.")
+
+    @app.cli.command("rebuild-heatmap")
+    def rebuild_heatmap_command():
+        """Recomputes the precomputed heatmap tiles from the accidents table."""
+        cells = rebuild_heatmap()
+        click.echo(f"Rebuilt {cells} heatmap cells.")
+
+    @app.cli.command("send-outbox")
+    def send_outbox_command():
+        """Sends every queued email that is due, then exits."""
+        sent = outbox.drain()
+        click.echo(f"Sent {sent} emails.")
+
+    @app.cli.command("ingest-accidents")
+    @click.argument("path", type=click.Path(exists=True, dir_okay=False))
+    @click.option("--format", "fmt", type=click.Choice(INGEST_FORMATS), help="Defaults from the file extension.")
+    @click.option("--as", "username", required=True, help="Officer or admin account the rows are verified by.")
+    def ingest_accidents_command(path, fmt, username):
+        """Loads an official NDJSON or CSV accident feed."""
+        user = User.query.filter_by(username=username).first()
+        if user is None or user.role not in ("officer", "admin"):
+            raise click.BadParameter("must name an officer or admin account.", param_hint="--as")
+        fmt = fmt or ("csv" if path.lower().endswith(".csv") else "ndjson")
+        with open(path, "rb") as stream:
+            report = ingest_accidents(stream, fmt, user.id)
+        for error in report["errors"]:
+            click.echo(f"line {error['line']}: {error['errors']}", err=True)
+        if report["errors_truncated"]:
+            click.echo("(more errors not shown)", err=True)
+        click.echo(f"Inserted {report['inserted']} accidents, {report['failed']} rows failed.")
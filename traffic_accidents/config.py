@@ -0,0 +1,160 @@
+import os
+from datetime import timedelta
+
+
+def env_int(name, default):
+    value = os.environ.get(name)
+    return int(value) if value not in (None, "") else default
+
+
+def env_bool(name, default):
+    value = os.environ.get(name)
+    if value in (None, ""):
+        return default
+    return value.lower() in ("1", "true", "yes", "on")
+
+
+class Config:
+    """Settings shared by every profile. Anything deployment-specific is read from the environment."""
+    API_TITLE = "Traffic Accident API"
+    API_VERSION = "v1"
+    OPENAPI_VERSION = "3.0.3"
+    OPENAPI_URL_PREFIX = "/"
+    OPENAPI_SWAGGER_UI_PATH = "/swagger-ui"
+    OPENAPI_SWAGGER_UI_URL = "https://cdn.jsdelivr.net/npm/swagger-ui-dist/"
+
+    SQLALCHEMY_DATABASE_URI = os.environ.get("DATABASE_URL", "sqlite:///data.db")
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Optional read-only engine (e.g. a PostgreSQL replica) used while serving GET requests
+    DATABASE_READ_URL = os.environ.get("DATABASE_READ_URL")
+    # Engine tuning, see db.configure_database
+    DB_POOL_SIZE = env_int("DB_POOL_SIZE", 5)
+    DB_MAX_OVERFLOW = env_int("DB_MAX_OVERFLOW", 10)
+    DB_POOL_RECYCLE_SECONDS = 1800
+    SQLITE_BUSY_TIMEOUT_MS = env_int("SQLITE_BUSY_TIMEOUT_MS", 5000)
+    # Create/upgrade the schema inside create_app. Production runs `flask init-db`
+    # (or the gunicorn on_starting hook) once instead of in every worker.
+    INIT_DB_ON_START = True
+    # Start the outbox sender thread inside create_app. Under gunicorn the
+    # post_fork hook starts it in each worker instead.
+    # wsgi.py turns both off under gunicorn, whatever the profile (app.SERVER_MANAGED).
+    START_BACKGROUND_ON_CREATE = True
+
+    JWT_SECRET_KEY = os.environ.get("JWT_SECRET_KEY", "super-secret-key")
+    JWT_ACCESS_TOKEN_EXPIRES = timedelta(minutes=15)
+    JWT_REFRESH_TOKEN_EXPIRES = timedelta(days=30)
+    JWT_BLACKLIST_ENABLED = True
+    JWT_BLACKLIST_TOKEN_CHECKS = ["access", "refresh"]
+    # Revocations made by other workers are picked up within this many seconds
+    JWT_REVOCATION_SYNC_SECONDS = 2
+    JWT_REVOCATION_PURGE_SECONDS = 300
+    # Readers of the change log and the revocation table wait this long for an
+    # id gap to fill in before stepping over it (see utils/log_tail.py)
+    LOG_SETTLE_SECONDS = 5
+    # How long the JWT loaders may trust a cached role / ban status
+    USER_CACHE_TTL_SECONDS = 30
+
+    # Outgoing mail; credentials come from the environment, never the source
+    MAIL_SERVER = os.environ.get("MAIL_SERVER", "smtp.gmail.com")
+    MAIL_PORT = env_int("MAIL_PORT", 587)
+    MAIL_USE_TLS = env_bool("MAIL_USE_TLS", True)
+    MAIL_USERNAME = os.environ.get("MAIL_USERNAME")
+    MAIL_PASSWORD = os.environ.get("MAIL_PASSWORD")
+    MAIL_DEFAULT_SENDER = os.environ.get("MAIL_DEFAULT_SENDER")
+    MAIL_ADMIN_ADDRESS = os.environ.get("MAIL_ADMIN_ADDRESS")
+    # Outbox sender: batch size, idle poll and retry backoff (seconds)
+    MAIL_BATCH_SIZE = 50
+    MAIL_POLL_SECONDS = 30
+    MAIL_RETRY_BASE_SECONDS = 30
+    MAIL_RETRY_MAX_SECONDS = 3600
+    MAIL_MAX_ATTEMPTS = 8
+
+    # Uploads: whole request cap, per-photo cap and thumbnail edge in px
+    MAX_CONTENT_LENGTH = 10 * 1024 * 1024
+    MAX_PHOTO_BYTES = env_int("MAX_PHOTO_BYTES", 8 * 1024 * 1024)
+    PHOTO_THUMB_SIZE = 320
+    BACKGROUND_WORKERS = env_int("BACKGROUND_WORKERS", 4)
+
+    # Bulk feeds (POST /accidents/bulk, flask ingest-accidents): body cap, rows
+    # per transaction and how many row errors the report lists
+    INGEST_MAX_BYTES = env_int("INGEST_MAX_BYTES", 200 * 1024 * 1024)
+    INGEST_CHUNK_SIZE = 1000
+    INGEST_MAX_ERRORS = 1000
+
+    # New reports within this distance of an unverified incident reported in the
+    # last INCIDENT_WINDOW_MINUTES join it instead of standing alone
+    INCIDENT_RADIUS_M = env_int("INCIDENT_RADIUS_M", 75)
+    INCIDENT_WINDOW_MINUTES = env_int("INCIDENT_WINDOW_MINUTES", 30)
+    # Check-ins are buffered per process and written when CHECKIN_BUFFER_SIZE are
+    # waiting or every CHECKIN_FLUSH_SECONDS; past CHECKIN_BUFFER_MAX (writes
+    # failing) new ones get a 503. `flask compact-checkins` folds those older
+    # than CHECKIN_RETENTION_DAYS into per-location daily summaries.
+    CHECKIN_POINTS = 2
+    CHECKIN_BUFFER_SIZE = env_int("CHECKIN_BUFFER_SIZE", 500)
+    CHECKIN_FLUSH_SECONDS = env_int("CHECKIN_FLUSH_SECONDS", 2)
+    CHECKIN_BUFFER_MAX = 20000
+    CHECKIN_RETENTION_DAYS = env_int("CHECKIN_RETENTION_DAYS", 90)
+
+    # Accidents older than this no longer count as hazards on POST /navigation/hazards
+    ROUTE_HAZARD_MAX_AGE_HOURS = env_int("ROUTE_HAZARD_MAX_AGE_HOURS", 24)
+
+    # Live updates (GET /accidents/stream). "memory" only reaches streams served
+    # by the writing process; "database" tails accident_changes from every worker.
+    EVENT_BROKER = os.environ.get("EVENT_BROKER", "memory")
+    # Open streams per process. Each holds a worker thread, see gunicorn.conf.py
+    EVENT_STREAM_MAX_CLIENTS = env_int("EVENT_STREAM_MAX_CLIENTS", 16)
+    EVENT_STREAM_QUEUE_SIZE = 1000
+    EVENT_STREAM_REPLAY_LIMIT = 500
+    EVENT_STREAM_POLL_SECONDS = 1
+    EVENT_STREAM_HEARTBEAT_SECONDS = 15
+    EVENT_STREAM_RETRY_MS = 3000
+
+    # Token buckets from @rate_limit (decorators.py). "memory" limits each
+    # process on its own; a file name (under the instance folder) shares the
+    # buckets between all workers on the host.
+    RATE_LIMIT_ENABLED = env_bool("RATE_LIMIT_ENABLED", True)
+    RATE_LIMIT_STORAGE = os.environ.get("RATE_LIMIT_STORAGE", "memory")
+    # Client addresses come from X-Forwarded-For when behind this many proxies
+    PROXY_COUNT = env_int("PROXY_COUNT", 0)
+
+    # Password hashing: PBKDF2 cost (older hashes are upgraded on login) and the
+    # process pool that runs it, with how many hashes may wait for it
+    PASSWORD_PBKDF2_ROUNDS = env_int("PASSWORD_PBKDF2_ROUNDS", 29000)
+    PASSWORD_HASH_WORKERS = env_int("PASSWORD_HASH_WORKERS", 2)
+    PASSWORD_HASH_MAX_PENDING = 16
+
+    # Tables the full-scan check ignores: the rollups are a bounded summary
+    QUERY_PLAN_ALLOWED_SCANS = ["accident_rollups"]
+
+
+class DevelopmentConfig(Config):
+    DEBUG = True
+    # Log queries from request handlers that scan a whole table (utils/query_plans.py)
+    QUERY_PLAN_CHECK = True
+
+
+class TestingConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = os.environ.get("TEST_DATABASE_URL", "sqlite:///:memory:")
+    DATABASE_READ_URL = os.environ.get("TEST_DATABASE_READ_URL")
+    START_BACKGROUND_ON_CREATE = False
+    MAIL_SERVER = os.environ.get("TEST_MAIL_SERVER", "localhost")
+    MAIL_PORT = env_int("TEST_MAIL_PORT", 8025)
+    MAIL_USE_TLS = False
+    # Hashing cost doesn't matter in tests, speed does
+    PASSWORD_PBKDF2_ROUNDS = 1000
+
+
+class ProductionConfig(Config):
+    INIT_DB_ON_START = False
+    START_BACKGROUND_ON_CREATE = False
+    # Several gunicorn workers: a write must reach streams held by the others
+    EVENT_BROKER = os.environ.get("EVENT_BROKER", "database")
+    RATE_LIMIT_STORAGE = os.environ.get("RATE_LIMIT_STORAGE", "ratelimit.db")
+
+
+config_by_name = {
+    "development": DevelopmentConfig,
+    "testing": TestingConfig,
+    "production": ProductionConfig,
+}
@@ -1,3 +1,159 @@
+import sqlite3
+from flask import has_request_context, request
 from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session
+from sqlalchemy import and_, bindparam, event, insert, update
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.exc import IntegrityError
 
-db = SQLAlchemy()
+READ_BIND = "read"
+
+
+def is_read_request():
+    return has_request_context() and request.method in ("GET", "HEAD", "OPTIONS")
+
+
+class RoutingSession(Session):
+    """Sends reads made while serving GET requests to the read-only engine, if one is configured."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        engine = super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+        engines = self._db.engines
+        if bind is None and not self._flushing and READ_BIND in engines \
+                and engine is engines.get(None) and is_read_request():
+            return engines[READ_BIND]
+        return engine
+
+
+db = SQLAlchemy(session_options={"class_": RoutingSession})
+
+
+def configure_database(app):
+    """Fills in engine options for the configured backend. Call before db.init_app(app).
+
+    SQLite gets a connection pool and a busy timeout (pragmas are set per
+    connection below); PostgreSQL gets a pre-pinged, recycled pool and, with
+    DATABASE_READ_URL, a second engine whose sessions are read-only.
+    """
+    config = app.config
+    config["SQLALCHEMY_DATABASE_URI"] = normalize_url(config["SQLALCHEMY_DATABASE_URI"])
+    url = make_url(config["SQLALCHEMY_DATABASE_URI"])
+    pool_size = config.get("DB_POOL_SIZE", 5)
+    max_overflow = config.get("DB_MAX_OVERFLOW", 10)
+
+    if url.get_backend_name() == "sqlite":
+        options = {"connect_args": {"timeout": config.get("SQLITE_BUSY_TIMEOUT_MS", 5000) / 1000}}
+        if url.database not in (None, "", ":memory:"):
+            options.update(pool_size=pool_size, max_overflow=max_overflow)
+    else:
+        options = {
+            "pool_size": pool_size,
+            "max_overflow": max_overflow,
+            "pool_pre_ping": True,
+            "pool_recycle": config.get("DB_POOL_RECYCLE_SECONDS", 1800),
+        }
+    config.setdefault("SQLALCHEMY_ENGINE_OPTIONS", options)
+
+    read_url = config.get("DATABASE_READ_URL")
+    if read_url:
+        read_options = dict(options)
+        if make_url(normalize_url(read_url)).get_backend_name() == "postgresql":
+            read_options["connect_args"] = {"options": "-c default_transaction_read_only=on"}
+        binds = dict(config.get("SQLALCHEMY_BINDS") or {})
+        binds[READ_BIND] = {"url": normalize_url(read_url), **read_options}
+        config["SQLALCHEMY_BINDS"] = binds
+
+
+def normalize_url(uri):
+    """Accepts the postgres:// URLs hosting providers hand out and picks the psycopg driver."""
+    for prefix in ("postgres://", "postgresql://"):
+        if uri.startswith(prefix):
+            return "postgresql+psycopg://" + uri[len(prefix):]
+    return uri
+
+
+@event.listens_for(Engine, "connect")
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    # WAL lets readers run alongside the single writer instead of locking it out
+    # (most of our "database is locked" errors); NORMAL is durable enough with WAL
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    # busy_timeout itself comes from the connect timeout (SQLITE_BUSY_TIMEOUT_MS)
+    cursor.close()
+
+
+def increment(model, key, deltas):
+    """Adds `deltas` ({column: amount}) to the row of `model` matching `key`, creating it if missing.
+
+    Runs in the caller's transaction. The savepoint covers another writer
+    inserting the same row between our UPDATE and INSERT.
+    """
+    match = model.query.filter_by(**key)
+    changes = {getattr(model, column): getattr(model, column) + amount for column, amount in deltas.items()}
+    if match.update(changes, synchronize_session=False):
+        return
+    try:
+        with db.session.begin_nested():
+            db.session.add(model(**key, **deltas))
+    except IntegrityError:
+        match.update(changes, synchronize_session=False)
+
+
+def dialect_insert():
+    """insert() with on_conflict_* for the session's SQLite/PostgreSQL bind, or None elsewhere."""
+    dialect = db.session.get_bind().dialect.name
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as upsert
+    elif dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as upsert
+    else:
+        return None
+    return upsert
+
+
+def insert_ignore(model, values):
+    """Inserts a row unless its primary key already exists. Returns whether it was inserted."""
+    upsert = dialect_insert()
+    if upsert is None:
+        try:
+            with db.session.begin_nested():
+                db.session.execute(insert(model.__table__).values(**values))
+            return True
+        except IntegrityError:
+            return False
+    return db.session.execute(upsert(model.__table__).on_conflict_do_nothing().values(**values)).rowcount == 1
+
+
+def increment_many(model, rows, delta_columns):
+    """Bulk increment(): each row dict holds the primary key plus an amount per delta column.
+
+    Two executemany statements on SQLite/PostgreSQL: insert the missing rows
+    with zero amounts, then add the amounts to every row. Other backends fall
+    back to one increment() per row.
+    """
+    if not rows:
+        return
+    table = model.__table__
+    key_columns = [column.name for column in table.primary_key.columns]
+    upsert = dialect_insert()
+    if upsert is None:
+        for row in rows:
+            increment(model, {k: row[k] for k in key_columns}, {c: row[c] for c in delta_columns})
+        return
+
+    db.session.execute(
+        upsert(table).on_conflict_do_nothing(),
+        [{**{k: row[k] for k in key_columns}, **{c: 0 for c in delta_columns}} for row in rows]
+    )
+    db.session.execute(
+        update(table)
+        .where(and_(*[table.c[k] == bindparam(f"key_{k}") for k in key_columns]))
+        .values({c: table.c[c] + bindparam(f"delta_{c}") for c in delta_columns}),
+        [
+            {**{f"key_{k}": row[k] for k in key_columns}, **{f"delta_{c}": row[c] for c in delta_columns}}
+            for row in rows
+        ]
+    )
@@ -1,6 +1,9 @@
-from flask_jwt_extended import get_jwt, verify_jwt_in_request
+from flask import current_app, g, request
+from flask_jwt_extended import get_jwt, get_jwt_identity, verify_jwt_in_request
 from flask_smorest import abort
 from functools import wraps
+from werkzeug.exceptions import HTTPException
+from utils.rate_limit import limiter, parse_limit, limit_headers, retry_after
 
 def admin_required(fn):
     @wraps(fn)
@@ -21,4 +24,53 @@ def officer_required(fn):
         if claims.get("role") not in ["officer", "admin"]:
             abort(403, message="Officer or Admin privilege required.")
         return fn(*args, **kwargs)
-    return wrapper
\ No newline at end of file
+    return wrapper
+
+def rate_limit(limit, per="user", message=None, count_errors=True):
+    """Token bucket for the decorated endpoint, e.g. @rate_limit("10/minute", per="ip").
+
+    per="user" buckets by JWT identity (put it under @jwt_required(); requests
+    without a token fall back to their IP), per="ip" by client address. Runs
+    before the view, so a throttled request never reaches the database. With
+    count_errors=False a request that ends in a 4xx gets its token back.
+    """
+    capacity, rate = parse_limit(limit)
+
+    def decorator(fn):
+        scope = f"{fn.__module__}.{fn.__qualname__}:{limit}"
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not current_app.config.get("RATE_LIMIT_ENABLED", True):
+                return fn(*args, **kwargs)
+            identity = None
+            if per == "user":
+                try:
+                    identity = get_jwt_identity()
+                except RuntimeError:
+                    pass
+            key = f"{scope}:user:{identity}" if identity else f"{scope}:ip:{request.remote_addr}"
+
+            allowed, tokens = limiter.hit(key, capacity, rate)
+            headers = limit_headers(capacity, rate, tokens)
+            if not allowed:
+                headers["Retry-After"] = retry_after(rate, tokens)
+                abort(429, message=message or "Too many requests, please slow down.", headers=headers)
+            # Several limits on one endpoint: report the one closest to running out
+            current = g.get("rate_limit_headers")
+            if current is None or int(headers["X-RateLimit-Remaining"]) < int(current["X-RateLimit-Remaining"]):
+                g.rate_limit_headers = headers
+
+            if count_errors:
+                return fn(*args, **kwargs)
+            try:
+                response = fn(*args, **kwargs)
+            except HTTPException as e:
+                if e.code is not None and 400 <= e.code < 500:
+                    limiter.refund(key, capacity, rate)
+                    if g.rate_limit_headers is headers:
+                        g.rate_limit_headers = limit_headers(capacity, rate, min(capacity, tokens + 1))
+                raise
+            return response
+        return wrapper
+    return decorator
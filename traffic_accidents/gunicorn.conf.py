@@ -0,0 +1,47 @@
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+# Threads cover requests that wait on the database or the hashing pool, plus
+# one per open /accidents/stream connection so those never starve the rest
+worker_class = "gthread"
+threads = int(os.environ.get("GUNICORN_THREADS", 4 + int(os.environ.get("EVENT_STREAM_MAX_CLIENTS", 16))))
+# Import the app once in the master so workers fork with it already loaded
+preload_app = True
+timeout = 60
+# How long a stopping worker gets to finish requests and background jobs
+graceful_timeout = 30
+keepalive = 5
+accesslog = "-"
+errorlog = "-"
+
+
+def on_starting(server):
+    """Creates/upgrades the schema once, before the app is loaded and workers fork."""
+    from app import create_app, SERVER_MANAGED
+    from commands import init_database
+    from db import db
+
+    app = create_app(os.environ.get("APP_ENV", "production"), SERVER_MANAGED)
+    with app.app_context():
+        init_database()
+        # Don't hand pooled connections to the forked workers
+        db.engine.dispose()
+
+
+def post_fork(server, worker):
+    from app import start_background
+    from db import db
+    from wsgi import app
+
+    with app.app_context():
+        # Drop connections inherited from the master; each worker opens its own
+        db.engine.dispose(close=False)
+    start_background(app)
+
+
+def worker_exit(server, worker):
+    from app import shutdown_background
+
+    shutdown_background()
@@ -0,0 +1,114 @@
+"""Versioned schema migrations.
+
+Each module in this package named vNNNN_<what>.py defines VERSION, DESCRIPTION
+and upgrade(conn). Applied versions are recorded in the schema_version table;
+`flask init-db` (or the gunicorn on_starting hook) runs whatever is pending.
+Modules with TRANSACTIONAL = False run on an autocommit connection, which
+PostgreSQL needs for CREATE INDEX CONCURRENTLY.
+"""
+import importlib
+import logging
+import pkgutil
+from datetime import datetime
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, inspect, insert, select, text
+from sqlalchemy.schema import CreateColumn, CreateIndex
+from db import db
+
+logger = logging.getLogger(__name__)
+
+# Kept out of db.metadata so create_all never touches it
+schema_version = Table(
+    "schema_version", MetaData(),
+    Column("version", Integer, primary_key=True, autoincrement=False),
+    Column("description", String(200), nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+
+def available():
+    """All migration modules, oldest first."""
+    modules = [
+        importlib.import_module(f"{__name__}.{name}")
+        for _, name, _ in pkgutil.iter_modules(__path__)
+        if name.startswith("v")
+    ]
+    modules.sort(key=lambda module: module.VERSION)
+    versions = [module.VERSION for module in modules]
+    if len(set(versions)) != len(versions):
+        raise RuntimeError(f"Duplicate migration versions: {versions}")
+    return modules
+
+
+def applied_versions():
+    with db.engine.begin() as conn:
+        schema_version.create(conn, checkfirst=True)
+        return set(conn.execute(select(schema_version.c.version)).scalars())
+
+
+def pending():
+    done = applied_versions()
+    return [module for module in available() if module.VERSION not in done]
+
+
+def upgrade():
+    """Applies pending migrations in order. Returns the versions applied."""
+    applied = []
+    for module in pending():
+        logger.info("Applying migration %04d: %s", module.VERSION, module.DESCRIPTION)
+        if getattr(module, "TRANSACTIONAL", True):
+            with db.engine.begin() as conn:
+                module.upgrade(conn)
+                record(conn, module)
+        else:
+            with db.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+                module.upgrade(conn)
+            with db.engine.begin() as conn:
+                record(conn, module)
+        applied.append(module.VERSION)
+    return applied
+
+
+def record(conn, module):
+    conn.execute(insert(schema_version).values(
+        version=module.VERSION, description=module.DESCRIPTION, applied_at=datetime.utcnow()
+    ))
+
+
+# --- Operations for migration modules. All of them are safe to re-run. ---
+
+def add_missing_columns(conn, table):
+    """ALTER TABLE ADD COLUMN for every column of `table` the database lacks."""
+    inspector = inspect(conn)
+    if not inspector.has_table(table.name):
+        return
+    existing = {column["name"] for column in inspector.get_columns(table.name)}
+    preparer = conn.dialect.identifier_preparer
+    for column in table.columns:
+        if column.name not in existing:
+            ddl = CreateColumn(column).compile(dialect=conn.dialect)
+            conn.execute(text(f"ALTER TABLE {preparer.format_table(table)} ADD COLUMN {ddl}"))
+
+
+def create_index(conn, table, name):
+    """Builds the model index `name` on `table` if it doesn't exist yet.
+
+    On PostgreSQL with an autocommit connection the build is CONCURRENTLY, so
+    writes to a large production table aren't blocked while it runs.
+    """
+    index = next(index for index in table.indexes if index.name == name)
+    if any(existing["name"] == name for existing in inspect(conn).get_indexes(table.name)):
+        return
+    ddl = str(CreateIndex(index).compile(dialect=conn.dialect))
+    if conn.dialect.name == "postgresql" and conn.get_isolation_level() == "AUTOCOMMIT":
+        ddl = ddl.replace("CREATE INDEX", "CREATE INDEX CONCURRENTLY IF NOT EXISTS", 1)
+    conn.execute(text(ddl))
+
+
+def drop_index(conn, table_name, name):
+    """Drops index `name` from `table_name` if it exists (CONCURRENTLY on PostgreSQL, as above)."""
+    if not any(existing["name"] == name for existing in inspect(conn).get_indexes(table_name)):
+        return
+    ddl = f"DROP INDEX {conn.dialect.identifier_preparer.quote(name)}"
+    if conn.dialect.name == "postgresql" and conn.get_isolation_level() == "AUTOCOMMIT":
+        ddl = ddl.replace("DROP INDEX", "DROP INDEX CONCURRENTLY IF EXISTS", 1)
+    conn.execute(text(ddl))
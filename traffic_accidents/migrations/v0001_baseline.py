@@ -0,0 +1,161 @@
+"""The schema as it stood when migrations were introduced, frozen here.
+
+Later model changes must not leak into this module: it creates the tables as
+they were then, and each later migration adds its own tables, columns and
+indexes. Databases from before migrations get the columns and indexes the old
+startup upgrade_schema() would have added.
+"""
+from sqlalchemy import (
+    Boolean, Column, Date, DateTime, Enum, Float, ForeignKey, Index, Integer, MetaData, String, Table, Text,
+)
+from migrations import add_missing_columns, create_index
+
+VERSION = 1
+DESCRIPTION = "Baseline: create tables, add columns and indexes missing from older databases"
+
+metadata = MetaData()
+
+user = Table(
+    "user", metadata,
+    Column("id", String(36), primary_key=True),
+    Column("username", String(50), unique=True, nullable=False),
+    Column("password", String(500), nullable=False),
+    Column("full_name", String(100)),
+    Column("department", String(100)),
+    Column("role", String(20), nullable=False),
+    Column("email", String(120), unique=True),
+    Column("institution", String(200)),
+    Column("badge_number", String(100), unique=True),
+    Column("points", Integer),
+    Column("badge_mask", Integer, nullable=False, server_default="0"),
+    Column("status", Enum("PENDING", "APPROVED", "REJECTED", name="userstatus"), nullable=False),
+    Column("banned_until", DateTime),
+    Column("created_at", DateTime),
+    Index("ix_user_points_id", "points", "id"),
+)
+
+accidents = Table(
+    "accidents", metadata,
+    Column("id", String(36), primary_key=True),
+    Column("user_id", String(36), ForeignKey("user.id")),
+    Column("status", String(20), nullable=False),
+    Column("verified_by", String(36), ForeignKey("user.id")),
+    Column("latitude", Float, nullable=False),
+    Column("longitude", Float, nullable=False),
+    Column("geohash", String(12)),
+    Column("description", Text, nullable=False),
+    Column("severity", Integer, nullable=False),
+    Column("is_anonymous", Boolean),
+    Column("is_safe", Boolean),
+    Column("casualties_injured", Integer),
+    Column("casualties_dead", Integer),
+    Column("photo_url", String(255)),
+    Column("created_at", DateTime),
+    Index("ix_accidents_geohash", "geohash"),
+    Index("ix_accidents_created_at_id", "created_at", "id"),
+)
+
+comments = Table(
+    "comments", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("content", Text, nullable=False),
+    Column("created_at", DateTime),
+    Column("accident_id", String(36), ForeignKey("accidents.id"), nullable=False),
+    Column("user_id", String(36), ForeignKey("user.id"), nullable=False),
+)
+
+checkins = Table(
+    "checkins", metadata,
+    Column("id", String(36), primary_key=True),
+    Column("user_id", String(36), ForeignKey("user.id"), nullable=False),
+    Column("latitude", Float, nullable=False),
+    Column("longitude", Float, nullable=False),
+    Column("location_name", String(100)),
+    Column("created_at", DateTime),
+)
+
+routes = Table(
+    "routes", metadata,
+    Column("id", String(36), primary_key=True),
+    Column("accident_id", String(36), ForeignKey("accidents.id")),
+    Column("route_name", String(100)),
+    Column("is_closed", Boolean),
+)
+
+accident_changes = Table(
+    "accident_changes", metadata,
+    Column("seq", Integer, primary_key=True, autoincrement=True),
+    Column("accident_id", String(36), nullable=False, index=True),
+    Column("op", String(20), nullable=False),
+    Column("created_at", DateTime, index=True),
+)
+
+accident_rollups = Table(
+    "accident_rollups", metadata,
+    Column("day", Date, primary_key=True),
+    Column("hour", Integer, primary_key=True),
+    Column("severity", Integer, primary_key=True),
+    Column("status", String(20), primary_key=True),
+    Column("count", Integer, nullable=False),
+    Column("casualties_injured", Integer, nullable=False),
+    Column("casualties_dead", Integer, nullable=False),
+)
+
+heatmap_cells = Table(
+    "heatmap_cells", metadata,
+    Column("z", Integer, primary_key=True),
+    Column("tx", Integer, primary_key=True),
+    Column("ty", Integer, primary_key=True),
+    Column("cell", Integer, primary_key=True),
+    Column("weight", Float, nullable=False),
+)
+
+points_ledger = Table(
+    "points_ledger", metadata,
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("user_id", String(36), ForeignKey("user.id", ondelete="CASCADE"), nullable=False, index=True),
+    Column("delta", Integer, nullable=False),
+    Column("reason", String(100)),
+    Column("created_at", DateTime, index=True),
+)
+
+points_daily = Table(
+    "points_daily", metadata,
+    Column("user_id", String(36), ForeignKey("user.id", ondelete="CASCADE"), primary_key=True),
+    Column("day", Date, primary_key=True),
+    Column("points", Integer, nullable=False),
+    Index("ix_points_daily_day_user", "day", "user_id"),
+)
+
+revoked_tokens = Table(
+    "revoked_tokens", metadata,
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("jti", String(64), unique=True, nullable=False),
+    Column("expires_at", DateTime, nullable=False, index=True),
+    Column("revoked_at", DateTime),
+)
+
+outbox_emails = Table(
+    "outbox_emails", metadata,
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("recipient", String(120), nullable=False),
+    Column("subject", String(255), nullable=False),
+    Column("html", Text, nullable=False),
+    Column("status", String(10), nullable=False, index=True),
+    Column("attempts", Integer, nullable=False),
+    Column("next_attempt_at", DateTime, nullable=False, index=True),
+    Column("last_error", String(500)),
+    Column("created_at", DateTime),
+    Column("sent_at", DateTime),
+)
+
+
+def upgrade(conn):
+    metadata.create_all(conn)
+    for table in metadata.sorted_tables:
+        add_missing_columns(conn, table)
+
+    # Indexes that came with columns added above, on tables create_all skipped
+    create_index(conn, accidents, "ix_accidents_geohash")
+    create_index(conn, accidents, "ix_accidents_created_at_id")
+    create_index(conn, user, "ix_user_points_id")
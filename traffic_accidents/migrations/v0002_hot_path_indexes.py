@@ -0,0 +1,32 @@
+"""Indexes for the filters and sorts the handlers run on every request."""
+from sqlalchemy import Column, Index, MetaData, Table
+from migrations import create_index
+
+VERSION = 2
+DESCRIPTION = "Hot-path indexes on accidents, comments, checkins, routes and user"
+# CREATE INDEX CONCURRENTLY can't run inside a transaction
+TRANSACTIONAL = False
+
+# Just the indexed columns, as they were at this version
+metadata = MetaData()
+TABLES = [
+    Table("accidents", metadata, Column("id"), Column("user_id"), Column("status"), Column("created_at"),
+          Index("ix_accidents_user_id_created_at", "user_id", "created_at"),
+          Index("ix_accidents_status_created_at_id", "status", "created_at", "id")),
+    Table("comments", metadata, Column("accident_id"), Column("user_id"), Column("created_at"),
+          Index("ix_comments_accident_id_created_at", "accident_id", "created_at"),
+          Index("ix_comments_user_id", "user_id")),
+    Table("checkins", metadata, Column("user_id"), Column("created_at"),
+          Index("ix_checkins_created_at", "created_at"),
+          Index("ix_checkins_user_id", "user_id")),
+    Table("routes", metadata, Column("accident_id"),
+          Index("ix_routes_accident_id", "accident_id")),
+    Table("user", metadata, Column("status"),
+          Index("ix_user_status", "status")),
+]
+
+
+def upgrade(conn):
+    for table in TABLES:
+        for index in sorted(table.indexes, key=lambda index: index.name):
+            create_index(conn, table, index.name)
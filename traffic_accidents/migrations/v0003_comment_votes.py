@@ -0,0 +1,35 @@
+"""Comment votes: one row per (comment, user) and a denormalized score on comments."""
+from sqlalchemy import (
+    CheckConstraint, Column, DateTime, ForeignKey, Index, Integer, MetaData, SmallInteger, String, Table,
+)
+from migrations import add_missing_columns, create_index
+
+VERSION = 3
+DESCRIPTION = "comment_votes table, comments.score and the by-score thread index"
+# CREATE INDEX CONCURRENTLY can't run inside a transaction
+TRANSACTIONAL = False
+
+metadata = MetaData()
+Table("user", metadata, Column("id", String(36), primary_key=True))
+comments = Table(
+    "comments", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("accident_id", String(36)),
+    Column("score", Integer, nullable=False, server_default="0"),
+    Index("ix_comments_accident_id_score_id", "accident_id", "score", "id"),
+)
+comment_votes = Table(
+    "comment_votes", metadata,
+    Column("comment_id", Integer, ForeignKey("comments.id", ondelete="CASCADE"), primary_key=True),
+    Column("user_id", String(36), ForeignKey("user.id", ondelete="CASCADE"), primary_key=True, index=True),
+    Column("value", SmallInteger, nullable=False),
+    Column("created_at", DateTime),
+    CheckConstraint("value IN (-1, 1)", name="ck_comment_votes_value"),
+)
+
+
+def upgrade(conn):
+    comment_votes.create(conn, checkfirst=True)
+    # Upvotes before this had no record of who voted, so every score starts at 0
+    add_missing_columns(conn, comments)
+    create_index(conn, comments, "ix_comments_accident_id_score_id")
@@ -0,0 +1,43 @@
+"""Incident clusters: the incidents table and accidents.incident_id."""
+from sqlalchemy import Column, DateTime, Float, ForeignKey, Index, Integer, MetaData, String, Table
+from migrations import add_missing_columns, create_index
+
+VERSION = 4
+DESCRIPTION = "incidents table, accidents.incident_id and their indexes"
+# CREATE INDEX CONCURRENTLY can't run inside a transaction
+TRANSACTIONAL = False
+
+metadata = MetaData()
+Table("user", metadata, Column("id", String(36), primary_key=True))
+incidents = Table(
+    "incidents", metadata,
+    Column("id", String(36), primary_key=True),
+    Column("status", String(20), nullable=False),
+    Column("verified_by", String(36), ForeignKey("user.id")),
+    Column("latitude", Float, nullable=False),
+    Column("longitude", Float, nullable=False),
+    Column("geohash", String(12)),
+    Column("severity", Integer, nullable=False),
+    Column("report_count", Integer, nullable=False, server_default="1"),
+    Column("created_at", DateTime),
+    Column("last_reported_at", DateTime),
+    Index("ix_incidents_geohash", "geohash"),
+    Index("ix_incidents_created_at_id", "created_at", "id"),
+    Index("ix_incidents_status_created_at_id", "status", "created_at", "id"),
+)
+accidents = Table(
+    "accidents", metadata,
+    Column("id", String(36), primary_key=True),
+    Column("incident_id", String(36), ForeignKey("incidents.id")),
+    Index("ix_accidents_incident_id", "incident_id"),
+)
+
+
+def upgrade(conn):
+    incidents.create(conn, checkfirst=True)
+    # Existing reports stay unclustered; only new ones are matched
+    add_missing_columns(conn, accidents)
+    create_index(conn, accidents, "ix_accidents_incident_id")
+    create_index(conn, incidents, "ix_incidents_geohash")
+    create_index(conn, incidents, "ix_incidents_created_at_id")
+    create_index(conn, incidents, "ix_incidents_status_created_at_id")
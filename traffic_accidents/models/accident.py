@@ -1,9 +1,21 @@
 import uuid
 from datetime import datetime
+from sqlalchemy import event
 from db import db
+from utils.geo import encode_geohash
 
 class Accident(db.Model):
     __tablename__ = "accidents"
+    __table_args__ = (
+        # Keyset pagination order for the accident feed
+        db.Index("ix_accidents_created_at_id", "created_at", "id"),
+        # First-report check in AccidentList.post, a user's own reports
+        db.Index("ix_accidents_user_id_created_at", "user_id", "created_at"),
+        # Feed filtered by status, still in keyset order
+        db.Index("ix_accidents_status_created_at_id", "status", "created_at", "id"),
+        # Reports of an incident
+        db.Index("ix_accidents_incident_id", "incident_id"),
+    )
 
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     
@@ -11,9 +23,13 @@ class Accident(db.Model):
     user_id = db.Column(db.String(36), db.ForeignKey("user.id"), nullable=True)
     status = db.Column(db.String(20), default="not_confirmed", nullable=False)
     verified_by = db.Column(db.String(36), db.ForeignKey("user.id"), nullable=True)
+    # The crash this report was merged into, see utils/incidents.py
+    incident_id = db.Column(db.String(36), db.ForeignKey("incidents.id"), nullable=True)
 
     latitude = db.Column(db.Float, nullable=False)
     longitude = db.Column(db.Float, nullable=False)
+    # Spatial index: viewport and radius queries become index range scans on this
+    geohash = db.Column(db.String(12), index=True)
     description = db.Column(db.Text, nullable=False)
     severity = db.Column(db.Integer, nullable=False)
     reporter = db.relationship("User", back_populates="accidents", foreign_keys=[user_id])
@@ -25,9 +41,25 @@ class Accident(db.Model):
     verifier = db.relationship("User", foreign_keys=[verified_by])
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
+    incident = db.relationship("Incident", back_populates="reports")
+
     # Relationship with Comment
     comments = db.relationship("Comment", back_populates="accident", cascade="all, delete-orphan")
 
     # Explicit relationships back to User
     author = db.relationship("User", foreign_keys=[user_id])
-    verifier = db.relationship("User", foreign_keys=[verified_by])
\ No newline at end of file
+    verifier = db.relationship("User", foreign_keys=[verified_by])
+
+
+# Keep the geohash in sync with the coordinates on every ORM insert/update
+@event.listens_for(Accident, "before_insert")
+@event.listens_for(Accident, "before_update")
+def set_geohash(mapper, connection, target):
+    target.geohash = encode_geohash(target.latitude, target.longitude)
+
+
+def backfill_geohashes():
+    """Fills the geohash of rows created before the column existed."""
+    for accident in Accident.query.filter(Accident.geohash.is_(None)).all():
+        accident.geohash = encode_geohash(accident.latitude, accident.longitude)
+    db.session.commit()
@@ -0,0 +1,13 @@
+from datetime import datetime
+from db import db
+
+class AccidentChange(db.Model):
+    """Append-only change log that backs the delta sync feed."""
+    __tablename__ = "accident_changes"
+
+    # Monotonic sequence number; the sync token handed to clients
+    seq = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    # No foreign key: tombstones must outlive the accident they describe
+    accident_id = db.Column(db.String(36), nullable=False, index=True)
+    op = db.Column(db.String(20), nullable=False)  # created | status | deleted | photo
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
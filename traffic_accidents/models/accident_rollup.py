@@ -0,0 +1,14 @@
+from db import db
+
+class AccidentRollup(db.Model):
+    """Accident counts per (day, hour, severity, status), maintained on every write."""
+    __tablename__ = "accident_rollups"
+
+    day = db.Column(db.Date, primary_key=True)
+    hour = db.Column(db.Integer, primary_key=True)
+    severity = db.Column(db.Integer, primary_key=True)
+    status = db.Column(db.String(20), primary_key=True)
+
+    count = db.Column(db.Integer, nullable=False, default=0)
+    casualties_injured = db.Column(db.Integer, nullable=False, default=0)
+    casualties_dead = db.Column(db.Integer, nullable=False, default=0)
@@ -4,12 +4,31 @@ from db import db
 
 class CheckIn(db.Model):
     __tablename__ = "checkins"
+    __table_args__ = (
+        # Newest-first pages of GET /safe-checkin
+        db.Index("ix_checkins_created_at_id", "created_at", "id"),
+    )
 
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
-    user_id = db.Column(db.String(36), db.ForeignKey("user.id"), nullable=False)
+    user_id = db.Column(db.String(36), db.ForeignKey("user.id"), nullable=False, index=True)
     latitude = db.Column(db.Float, nullable=False)
     longitude = db.Column(db.Float, nullable=False)
     location_name = db.Column(db.String(100))
+    # Indexed by ix_checkins_created_at_id above
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
-    user = db.relationship("User")
\ No newline at end of file
+    user = db.relationship("User")
+
+
+class CheckInSummary(db.Model):
+    """Check-ins past CHECKIN_RETENTION_DAYS, compacted per (day, geohash cell)."""
+    __tablename__ = "checkin_summaries"
+
+    day = db.Column(db.Date, primary_key=True)
+    cell = db.Column(db.String(12), primary_key=True)
+
+    location_name = db.Column(db.String(100))  # the name given most often that day
+    latitude = db.Column(db.Float, nullable=False)  # mean position of the check-ins
+    longitude = db.Column(db.Float, nullable=False)
+    checkin_count = db.Column(db.Integer, nullable=False, default=0)
+    user_count = db.Column(db.Integer, nullable=False, default=0)
@@ -3,14 +3,24 @@ from datetime import datetime
 
 class Comment(db.Model):
     __tablename__ = "comments"
+    __table_args__ = (
+        # Comment thread of an accident, oldest first
+        db.Index("ix_comments_accident_id_created_at", "accident_id", "created_at"),
+        # Same thread, best first (sort=score walks it backwards)
+        db.Index("ix_comments_accident_id_score_id", "accident_id", "score", "id"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     content = db.Column(db.Text, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Sum of the votes in comment_votes, kept up to date by utils/votes.py
+    score = db.Column(db.Integer, nullable=False, default=0, server_default="0")
 
     accident_id = db.Column(db.String(36), db.ForeignKey("accidents.id"), nullable=False)
     # Correctly points to "user.id"
-    user_id = db.Column(db.String(36), db.ForeignKey("user.id"), nullable=False)
+    user_id = db.Column(db.String(36), db.ForeignKey("user.id"), nullable=False, index=True)
 
     author = db.relationship("User", back_populates="comments")
-    accident = db.relationship("Accident", back_populates="comments")
\ No newline at end of file
+    accident = db.relationship("Accident", back_populates="comments")
+    # Deleted with the comment, so a reused comment id never inherits old votes
+    votes = db.relationship("CommentVote", cascade="all, delete-orphan")
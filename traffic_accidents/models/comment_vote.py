@@ -0,0 +1,15 @@
+from datetime import datetime
+from db import db
+
+class CommentVote(db.Model):
+    """One vote per user per comment; Comment.score holds the running sum."""
+    __tablename__ = "comment_votes"
+    __table_args__ = (
+        db.CheckConstraint("value IN (-1, 1)", name="ck_comment_votes_value"),
+    )
+
+    # The primary key is the (comment, user) uniqueness rule
+    comment_id = db.Column(db.Integer, db.ForeignKey("comments.id", ondelete="CASCADE"), primary_key=True)
+    user_id = db.Column(db.String(36), db.ForeignKey("user.id", ondelete="CASCADE"), primary_key=True, index=True)
+    value = db.Column(db.SmallInteger, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -0,0 +1,14 @@
+from db import db
+
+class HeatmapCell(db.Model):
+    """Severity-weighted accident density, one row per non-empty cell of a map tile."""
+    __tablename__ = "heatmap_cells"
+
+    # Slippy-map tile, so a tile is a single primary-key prefix lookup
+    z = db.Column(db.Integer, primary_key=True)
+    tx = db.Column(db.Integer, primary_key=True)
+    ty = db.Column(db.Integer, primary_key=True)
+    # Row-major index into the tile's TILE_GRID x TILE_GRID grid
+    cell = db.Column(db.Integer, primary_key=True)
+
+    weight = db.Column(db.Float, nullable=False, default=0)
@@ -0,0 +1,43 @@
+import uuid
+from datetime import datetime
+from sqlalchemy import event
+from db import db
+from utils.geo import encode_geohash
+
+class Incident(db.Model):
+    """One crash as seen through every report of it.
+
+    New reports join the nearest open incident (unverified, reported within
+    INCIDENT_WINDOW_MINUTES, within INCIDENT_RADIUS_M), see utils/incidents.py.
+    Verifying the incident verifies all of its reports.
+    """
+    __tablename__ = "incidents"
+    __table_args__ = (
+        # Map layer, newest first
+        db.Index("ix_incidents_created_at_id", "created_at", "id"),
+        # Officer queue: unverified incidents, newest first
+        db.Index("ix_incidents_status_created_at_id", "status", "created_at", "id"),
+    )
+
+    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    status = db.Column(db.String(20), default="not_confirmed", nullable=False)
+    verified_by = db.Column(db.String(36), db.ForeignKey("user.id"), nullable=True)
+
+    # Mean position of the reports, kept up to date as they join
+    latitude = db.Column(db.Float, nullable=False)
+    longitude = db.Column(db.Float, nullable=False)
+    geohash = db.Column(db.String(12), index=True)
+    # Worst severity reported
+    severity = db.Column(db.Integer, nullable=False)
+    report_count = db.Column(db.Integer, nullable=False, default=1, server_default="1")
+    # First and latest report; the match window runs from last_reported_at
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    last_reported_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    reports = db.relationship("Accident", back_populates="incident", lazy="dynamic")
+
+
+@event.listens_for(Incident, "before_insert")
+@event.listens_for(Incident, "before_update")
+def set_geohash(mapper, connection, target):
+    target.geohash = encode_geohash(target.latitude, target.longitude)
@@ -0,0 +1,21 @@
+from datetime import datetime
+from db import db
+
+class OutboxEmail(db.Model):
+    """Emails queued in the same transaction as the change they announce.
+
+    The sender in utils/mailer.py delivers due rows and reschedules failures
+    with backoff; `next_attempt_at` doubles as a lease while a worker sends.
+    """
+    __tablename__ = "outbox_emails"
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    recipient = db.Column(db.String(120), nullable=False)
+    subject = db.Column(db.String(255), nullable=False)
+    html = db.Column(db.Text, nullable=False)
+    status = db.Column(db.String(10), nullable=False, default="pending", index=True)  # pending | sent | failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+    last_error = db.Column(db.String(500), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime, nullable=True)
@@ -0,0 +1,23 @@
+from datetime import datetime
+from db import db
+
+class PointsLedger(db.Model):
+    """Append-only record of every points award or penalty."""
+    __tablename__ = "points_ledger"
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    user_id = db.Column(db.String(36), db.ForeignKey("user.id", ondelete="CASCADE"), nullable=False, index=True)
+    delta = db.Column(db.Integer, nullable=False)
+    reason = db.Column(db.String(100))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+class PointsDaily(db.Model):
+    """Ledger rolled up per user and UTC day; feeds the weekly/monthly leaderboards."""
+    __tablename__ = "points_daily"
+    __table_args__ = (
+        db.Index("ix_points_daily_day_user", "day", "user_id"),
+    )
+
+    user_id = db.Column(db.String(36), db.ForeignKey("user.id", ondelete="CASCADE"), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    points = db.Column(db.Integer, nullable=False, default=0)
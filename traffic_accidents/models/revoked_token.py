@@ -0,0 +1,12 @@
+from datetime import datetime
+from db import db
+
+class RevokedToken(db.Model):
+    """Revoked JWT ids, kept only until the token would have expired anyway."""
+    __tablename__ = "revoked_tokens"
+
+    # Increasing id lets each worker pull only the revocations it hasn't seen
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    jti = db.Column(db.String(64), unique=True, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+    revoked_at = db.Column(db.DateTime, default=datetime.utcnow)
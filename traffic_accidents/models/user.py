@@ -2,6 +2,7 @@ import uuid
 from datetime import datetime
 from db import db
 import enum
+from utils.badges import badge_names
 
 # 1. Define the Enum for strict security
 class UserStatus(enum.Enum):
@@ -11,6 +12,12 @@ class UserStatus(enum.Enum):
 
 class User(db.Model):
     __tablename__ = "user"
+    __table_args__ = (
+        # Leaderboard order (points desc, id desc) is a backward scan of this index
+        db.Index("ix_user_points_id", "points", "id"),
+        # Pending applications list
+        db.Index("ix_user_status", "status"),
+    )
 
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     username = db.Column(db.String(50), unique=True, nullable=False)
@@ -30,7 +37,8 @@ class User(db.Model):
     badge_number = db.Column(db.String(100), unique=True, nullable=True) # Fixed Typo
     
     points = db.Column(db.Integer, default=0)
-    badges = db.Column(db.String(500), default="")
+    # Bit per badge, see utils/badges.py
+    badge_mask = db.Column(db.Integer, nullable=False, default=0, server_default="0")
     
     # 2. Link the column to the Enum class for strict validation
     status = db.Column(
@@ -50,4 +58,9 @@ class User(db.Model):
         foreign_keys='Accident.user_id'
     )
     
-    comments = db.relationship("Comment", back_populates="author", cascade="all, delete-orphan")
\ No newline at end of file
+    comments = db.relationship("Comment", back_populates="author", cascade="all, delete-orphan")
+
+    @property
+    def badges(self):
+        """Comma-separated badge names, the format the API has always returned."""
+        return ",".join(badge_names(self.badge_mask))
\ No newline at end of file
@@ -1,41 +1,184 @@
 import os
-from flask import request
-from werkzeug.utils import secure_filename
+from datetime import datetime, timedelta
+from flask import current_app, request, make_response, jsonify, Response, stream_with_context
 from flask.views import MethodView
 from flask_smorest import Blueprint, abort
 from flask_jwt_extended import jwt_required, get_jwt, get_jwt_identity
+from sqlalchemy import func
+from sqlalchemy.orm import joinedload, selectinload, load_only
+from sqlalchemy.orm.attributes import InstrumentedAttribute
 from sqlalchemy.exc import SQLAlchemyError
-from datetime import datetime, timedelta
 from db import db
 from models.accident import Accident
-from schemas.accident import AccidentSchema
+from models.accident_change import AccidentChange
+from models.comment import Comment
+from schemas.accident import (
+    AccidentSchema, AccidentMarkerSchema, AccidentQueryArgsSchema, AccidentChangesArgsSchema, AccidentChangesSchema,
+    AccidentIngestArgsSchema, AccidentIngestReportSchema, AccidentExportArgsSchema, AccidentStreamArgsSchema
+)
 from models.user import User 
-from decorators import officer_required, admin_required
+from decorators import officer_required, admin_required, rate_limit
 from utils.gamification import add_points # Ensure these are imported
+from utils.geo import bbox_filter, nearby
+from utils.pagination import keyset_page
+from utils.accident_events import record_created, record_deleted, current_token
+from utils.log_tail import settled
+from utils.incidents import assign_incident, detach_incident, verify_accident, verify_incident
+from utils.heatmap import heatmap_tile, TILE_GRID, MAX_ZOOM
+from utils.query_budget import query_budget
+from utils.query_plans import allow_full_scan
+from utils.user_cache import load_user
+from utils.photos import allowed_file, stage_upload, process_photo, delete_photo, PhotoTooLarge
+from utils.background import submit
+from utils.ingest import ingest_accidents
+from utils.export import export_accidents, export_query, EXPORT_FORMATS
+from utils.event_broker import get_broker, publish, backlog
 
 blp = Blueprint("Accidents", __name__, description="Operations on accidents")
+# The cursor and changes-token headers are part of the representation, so they
+# must feed the ETag too (a 304 would otherwise leave clients on a stale token)
+blp.ETAG_INCLUDE_HEADERS = ["X-Pagination", "X-Next-Cursor", "X-Changes-Token"]
+
+# One report per user in this window, checked against the database
+REPORT_COOLDOWN = timedelta(minutes=2)
+
+# Everything AccidentSchema touches, loaded up front instead of lazily per row
+ACCIDENT_LOAD_OPTIONS = (
+    joinedload(Accident.reporter),
+    joinedload(Accident.author),
+    joinedload(Accident.verifier),
+    selectinload(Accident.comments).joinedload(Comment.author),
+)
+
+# Relationships each sparse field needs, so fields= only joins what it dumps
+FIELD_LOAD_OPTIONS = {
+    "reporter": (joinedload(Accident.reporter),),
+    "author": (joinedload(Accident.author),),
+    "role": (joinedload(Accident.author),),
+    "verifier": (joinedload(Accident.verifier),),
+    "comments": (selectinload(Accident.comments).joinedload(Comment.author),),
+}
+
+def accident_projection(args):
+    """Returns (query, schema) for the requested view; schema is None for the full one."""
+    if args["view"] == "marker":
+        # Plain columns: no ORM objects, no relationships. role drives the admin id scrub.
+        query = db.session.query(
+            Accident.id, Accident.latitude, Accident.longitude, Accident.severity,
+            Accident.status, Accident.created_at, Accident.incident_id, User.role.label("role")
+        ).outerjoin(User, User.id == Accident.user_id)
+        return query, AccidentMarkerSchema(many=True)
 
-UPLOAD_FOLDER = 'static/uploads'
-ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
+    if "fields" not in args:
+        return Accident.query.options(*ACCIDENT_LOAD_OPTIONS), None
 
-if not os.path.exists(UPLOAD_FOLDER):
-    os.makedirs(UPLOAD_FOLDER)
+    only = set(args["fields"])
+    if "id" in only:
+        only.add("role")  # needed to hide ids of admin reports
+    columns = {Accident.id, Accident.created_at, Accident.user_id, Accident.verified_by}
+    options = []
+    for name in only:
+        if name in FIELD_LOAD_OPTIONS:
+            options.extend(FIELD_LOAD_OPTIONS[name])
+        elif isinstance(getattr(Accident, name, None), InstrumentedAttribute):
+            columns.add(getattr(Accident, name))
+    query = Accident.query.options(load_only(*columns), *options)
+    return query, AccidentSchema(many=True, only=only)
 
-def allowed_file(filename):
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+def load_accidents(ids, query=None):
+    """Fetches accidents by id (eager-loaded by default), keeping the order of ids."""
+    if not ids:
+        return []
+    if query is None:
+        query = Accident.query.options(*ACCIDENT_LOAD_OPTIONS)
+    by_id = {accident.id: accident for accident in query.filter(Accident.id.in_(ids))}
+    return [by_id[accident_id] for accident_id in ids if accident_id in by_id]
+
+def with_distance(row, distance):
+    if isinstance(row, Accident):
+        row.distance_m = round(distance, 1)
+        return row
+    return dict(row._mapping, distance_m=round(distance, 1))
+
+def sparse_response(schema, rows, headers, requested):
+    """Dumps a projection ourselves, since @blp.response only knows the full schema."""
+    data = schema.dump(rows)
+    if requested is not None and "role" not in requested:
+        for item in data:
+            item.pop("role", None)
+    # Answers 304 when unchanged; same headers as ETAG_INCLUDE_HEADERS
+    blp.set_etag([data, headers.get("X-Next-Cursor"), headers.get("X-Changes-Token")])
+    response = jsonify(data)
+    response.headers.update(headers)
+    return response
+
+def filter_accidents(query, args):
+    """Applies the status / severity / date / bbox filters shared by the accident feeds."""
+    if "status" in args:
+        query = query.filter(Accident.status == args["status"])
+    if "severity_min" in args:
+        query = query.filter(Accident.severity >= args["severity_min"])
+    if "severity_max" in args:
+        query = query.filter(Accident.severity <= args["severity_max"])
+    if "since" in args:
+        query = query.filter(Accident.created_at >= args["since"])
+    if "until" in args:
+        query = query.filter(Accident.created_at < args["until"])
+    if "bbox" in args:
+        query = query.filter(bbox_filter(Accident, args["bbox"]))
+    return query
 
 @blp.route("/accidents")
 class AccidentList(MethodView):
     
-    @blp.response(200, AccidentSchema(many=True))
-    def get(self):
-        return Accident.query.order_by(Accident.created_at.desc()).all()
+    # near= with k may widen its search a few times; otherwise 3 queries
+    @query_budget(12)
+    @blp.etag
+    @blp.arguments(AccidentQueryArgsSchema, location="query")
+    @blp.response(200, AccidentSchema(many=True),
+                  description="Accidents, or AccidentMarker objects with view=marker")
+    def get(self, args):
+        """List accidents newest first, one page at a time (see X-Next-Cursor)
+
+        X-Changes-Token can be passed to /accidents/changes to poll for updates.
+        view=marker returns only what the map needs; fields= picks any subset
+        of the full accident fields. Both are selected at the SQL level.
+        """
+        headers = {"X-Changes-Token": str(current_token())}
+        query, schema = accident_projection(args)
+
+        if "near" in args:
+            # Search on bare coordinates, then load the chosen projection once
+            lat, lng = args["near"]
+            points = filter_accidents(
+                db.session.query(Accident.id, Accident.latitude, Accident.longitude), args
+            )
+            hits = nearby(points, Accident, lat, lng, args.get("radius_m"), args.get("k"))
+            hits = hits[:args["limit"]]
+            rows = load_accidents([point.id for point, _ in hits], query)
+            rows = [with_distance(row, distance) for row, (_, distance) in zip(rows, hits)]
+        else:
+            rows, next_cursor = keyset_page(
+                filter_accidents(query, args), Accident.created_at, Accident.id,
+                args["limit"], args.get("cursor")
+            )
+            if next_cursor:
+                headers["X-Next-Cursor"] = next_cursor
+
+        if schema is not None:
+            return sparse_response(schema, rows, headers, args.get("fields"))
+        return rows, headers
 
     @jwt_required()
+    # Cheap first filter for the cooldown below. Its buckets are per process (or
+    # per host), so the database check in the view is the one that holds.
+    # Rejected reports don't use it up
+    @rate_limit("1/2 minutes", message="Please wait 2 minutes before reporting again.", count_errors=False)
+    @rate_limit("20/minute", per="ip")
     @blp.response(201, AccidentSchema)
     def post(self):
         current_user_id = get_jwt_identity()
-        user = User.query.get(current_user_id)
+        user = load_user(current_user_id)
 
         if not user:
             abort(401, message="Invalid user. Please login again.")
@@ -62,28 +205,30 @@ class AccidentList(MethodView):
         if len(description) < 10:
             abort(400, message="Description must be at least 10 characters long.")
 
-        # COOLDOWN CHECK
-        cooldown_time = datetime.utcnow() - timedelta(minutes=2)
-        recent = Accident.query.filter(
-            Accident.user_id == current_user_id,
-            Accident.created_at >= cooldown_time
-        ).first()
+        # COOLDOWN CHECK: shared by every worker and host (ix_accidents_user_id_created_at)
+        recent = (
+            db.session.query(Accident.created_at)
+            .filter(Accident.user_id == current_user_id,
+                    Accident.created_at >= datetime.utcnow() - REPORT_COOLDOWN)
+            .order_by(Accident.created_at.desc())
+            .first()
+        )
         if recent:
-            abort(429, message="Please wait 2 minutes before reporting again.")
+            wait = REPORT_COOLDOWN - (datetime.utcnow() - recent.created_at)
+            abort(429, message="Please wait 2 minutes before reporting again.",
+                  headers={"Retry-After": str(max(1, int(wait.total_seconds()) + 1))})
 
-        # PHOTO HANDLING
-        photo_filename = None
+        # PHOTO HANDLING: stage now, verify/strip/store in the background
+        staged_photo = None
         if file:
-            if allowed_file(file.filename):
-                filename = secure_filename(file.filename)
-                unique_name = f"{datetime.utcnow().timestamp()}_{filename}"
-                try:
-                    file.save(os.path.join(UPLOAD_FOLDER, unique_name))
-                    photo_filename = unique_name
-                except Exception as e:
-                    abort(500, message=f"Error saving photo: {e}")
-            else:
+            if not allowed_file(file.filename):
                 abort(400, message="Invalid photo format.")
+            try:
+                staged_photo = stage_upload(file)
+            except PhotoTooLarge as e:
+                abort(413, message=str(e))
+            except OSError as e:
+                abort(500, message=f"Error saving photo: {e}")
 
         # SCORING LOGIC FOR NEW POST
         is_first = Accident.query.filter_by(user_id=current_user_id).count() == 0
@@ -98,10 +243,14 @@ class AccidentList(MethodView):
                 casualties_injured=injuries,
                 casualties_dead=deaths,
                 user_id=current_user_id,
-                photo_url=photo_filename,
+                photo_url=None,  # filled in by process_photo
                 status="not_confirmed"
             )
             db.session.add(new_accident)
+            db.session.flush()
+            # Another report of a crash already on the map joins its incident
+            assign_incident(new_accident)
+            event = record_created(new_accident)
 
             # APPLY FEATURES: First Report (+10)
             if is_first:
@@ -112,18 +261,185 @@ class AccidentList(MethodView):
                 add_points(user, 100, "High Severity Report")
 
             db.session.commit()
-            return new_accident
         except SQLAlchemyError as e:
             db.session.rollback()
+            if staged_photo:
+                os.remove(staged_photo)
             abort(500, message=f"Database Error: {str(e)}")
 
+        publish(event)
+        if staged_photo:
+            submit(process_photo, new_accident.id, staged_photo)
+        return new_accident
+
+
+@blp.route("/accidents/bulk")
+class AccidentBulkIngest(MethodView):
+
+    @officer_required
+    @blp.arguments(AccidentIngestArgsSchema, location="query")
+    @blp.response(200, AccidentIngestReportSchema)
+    def post(self, args):
+        """Officer/Admin: load an official feed (NDJSON or CSV body, or a 'file' upload)"""
+        # Feeds are far bigger than a single report with a photo
+        request.max_content_length = current_app.config["INGEST_MAX_BYTES"]
+        upload = request.files.get("file") if request.mimetype == "multipart/form-data" else None
+        mimetype = upload.mimetype if upload else request.mimetype
+        fmt = args.get("format") or {"text/csv": "csv", "application/x-ndjson": "ndjson"}.get(mimetype)
+        if fmt is None:
+            abort(415, message="Send text/csv or application/x-ndjson, or pass ?format=.")
+        stream = upload.stream if upload else request.stream
+        return ingest_accidents(stream, fmt, get_jwt_identity())
+
+
+@blp.route("/accidents/export")
+class AccidentExport(MethodView):
+
+    @blp.arguments(AccidentExportArgsSchema, location="query")
+    @blp.response(200, content_type="text/csv", description=(
+        "CSV by default; application/geo+json (a FeatureCollection) with format=geojson, "
+        "application/x-ndjson (one accident per line) with format=ndjson."
+    ))
+    # Reading everything is the point; set before streaming, so the check can't fire mid-body
+    @allow_full_scan
+    def get(self, args):
+        """Download every matching accident, oldest first
+
+        Takes the same status / severity / date / bbox filters as the list.
+        The body is streamed as rows are read, so large exports don't sit in memory.
+        """
+        mimetype, extension = EXPORT_FORMATS[args["format"]]
+        query = filter_accidents(export_query(), args)
+        body = stream_with_context(export_accidents(query, args["format"]))
+        return Response(body, mimetype=mimetype, headers={
+            "Content-Disposition": f"attachment; filename=accidents.{extension}",
+        })
+
+
+@blp.route("/accidents/stream")
+class AccidentStream(MethodView):
+
+    @blp.arguments(AccidentStreamArgsSchema, location="query")
+    @blp.response(200, content_type="text/event-stream", description=(
+        "Server-Sent Events named created, status and deleted. Each id is a change "
+        "token and data is an AccidentMarker ({id} only for deleted). A reset event "
+        "means too much was missed to replay: reload /accidents."
+    ))
+    def get(self, args):
+        """Live accident updates, instead of polling /accidents
+
+        On reconnect, events after Last-Event-ID are replayed from the change log.
+        """
+        config = current_app.config
+        last_event_id = args.get("last_event_id")
+        if last_event_id is None and request.headers.get("Last-Event-ID", "").isdigit():
+            last_event_id = int(request.headers["Last-Event-ID"])
+        since = last_event_id if last_event_id is not None else current_token()
+
+        subscription = get_broker().subscribe(since, args.get("bbox"))
+        if subscription is None:
+            abort(503, message="Too many open streams, try again shortly.", headers={"Retry-After": "30"})
+        # Read the log only now that we are subscribed: a change committed before
+        # this point is replayed, one committed after it is queued. Queued events
+        # the replay already covers are dropped by seq.
+        try:
+            replay, subscription.since = backlog(since, config["EVENT_STREAM_REPLAY_LIMIT"])
+        except Exception:
+            subscription.close()
+            raise
+
+        body = subscription.stream(
+            replay, config["EVENT_STREAM_HEARTBEAT_SECONDS"], config["EVENT_STREAM_RETRY_MS"]
+        )
+        response = Response(body, mimetype="text/event-stream", headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",  # don't let nginx hold events back
+        })
+        response.call_on_close(subscription.close)
+        return response
+
+
+@blp.route("/accidents/changes")
+class AccidentChanges(MethodView):
+
+    CHANGES_PAGE_SIZE = 500
+
+    @query_budget(5)
+    @blp.etag
+    @blp.arguments(AccidentChangesArgsSchema, location="query")
+    @blp.response(200, AccidentChangesSchema)
+    def get(self, args):
+        """Accidents created, verified or deleted since a sync token
+
+        Without `since`, only returns the current token. Deleted accidents come
+        back as ids in `deleted`. Keep calling with the returned token while
+        `has_more` is true.
+        """
+        since = args.get("since")
+        if since is None:
+            return {"token": str(current_token()), "accidents": [], "deleted": [], "has_more": False}
+
+        changes = (
+            AccidentChange.query.filter(AccidentChange.seq > since)
+            .order_by(AccidentChange.seq)
+            .limit(self.CHANGES_PAGE_SIZE + 1)
+            .all()
+        )
+        if changes and changes[0].seq > since + 1:
+            oldest = db.session.query(func.min(AccidentChange.seq)).scalar()
+            if since < oldest - 1:
+                abort(410, message="Sync token has expired. Reload the full accident list.")
+
+        has_more = len(changes) > self.CHANGES_PAGE_SIZE
+        changes = changes[:self.CHANGES_PAGE_SIZE]
+        # Stop before a seq that may still be committing; the client asks again from there
+        count = settled([(change.seq, change.created_at) for change in changes], since)
+        if count < len(changes):
+            changes, has_more = changes[:count], False
+        if not changes:
+            return {"token": str(since), "accidents": [], "deleted": [], "has_more": False}
+
+        # Only the last change per accident matters
+        latest = {change.accident_id: change.op for change in changes}
+        deleted = [accident_id for accident_id, op in latest.items() if op == "deleted"]
+        live_ids = [accident_id for accident_id, op in latest.items() if op != "deleted"]
+        accidents = load_accidents(live_ids)
+        return {
+            "token": str(changes[-1].seq),
+            "accidents": accidents,
+            "deleted": deleted,
+            "has_more": has_more,
+        }
+
+
+@blp.route("/accidents/heatmap/<int:z>/<int:x>/<int:y>")
+class AccidentHeatmapTile(MethodView):
+
+    @blp.response(200, content_type="application/octet-stream", description=(
+        f"{TILE_GRID}x{TILE_GRID} little-endian float32 grid, row-major from the "
+        "north-west corner. Each cell holds the summed severity of the reports in it."
+    ))
+    def get(self, z, x, y):
+        """Severity-weighted accident density for one slippy-map tile"""
+        if z > MAX_ZOOM or x >= (1 << z) or y >= (1 << z):
+            abort(404, message="Tile out of range.")
+        response = make_response(heatmap_tile(z, x, y))
+        response.headers["Content-Type"] = "application/octet-stream"
+        response.headers["X-Heatmap-Grid"] = str(TILE_GRID)
+        response.cache_control.public = True
+        response.cache_control.max_age = 30
+        response.add_etag()
+        return response.make_conditional(request)
+
 
 @blp.route("/accidents/<string:accident_id>")
 class AccidentDetail(MethodView):
 
+    @query_budget(2)
+    @blp.etag
     @blp.response(200, AccidentSchema)
     def get(self, accident_id):
-        return Accident.query.get_or_404(accident_id)
+        return Accident.query.options(*ACCIDENT_LOAD_OPTIONS).filter_by(id=accident_id).first_or_404()
 
     @jwt_required()
     def delete(self, accident_id):
@@ -134,12 +450,15 @@ class AccidentDetail(MethodView):
 
         if user_role == "admin" or str(accident.user_id) == str(current_user_id):
             try:
-                if accident.photo_url:
-                    photo_path = os.path.join(UPLOAD_FOLDER, accident.photo_url)
-                    if os.path.exists(photo_path):
-                        os.remove(photo_path)
+                photo = accident.photo_url
+                detach_incident(accident)
+                event = record_deleted(accident)
                 db.session.delete(accident)
                 db.session.commit()
+                publish(event)
+                if photo:
+                    # Photos are shared by content hash; only drop unreferenced ones
+                    delete_photo(photo)
                 return {"message": "Accident report deleted successfully."}, 200
             except Exception as e:
                 db.session.rollback()
@@ -161,21 +480,19 @@ class AccidentStatus(MethodView):
             abort(400, message="Invalid status.")
 
         accident = Accident.query.get_or_404(accident_id)
-        accident.status = new_status
-        accident.verified_by = get_jwt_identity()
-
-        reporter = User.query.get(accident.user_id)
-        if reporter:
-            if new_status == "confirmed":
-                # APPLY FEATURES: Confirmed Report (+50)
-                add_points(reporter, 50, "Verification Bonus")
-            elif new_status == "false_report":
-                # APPLY FEATURES: False Report (-20)
-                add_points(reporter, -20, "False Report Penalty")
+        incident = accident.incident
+        # APPLY FEATURES: Confirmed Report (+50) / False Report (-20), see utils/incidents.py
+        if incident is not None and incident.status == "not_confirmed":
+            # One ruling covers every report of the same crash
+            events = verify_incident(incident, new_status, get_jwt_identity())
+        else:
+            events = [verify_accident(accident, new_status, get_jwt_identity())]
 
         try:
             db.session.commit()
         except SQLAlchemyError:
             db.session.rollback()
             abort(500, message="Error updating accident status.")
+        for event in events:
+            publish(event)
         return accident
\ No newline at end of file
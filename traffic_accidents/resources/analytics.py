@@ -0,0 +1,22 @@
+from datetime import datetime, timedelta
+from flask.views import MethodView
+from flask_smorest import Blueprint
+from decorators import officer_required
+from schemas.analytics import AnalyticsArgsSchema, AccidentSummarySchema
+from utils.analytics import accident_summary
+
+blp = Blueprint("Analytics", __name__, description="Dashboard statistics")
+
+@blp.route("/analytics/accidents")
+class AccidentAnalytics(MethodView):
+
+    @officer_required
+    @blp.etag
+    @blp.arguments(AnalyticsArgsSchema, location="query")
+    @blp.response(200, AccidentSummarySchema)
+    def get(self, args):
+        """Accident counts by status, severity, weekday and hour (UTC)"""
+        since_day = None
+        if "days" in args:
+            since_day = (datetime.utcnow() - timedelta(days=args["days"] - 1)).date()
+        return accident_summary(since_day)
@@ -4,14 +4,14 @@ from db import db
 from models.user import User, UserStatus
 from flask_jwt_extended import create_access_token, jwt_required, get_jwt, create_refresh_token, get_jwt_identity
 from flask.views import MethodView
-from decorators import admin_required
+from decorators import admin_required, rate_limit
 from blocklist import blocklist
 from datetime import datetime, timezone, timedelta
 from schemas.user import UserSchema, TokenResponseSchema, OfficerApplicationSchema, AdminApplicationSchema, LoginSchema
-from passlib.hash import pbkdf2_sha256
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+from utils.passwords import hash_password, verify_password
+from utils.user_cache import invalidate_user
+from utils.mailer import outbox
+from utils.notifications import queue_admin_approval_email
 
 blp = Blueprint("auth", __name__, description="Operations on authentication")
 
@@ -21,45 +21,11 @@ def scrub_admin_id(data, role):
         data.pop("id", None)
     return data
 
-# --- SHARED EMAIL FUNCTION ---
-def send_approval_email(user):
-    sender_email = "jaouher.chouchane0@gmail.com"
-    app_password = "gmdx vriz buei pbes"  # Your working App Password
-    
-    msg = MIMEMultipart()
-    msg["Subject"] = f"🚨 URGENT: New Admin Approval Required ({user.username})"
-    msg["From"] = sender_email
-    msg["To"] = sender_email
-    
-    body = f"""
-    <html>
-        <body>
-            <h2 style="color: #d9534f;">New Admin Registration Request</h2>
-            <hr>
-            <p><strong>Username:</strong> {user.username}</p>
-            <p><strong>Full Name:</strong> {getattr(user, 'full_name', 'N/A')}</p>
-            <p><strong>Department:</strong> {getattr(user, 'department', 'N/A')}</p>
-            <p style="font-size: 1.2em;"><strong>SECRET USER ID:</strong> <code style="background: #f4f4f4; padding: 5px;">{user.id}</code></p>
-            <hr>
-            <p>To approve this admin, use the <b>/admin/process-admin</b> endpoint in Insomnia with the Secret ID above.</p>
-        </body>
-    </html>
-    """
-    msg.attach(MIMEText(body, "html"))
-
-    try:
-        with smtplib.SMTP("smtp.gmail.com", 587) as server:
-            server.starttls()
-            server.login(sender_email, app_password)
-            server.send_message(msg)
-        print(f"Approval email sent for {user.username}")
-    except Exception as e:
-        print(f"Failed to send email: {e}")
-
 # --- ROUTES ---
 
 @blp.route("/register")
 class Register(MethodView):
+    @rate_limit("10/hour", per="ip")
     @blp.arguments(UserSchema) # Use the schema for validation
     def post(self, user_data):
         # 1. Catch the 'role' from the raw request
@@ -81,7 +47,7 @@ class Register(MethodView):
         # 5. Create standard user
         user = User(
             username=user_data["username"],
-            password=pbkdf2_sha256.hash(user_data["password"]),
+            password=hash_password(user_data["password"]),
             role="user", # Force role to user for safety
             status=UserStatus.APPROVED
         )
@@ -96,22 +62,23 @@ class Register(MethodView):
 
 @blp.route("/login")
 class Login(MethodView):
+    # Each attempt costs a PBKDF2 hash; also caps password guessing
+    @rate_limit("10/minute", per="ip")
     @blp.arguments(LoginSchema)  # Ensure you are using the simplified LoginSchema
     @blp.response(200, TokenResponseSchema)
     def post(self, user_data):
         # 1. Find user by username
         user = User.query.filter_by(username=user_data["username"]).first()
 
-        # DEBUG PRINTS: Check your terminal after you click login
-        if not user:
-            print(f"DEBUG: User '{user_data['username']}' not found in database.")
-        else:
-            is_valid = pbkdf2_sha256.verify(user_data["password"], user.password)
-            print(f"DEBUG: User found. Password valid: {is_valid}")
+        # 2. Check credentials (one hash computation, off the request thread).
+        # Unknown usernames are hashed too, so the timing doesn't give them away
+        valid, new_hash = verify_password(user_data["password"], user.password if user else None)
+        if valid:
+            if new_hash:
+                # Stored hash used an old scheme or cost; upgrade it while we have the password
+                user.password = new_hash
+                db.session.commit()
 
-        # 2. Check credentials
-        if user and pbkdf2_sha256.verify(user_data["password"], user.password):
-            
             # --- Status check (Keep your existing feature) ---
             status_val = str(user.status.value if hasattr(user.status, 'value') else user.status).lower()
 
@@ -121,7 +88,8 @@ class Login(MethodView):
                 abort(403, message="Your application was rejected.")
 
             # --- Ban check (Keep your existing feature) ---
-            if user.banned_until and user.banned_until > datetime.now(timezone.utc):
+            # banned_until comes back naive UTC from the database
+            if user.banned_until and user.banned_until > datetime.utcnow():
                 expiry = user.banned_until.strftime("%Y-%m-%d %H:%M:%S")
                 abort(403, message=f"Account is banned until {expiry} UTC.")
             
@@ -158,6 +126,7 @@ class AdminUserDelete(MethodView):
         # 3. Perform the deletion
         db.session.delete(user)
         db.session.commit()
+        invalidate_user(user_id)
 
         return {"message": f"User '{user.username}' (Role: {user.role}) has been permanently deleted."}, 200
 
@@ -178,11 +147,13 @@ class ProcessAdmin(MethodView):
         if action == "approve":
             target_user.status = UserStatus.APPROVED
             db.session.commit()
+            invalidate_user(user_id)
             return {"message": f"Admin {target_user.username} is now ACTIVE."}, 200
         
         elif action == "reject":
             db.session.delete(target_user)
             db.session.commit()
+            invalidate_user(user_id)
             return {"message": "Admin request deleted."}, 200
             
         abort(400, message="Invalid action.")
@@ -218,7 +189,7 @@ class OfficerApplication(MethodView):
 
         new_user = User(
             username=officer_data["username"],
-            password=pbkdf2_sha256.hash(officer_data["password"]),
+            password=hash_password(officer_data["password"]),
             email=officer_data["email"],
             institution=officer_data["institution"],
             badge_number=officer_data["badge_number"],
@@ -233,8 +204,8 @@ class OfficerApplication(MethodView):
 class UserLogout(MethodView):
     @jwt_required()
     def post(self):
-        jti = get_jwt()["jti"]
-        blocklist.add(jti)
+        token = get_jwt()
+        blocklist.revoke(token["jti"], token["exp"])
         return {"message": "Successfully logged out"}, 200
 
 @blp.route("/refresh")
@@ -270,6 +241,7 @@ class BanUser(MethodView):
 
         user.banned_until = durations[duration]
         db.session.commit()
+        invalidate_user(user_id)
         return {"message": f"Ban status updated for {user.username}."}, 200
 
 @blp.route("/admin/process-officer")
@@ -296,6 +268,7 @@ class ProcessOfficer(MethodView):
             abort(400, message="Invalid action.")
 
         db.session.commit()
+        invalidate_user(user_id)
         return {"message": msg}, 200
 
 @blp.route("/register-admin")
@@ -313,7 +286,7 @@ class AdminRegister(MethodView):
         # 2. Create the Admin (Automatically Approved)
         new_admin = User(
             username=admin_data["username"],
-            password=pbkdf2_sha256.hash(admin_data["password"]),
+            password=hash_password(admin_data["password"]),
             role="admin",
             status=UserStatus.PENDING,
             full_name=admin_data.get("full_name"),
@@ -321,10 +294,12 @@ class AdminRegister(MethodView):
         )
 
         db.session.add(new_admin)
-        db.session.commit()
+        db.session.flush()  # the email carries the new id
 
-        # 3. Optional: Send notification email to yourself
-        send_approval_email(new_admin)
+        # 3. Queue the approval email with the user row; the outbox sends it after commit
+        queue_admin_approval_email(new_admin)
+        db.session.commit()
+        outbox.notify()
 
         return {"message": "Admin registration request submitted! It is currently PENDING approval. Please check your email."
         }, 201
\ No newline at end of file
@@ -3,25 +3,42 @@ from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
 from flask import request
 from db import db
 from flask.views import MethodView
+from sqlalchemy.orm import joinedload
 from models.comment import Comment
 from models.accident import Accident
-from models.user import User  # Added: Needed to find the author to award points
-from schemas.comment import CommentSchema
-from utils.gamification import add_points  # Added: Needed for the scoring system
+from schemas.comment import (
+    CommentSchema, CommentListArgsSchema, CommentVoteSchema, CommentVoteResultSchema, CommentUpvoteResultSchema,
+)
+from utils.votes import cast_vote
+from utils.query_budget import query_budget
+from decorators import rate_limit
 
 blp = Blueprint("comments", __name__, description="Comments")
 
 @blp.route("/accidents/<string:accident_id>/comments")
 class CommentsByAccident(MethodView):
 
+    @query_budget(2)
+    @blp.arguments(CommentListArgsSchema, location="query")
     @blp.response(200, CommentSchema(many=True))
-    def get(self, accident_id):
-        """List comments for a specific accident"""
+    def get(self, args, accident_id):
+        """List comments for a specific accident, oldest or highest scored first"""
         Accident.query.get_or_404(accident_id)
-        comments = Comment.query.filter_by(accident_id=accident_id).all()
+        if args["sort"] == "score":
+            order = (Comment.score.desc(), Comment.id.desc())
+        else:
+            order = (Comment.created_at, Comment.id)
+        comments = (
+            Comment.query.options(joinedload(Comment.author))
+            .filter_by(accident_id=accident_id)
+            .order_by(*order)
+            .all()
+        )
         return comments
 
     @jwt_required()
+    @rate_limit("10/minute")
+    @rate_limit("30/minute", per="ip")
     @blp.arguments(CommentSchema)
     @blp.response(201, CommentSchema)
     def post(self, comment_data, accident_id):
@@ -62,26 +79,62 @@ class CommentDetail(MethodView):
             db.session.rollback()
             abort(500, message="An error occurred while deleting the comment.")
 
-# Fixed: Moved outside of the previous class to correct indentation
+@blp.route("/comments/<int:comment_id>/vote")
+class CommentVoteResource(MethodView):
+
+    @jwt_required()
+    @rate_limit("30/minute")
+    @blp.arguments(CommentVoteSchema, location="json")
+    @blp.response(200, CommentVoteResultSchema)
+    def post(self, vote_data, comment_id):
+        """Vote a comment up or down (or withdraw with value 0)
+
+        Voting again with the same value changes nothing. The author gets
+        5 points while the comment holds your upvote.
+        """
+        return vote(comment_id, vote_data["value"])
+
+    @jwt_required()
+    @rate_limit("30/minute")
+    @blp.response(200, CommentVoteResultSchema)
+    def delete(self, comment_id):
+        """Withdraw your vote on a comment"""
+        return vote(comment_id, 0)
+
+
+# Older clients; same as voting +1
 @blp.route("/comments/<int:comment_id>/upvote")
 class CommentUpvote(MethodView):
     
     @jwt_required()
+    @rate_limit("30/minute")
+    @blp.response(200, CommentUpvoteResultSchema)
     def post(self, comment_id):
-        """Award points to the author of a helpful comment"""
+        """Upvote a comment (alias of POST /comments/<id>/vote)
+
+        Also returns the `message` this endpoint has always sent.
+        """
         comment = Comment.query.get_or_404(comment_id)
-        author = User.query.get(comment.user_id)
-        
-        if not author:
-            abort(404, message="Author not found.")
+        score_before = comment.score
+        result = vote(comment_id, 1)
+        author = comment.author.username if comment.author else "The author"
+        if result["score"] > score_before:
+            result["message"] = f"Upvoted! {author} gained 5 points."
+        else:
+            result["message"] = "You already upvoted this comment."
+        return result
 
-        # Action: Helpful Comment (+5 points)
-        add_points(author, 5, "Comment Upvoted")
-        
-        try:
-            db.session.commit()
-        except Exception:
-            db.session.rollback()
-            abort(500, message="Error processing upvote.")
-            
-        return {"message": f"Upvoted! {author.username} gained 5 points."}, 200
\ No newline at end of file
+
+def vote(comment_id, value):
+    comment = Comment.query.get_or_404(comment_id)
+    current_user_id = get_jwt_identity()
+    if comment.user_id == current_user_id:
+        abort(403, message="You cannot vote on your own comment.")
+
+    try:
+        score = cast_vote(comment, current_user_id, value)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        abort(500, message="Error processing vote.")
+    return {"comment_id": comment.id, "vote": value, "score": score}
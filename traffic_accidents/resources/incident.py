@@ -0,0 +1,88 @@
+from flask.views import MethodView
+from flask_smorest import Blueprint, abort
+from flask_jwt_extended import get_jwt_identity
+from sqlalchemy.exc import SQLAlchemyError
+from db import db
+from decorators import officer_required
+from models.accident import Accident
+from models.incident import Incident
+from models.user import User
+from schemas.incident import IncidentSchema, IncidentDetailSchema, IncidentQueryArgsSchema, IncidentStatusSchema
+from utils.event_broker import publish
+from utils.geo import bbox_filter
+from utils.incidents import verify_incident
+from utils.pagination import keyset_page
+from utils.query_budget import query_budget
+
+blp = Blueprint("Incidents", __name__, description="Reports of the same crash, grouped")
+blp.ETAG_INCLUDE_HEADERS = ["X-Next-Cursor"]
+
+
+def incident_detail(incident):
+    """The incident plus a marker per report (role feeds the admin id scrub)."""
+    reports = (
+        db.session.query(
+            Accident.id, Accident.latitude, Accident.longitude, Accident.severity,
+            Accident.status, Accident.created_at, Accident.incident_id, User.role.label("role")
+        )
+        .outerjoin(User, User.id == Accident.user_id)
+        .filter(Accident.incident_id == incident.id)
+        .order_by(Accident.created_at, Accident.id)
+        .all()
+    )
+    incident.report_markers = reports
+    return incident
+
+
+@blp.route("/incidents")
+class IncidentList(MethodView):
+
+    @query_budget(2)
+    @blp.etag
+    @blp.arguments(IncidentQueryArgsSchema, location="query")
+    @blp.response(200, IncidentSchema(many=True))
+    def get(self, args):
+        """List incidents newest first, one page at a time (see X-Next-Cursor)
+
+        One entry per crash however many reports it got: the map layer, and
+        with status=not_confirmed the officers' verification queue.
+        """
+        query = Incident.query
+        if "status" in args:
+            query = query.filter(Incident.status == args["status"])
+        if "bbox" in args:
+            query = query.filter(bbox_filter(Incident, args["bbox"]))
+        rows, next_cursor = keyset_page(query, Incident.created_at, Incident.id, args["limit"], args.get("cursor"))
+        headers = {"X-Next-Cursor": next_cursor} if next_cursor else {}
+        return rows, headers
+
+
+@blp.route("/incidents/<string:incident_id>")
+class IncidentDetail(MethodView):
+
+    @query_budget(2)
+    @blp.etag
+    @blp.response(200, IncidentDetailSchema)
+    def get(self, incident_id):
+        """An incident with the reports merged into it"""
+        return incident_detail(Incident.query.get_or_404(incident_id))
+
+
+@blp.route("/incidents/<string:incident_id>/status")
+class IncidentStatus(MethodView):
+
+    @officer_required
+    @blp.arguments(IncidentStatusSchema)
+    @blp.response(200, IncidentDetailSchema)
+    def put(self, status_data, incident_id):
+        """Officer/Admin: confirm or reject every pending report of an incident at once"""
+        incident = Incident.query.get_or_404(incident_id)
+        events = verify_incident(incident, status_data["status"], get_jwt_identity())
+        try:
+            db.session.commit()
+        except SQLAlchemyError:
+            db.session.rollback()
+            abort(500, message="Error updating incident status.")
+        for event in events:
+            publish(event)
+        return incident_detail(incident)
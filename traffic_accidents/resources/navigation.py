@@ -1,50 +1,84 @@
-from flask import request
+from flask import current_app
 from flask.views import MethodView
 from flask_smorest import Blueprint, abort
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from db import db
+from sqlalchemy.orm import joinedload
 from models.user import User
 from models.checkin import CheckIn
-from schemas.checkin import CheckInSchema
-from utils.gamification import add_points
+from schemas.checkin import CheckInSchema, CheckInQueryArgsSchema
+from schemas.route import RouteHazardQuerySchema, RouteHazardsSchema
+from utils.checkins import checkin_buffer
+from utils.pagination import keyset_page
+from utils.query_budget import query_budget
+from utils.route_hazards import route_hazards
+from utils.user_cache import get_user_snapshot
+from decorators import rate_limit
 
-blp = Blueprint("Navigation", __name__, description="Safe zone check-ins")
+blp = Blueprint("Navigation", __name__, description="Safe zone check-ins and hazards along a route")
 
 @blp.route("/safe-checkin")
 class SafeCheckIn(MethodView):
     
     @jwt_required()
+    @query_budget(1)
+    @blp.arguments(CheckInQueryArgsSchema, location="query")
     @blp.response(200, CheckInSchema(many=True))
-    def get(self):
-        """List all recent safe zone check-ins"""
-        return CheckIn.query.order_by(CheckIn.created_at.desc()).all()
+    def get(self, args):
+        """List safe zone check-ins newest first, one page at a time (see X-Next-Cursor)
+
+        Check-ins are written in batches, so the newest few seconds may not be listed yet.
+        """
+        # Only the username is shown, so only that comes along in the join
+        query = CheckIn.query.options(joinedload(CheckIn.user).load_only(User.id, User.username))
+        rows, next_cursor = keyset_page(query, CheckIn.created_at, CheckIn.id, args["limit"], args.get("cursor"))
+        headers = {"X-Next-Cursor": next_cursor} if next_cursor else {}
+        return rows, headers
 
     @jwt_required()
+    @rate_limit("6/minute")
     @blp.arguments(CheckInSchema)
     def post(self, checkin_data):
-        """Create a check-in and earn points"""
+        """Create a check-in and earn points
+
+        The check-in and its points are written shortly after the response
+        (see utils/checkins.py); 503 means the writes are backed up.
+        """
         user_id = get_jwt_identity()
-        user = User.query.get_or_404(user_id)
-        
-        # 1. Create the database record
-        new_checkin = CheckIn(
-            user_id=user_id,
-            latitude=checkin_data["latitude"],
-            longitude=checkin_data["longitude"],
-            location_name=checkin_data.get("location_name", "Unknown Location")
+        if not get_user_snapshot(user_id):
+            abort(404, message="User not found.")
+
+        checkin = checkin_buffer.add(
+            user_id,
+            checkin_data["latitude"],
+            checkin_data["longitude"],
+            checkin_data.get("location_name", "Unknown Location"),
         )
-        
-        # 2. Award points
-        add_points(user, 2, "Safe Zone Confirmation")
-        
-        try:
-            db.session.add(new_checkin)
-            db.session.commit()
-        except Exception:
-            db.session.rollback()
-            abort(500, message="Error saving check-in.")
-        
+        if checkin is None:
+            abort(503, message="Check-ins are backed up, please try again shortly.", headers={"Retry-After": "5"})
+
+        points = current_app.config.get("CHECKIN_POINTS", 2)
         return {
-            "message": "Check-in successful! +2 points awarded.",
-            "location": new_checkin.location_name
-        }, 201
\ No newline at end of file
+            "message": f"Check-in successful! +{points} points awarded.",
+            "id": checkin["id"],
+            "location": checkin["location_name"]
+        }, 202
+
+
+@blp.route("/navigation/hazards")
+class RouteHazards(MethodView):
+
+    # Index ranges go out in batches of 200 (a long route needs a few), plus the closed routes
+    @query_budget(6)
+    @rate_limit("30/minute", per="ip")
+    @blp.arguments(RouteHazardQuerySchema)
+    @blp.response(200, RouteHazardsSchema)
+    def post(self, args):
+        """Active accidents and closed routes along a route, with a risk score per segment
+
+        POST because a route can run to thousands of points. Accidents within
+        buffer_m of the path count, false reports and those older than
+        ROUTE_HAZARD_MAX_AGE_HOURS do not; each is attributed to its nearest
+        segment, and risk adds up the severities (reports merged into one
+        incident count once).
+        """
+        return route_hazards(args["path"], args["buffer_m"])
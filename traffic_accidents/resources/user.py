@@ -3,10 +3,17 @@ from flask_smorest import Blueprint, abort
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from models.user import User, UserStatus
 from schemas.user import UserSchema, LeaderboardUserSchema, AdminApplicationSchema # Ensure these exist in schemas
+from schemas.user import LeaderboardArgsSchema, LeaderboardWindowArgsSchema, LeaderboardWindowSchema
 from decorators import admin_required
 from db import db
 from flask import request
-from werkzeug.security import generate_password_hash
+from utils.passwords import hash_password
+from utils.mailer import outbox
+from utils.notifications import queue_status_email
+from utils.query_plans import allow_full_scan
+from utils.user_cache import invalidate_user, load_user
+from utils.leaderboard import leaderboard_page, leaderboard_window, period_leaderboard
+from utils.pagination import encode_token
 
 blp = Blueprint("Users", __name__, description="Operations on users")
 
@@ -16,28 +23,46 @@ class UserProfile(MethodView):
     @blp.response(200, UserSchema)
     def get(self):
         """Get the current user's points and badges"""
-        user_id = get_jwt_identity()
-        return User.query.get_or_404(user_id)
+        user = load_user(get_jwt_identity())
+        if not user:
+            abort(404, message="User not found.")
+        return user
 
 @blp.route("/leaderboard")
 class Leaderboard(MethodView):
     # Use the specific Leaderboard schema we created
+    @blp.arguments(LeaderboardArgsSchema, location="query")
     @blp.response(200, LeaderboardUserSchema(many=True))
-    def get(self):
-        """List the top 10 users with their rank and badges"""
-        users = User.query.order_by(User.points.desc()).limit(10).all()
-        
-        # Add a dynamic rank to each user object for the response
-        for index, user in enumerate(users):
-            user.rank = index + 1
-            
-        return users
+    def get(self, args):
+        """List ranked users, top 10 by default (see X-Next-Cursor for the next page)"""
+        if args["period"] != "all":
+            start = args.get("start", 1)
+            entries, has_more = period_leaderboard(args["period"], args["limit"], start)
+            headers = {"X-Next-Start": str(start + args["limit"])} if has_more else {}
+            return entries, headers
+        users, next_cursor = leaderboard_page(args["limit"], args.get("cursor"), args.get("start"))
+        headers = {"X-Next-Cursor": encode_token(list(next_cursor))} if next_cursor else {}
+        return users, headers
+
+@blp.route("/leaderboard/me")
+class LeaderboardMe(MethodView):
+    @jwt_required()
+    @blp.arguments(LeaderboardWindowArgsSchema, location="query")
+    @blp.response(200, LeaderboardWindowSchema)
+    def get(self, args):
+        """Current user's rank with the k users ranked just above and below"""
+        user = load_user(get_jwt_identity())
+        if not user:
+            abort(404, message="User not found.")
+        window = leaderboard_window(user, args["k"])
+        return {"rank": user.rank, "points": user.points, "window": window}
 
 @blp.route("/admin/users")
 class AdminUserList(MethodView):
     @jwt_required()
     @admin_required
     @blp.response(200, UserSchema(many=True))
+    @allow_full_scan
     def get(self):
         """Admin only: List all users in the system"""
         return User.query.all()
@@ -60,10 +85,10 @@ class AdminUserStatus(MethodView):
         else:
             abort(400, message="Invalid status. Use 'approved' or 'rejected'.")
 
+        queue_status_email(user, new_status)
         db.session.commit()
-        
-        # Here is where you would trigger a real email to the officer
-        print(f"NOTIFICATION: User {user.username} has been {new_status}!")
+        invalidate_user(user.id)
+        outbox.notify()
         
         return {"message": f"User account {new_status}."}, 200
     
@@ -82,7 +107,7 @@ class AdminRegister(MethodView):
         # 2. Create the Admin
         new_admin = User(
             username=data["username"],
-            password=generate_password_hash(data["password"]),
+            password=hash_password(data["password"]),
             role="admin",
             status=UserStatus.APPROVED,
             full_name=data.get("full_name"),
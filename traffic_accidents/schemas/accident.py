@@ -1,7 +1,9 @@
-from marshmallow import Schema, fields, validate, validates_schema, ValidationError
+from datetime import timezone
+from marshmallow import Schema, fields, validate, validates_schema, pre_load, post_load, ValidationError, EXCLUDE
 from schemas.comment import CommentSchema
 from schemas.user import AdminIdSecurityMixin, UserSchema
 from schemas.user import UserPublicSchema
+from utils.pagination import decode_cursor, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
 class AccidentSchema(Schema,AdminIdSecurityMixin):
     # Identity and Status
     id = fields.Str(dump_only=True)
@@ -25,6 +27,10 @@ class AccidentSchema(Schema,AdminIdSecurityMixin):
     # Media and Timestamps
     photo_url = fields.Str(dump_only=True)
     created_at = fields.DateTime(dump_only=True)
+    # Reports of the same crash share an incident (see /incidents)
+    incident_id = fields.Str(dump_only=True)
+    # Only present on near= queries
+    distance_m = fields.Float(dump_only=True)
 
     # Nested Comments
     comments = fields.List(fields.Nested(CommentSchema()), dump_only=True)
@@ -37,4 +43,200 @@ class AccidentSchema(Schema,AdminIdSecurityMixin):
             raise ValidationError(
                 "If fatalities are reported, severity must be 4 or 5.",
                 field_name="severity"
-            )
\ No newline at end of file
+            )
+
+
+class AccidentIngestSchema(AccidentSchema):
+    """One row of an official bulk feed: AccidentSchema's rules plus when it happened."""
+    class Meta:
+        unknown = EXCLUDE  # feeds carry columns we don't store
+
+    type = fields.Str()
+    latitude = fields.Float(required=True, validate=validate.Range(min=-90, max=90))
+    longitude = fields.Float(required=True, validate=validate.Range(min=-180, max=180))
+    created_at = fields.DateTime(load_default=None)
+
+    @pre_load
+    def drop_blank_cells(self, data, **kwargs):
+        # Empty CSV cells mean "not given", not ""
+        return {key: value for key, value in data.items() if value != ""}
+
+    @post_load
+    def normalize_time(self, data, **kwargs):
+        created_at = data.get("created_at")
+        if created_at is not None and created_at.tzinfo is not None:
+            data["created_at"] = created_at.astimezone(timezone.utc).replace(tzinfo=None)
+        return data
+
+
+class AccidentIngestArgsSchema(Schema):
+    format = fields.Str(
+        validate=validate.OneOf(["ndjson", "csv"]),
+        metadata={"description": "Body format; defaults from the Content-Type (text/csv or application/x-ndjson)"}
+    )
+
+
+class IngestErrorSchema(Schema):
+    line = fields.Int(dump_only=True)
+    errors = fields.Dict(dump_only=True)
+
+
+class AccidentIngestReportSchema(Schema):
+    inserted = fields.Int(dump_only=True)
+    failed = fields.Int(dump_only=True)
+    errors = fields.List(fields.Nested(IngestErrorSchema()), dump_only=True)
+    errors_truncated = fields.Bool(dump_only=True)
+
+
+class AccidentMarkerSchema(Schema, AdminIdSecurityMixin):
+    """Just enough to draw an accident on the map."""
+    id = fields.Str(dump_only=True)
+    latitude = fields.Float(dump_only=True)
+    longitude = fields.Float(dump_only=True)
+    severity = fields.Int(dump_only=True)
+    status = fields.Str(dump_only=True)
+    created_at = fields.DateTime(dump_only=True)
+    incident_id = fields.Str(dump_only=True)
+    role = fields.Str(dump_only=True)
+    distance_m = fields.Float(dump_only=True)
+
+
+def parse_coordinates(value, count):
+    try:
+        numbers = [float(part) for part in value.split(",")]
+    except ValueError:
+        raise ValidationError("Coordinates must be numbers.")
+    if len(numbers) != count:
+        raise ValidationError(f"Expected {count} comma-separated numbers.")
+    return numbers
+
+
+def validate_bbox(value):
+    west, south, east, north = parse_coordinates(value, 4)
+    if not (-90 <= south <= north <= 90 and -180 <= west <= 180 and -180 <= east <= 180):
+        raise ValidationError("Invalid bounding box.", field_name="bbox")
+
+
+class AccidentFilterArgsSchema(Schema):
+    """Filters shared by the accident list and the export."""
+    # Same order as Leaflet's LatLngBounds.toBBoxString()
+    bbox = fields.Str(metadata={"description": "Viewport as west,south,east,north (lng/lat degrees)"})
+    status = fields.Str(validate=validate.OneOf(["not_confirmed", "confirmed", "false_report"]))
+    severity_min = fields.Int(validate=validate.Range(min=1, max=5))
+    severity_max = fields.Int(validate=validate.Range(min=1, max=5))
+    since = fields.DateTime(metadata={"description": "Only accidents created at or after this time"})
+    until = fields.DateTime(metadata={"description": "Only accidents created before this time"})
+
+    @validates_schema
+    def validate_filters(self, data, **kwargs):
+        if "bbox" in data:
+            validate_bbox(data["bbox"])
+        if data.get("severity_min", 1) > data.get("severity_max", 5):
+            raise ValidationError("severity_min cannot exceed severity_max.", field_name="severity_min")
+
+    @post_load
+    def parse_filters(self, data, **kwargs):
+        if "bbox" in data:
+            data["bbox"] = tuple(parse_coordinates(data["bbox"], 4))
+        # created_at is stored as naive UTC
+        for key in ("since", "until"):
+            if key in data and data[key].tzinfo is not None:
+                data[key] = data[key].astimezone(timezone.utc).replace(tzinfo=None)
+        return data
+
+
+class AccidentQueryArgsSchema(AccidentFilterArgsSchema):
+    near = fields.Str(metadata={"description": "Search centre as lat,lng"})
+    radius_m = fields.Float(
+        validate=validate.Range(min=1, max=500000),
+        metadata={"description": "With near: only accidents within this many metres"}
+    )
+    k = fields.Int(
+        validate=validate.Range(min=1, max=500),
+        metadata={"description": "With near: the k nearest accidents"}
+    )
+    # Projections
+    view = fields.Str(
+        load_default="full", validate=validate.OneOf(["full", "marker"]),
+        metadata={"description": "marker: AccidentMarker objects (id, position, severity, status, created_at)"}
+    )
+    field_names = fields.Str(
+        data_key="fields",
+        metadata={"description": "Comma-separated accident fields to return, e.g. id,latitude,longitude"}
+    )
+    # Keyset pagination, newest first
+    limit = fields.Int(load_default=DEFAULT_PAGE_SIZE, validate=validate.Range(min=1, max=MAX_PAGE_SIZE))
+    cursor = fields.Str(metadata={"description": "Value of the X-Next-Cursor header from the previous page"})
+
+    @validates_schema
+    def validate_modes(self, data, **kwargs):
+        if "near" in data:
+            lat, lng = parse_coordinates(data["near"], 2)
+            if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+                raise ValidationError("Invalid coordinates.", field_name="near")
+            if "radius_m" not in data and "k" not in data:
+                raise ValidationError("near requires radius_m or k.", field_name="near")
+            if "bbox" in data:
+                raise ValidationError("Use either bbox or near, not both.", field_name="near")
+            if "cursor" in data:
+                raise ValidationError("near results are ordered by distance and cannot be paged.", field_name="cursor")
+        elif "radius_m" in data or "k" in data:
+            raise ValidationError("radius_m and k require near.", field_name="near")
+        if "field_names" in data:
+            if data.get("view") == "marker":
+                raise ValidationError("Use either view=marker or fields, not both.", field_name="fields")
+            unknown = set(data["field_names"].split(",")) - set(AccidentSchema().dump_fields)
+            if unknown:
+                raise ValidationError(f"Unknown fields: {', '.join(sorted(unknown))}.", field_name="fields")
+        if "cursor" in data:
+            try:
+                decode_cursor(data["cursor"])
+            except ValueError as e:
+                raise ValidationError(str(e), field_name="cursor")
+
+    @post_load
+    def parse_geometry(self, data, **kwargs):
+        if "near" in data:
+            data["near"] = tuple(parse_coordinates(data["near"], 2))
+        if "cursor" in data:
+            data["cursor"] = decode_cursor(data["cursor"])
+        if "field_names" in data:
+            data["fields"] = data.pop("field_names").split(",")
+        return data
+
+
+class AccidentExportArgsSchema(AccidentFilterArgsSchema):
+    format = fields.Str(load_default="csv", validate=validate.OneOf(["csv", "geojson", "ndjson"]))
+
+
+class AccidentStreamArgsSchema(Schema):
+    bbox = fields.Str(metadata={"description": "Only push accidents inside west,south,east,north (deletions always come through)"})
+    last_event_id = fields.Int(
+        validate=validate.Range(min=0),
+        metadata={"description": "Resume after this event id; browsers send the Last-Event-ID header instead"}
+    )
+
+    @validates_schema
+    def validate_bbox(self, data, **kwargs):
+        if "bbox" in data:
+            validate_bbox(data["bbox"])
+
+    @post_load
+    def parse_bbox(self, data, **kwargs):
+        if "bbox" in data:
+            data["bbox"] = tuple(parse_coordinates(data["bbox"], 4))
+        return data
+
+
+class AccidentChangesArgsSchema(Schema):
+    since = fields.Int(
+        validate=validate.Range(min=0),
+        metadata={"description": "Token from a previous call or from the X-Changes-Token header"}
+    )
+
+
+class AccidentChangesSchema(Schema):
+    token = fields.Str(dump_only=True)
+    accidents = fields.List(fields.Nested(AccidentSchema()), dump_only=True)
+    deleted = fields.List(fields.Str(), dump_only=True)
+    has_more = fields.Bool(dump_only=True)
@@ -0,0 +1,22 @@
+from marshmallow import Schema, fields, validate
+
+class AnalyticsArgsSchema(Schema):
+    days = fields.Int(
+        validate=validate.Range(min=1, max=3660),
+        metadata={"description": "Only count the last N days (default: all time)"}
+    )
+
+class WeekdayBucketSchema(Schema):
+    day = fields.Str()
+    severe = fields.Int()
+    moderate = fields.Int()
+
+class AccidentSummarySchema(Schema):
+    total = fields.Int()
+    casualties_injured = fields.Int()
+    casualties_dead = fields.Int()
+    by_status = fields.Dict(keys=fields.Str(), values=fields.Int())
+    by_severity = fields.Dict(keys=fields.Str(), values=fields.Int())
+    by_weekday = fields.List(fields.Nested(WeekdayBucketSchema()))
+    by_hour = fields.List(fields.Int())  # 24 UTC buckets
+    by_day = fields.Dict(keys=fields.Str(), values=fields.Int())
@@ -1,4 +1,5 @@
-from marshmallow import Schema, fields
+from marshmallow import Schema, fields, validate, validates_schema, post_load, ValidationError
+from utils.pagination import decode_cursor, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
 
 class CheckInSchema(Schema):
     id = fields.Str(dump_only=True)
@@ -6,4 +7,23 @@ class CheckInSchema(Schema):
     longitude = fields.Float(required=True)
     location_name = fields.Str()
     created_at = fields.DateTime(dump_only=True)
-    username = fields.Function(lambda obj: obj.user.username) # Shows who checked in
\ No newline at end of file
+    username = fields.Function(lambda obj: obj.user.username) # Shows who checked in
+
+
+class CheckInQueryArgsSchema(Schema):
+    limit = fields.Int(load_default=DEFAULT_PAGE_SIZE, validate=validate.Range(min=1, max=MAX_PAGE_SIZE))
+    cursor = fields.Str(metadata={"description": "Value of the X-Next-Cursor header from the previous page"})
+
+    @validates_schema
+    def validate_cursor(self, data, **kwargs):
+        if "cursor" in data:
+            try:
+                decode_cursor(data["cursor"])
+            except ValueError as e:
+                raise ValidationError(str(e), field_name="cursor")
+
+    @post_load
+    def parse_cursor(self, data, **kwargs):
+        if "cursor" in data:
+            data["cursor"] = decode_cursor(data["cursor"])
+        return data
@@ -1,11 +1,37 @@
-from marshmallow import Schema, fields
+from marshmallow import Schema, fields, validate
 from schemas.user import AdminIdSecurityMixin, UserPublicSchema
 class CommentSchema(Schema,AdminIdSecurityMixin):
     id = fields.Int(dump_only=True)
     content = fields.Str(required=True)
     role = fields.Str(attribute="author.role", dump_only=True)
     created_at = fields.DateTime(dump_only=True)
+    score = fields.Int(dump_only=True)
     author = fields.Nested(UserPublicSchema(), dump_only=True)
     # This reaches into the 'author' relationship in the Model 
     # and pulls only the 'username'
-    username = fields.String(attribute="author.username", dump_only=True)
\ No newline at end of file
+    username = fields.String(attribute="author.username", dump_only=True)
+
+
+class CommentListArgsSchema(Schema):
+    sort = fields.Str(
+        load_default="oldest", validate=validate.OneOf(["oldest", "score"]),
+        metadata={"description": "oldest: thread order; score: highest voted first"}
+    )
+
+
+class CommentVoteSchema(Schema):
+    value = fields.Int(
+        load_default=1, validate=validate.OneOf([1, -1, 0]),
+        metadata={"description": "1 up, -1 down, 0 withdraws your vote"}
+    )
+
+
+class CommentVoteResultSchema(Schema):
+    comment_id = fields.Int()
+    vote = fields.Int()
+    score = fields.Int()
+
+
+class CommentUpvoteResultSchema(CommentVoteResultSchema):
+    # What /comments/<id>/upvote returned before votes were recorded
+    message = fields.Str()
@@ -0,0 +1,48 @@
+from marshmallow import Schema, fields, validate, validates_schema, post_load, ValidationError
+from schemas.accident import AccidentMarkerSchema, parse_coordinates, validate_bbox
+from utils.pagination import decode_cursor, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+
+
+class IncidentSchema(Schema):
+    id = fields.Str(dump_only=True)
+    status = fields.Str(dump_only=True)
+    latitude = fields.Float(dump_only=True)
+    longitude = fields.Float(dump_only=True)
+    severity = fields.Int(dump_only=True)
+    report_count = fields.Int(dump_only=True)
+    created_at = fields.DateTime(dump_only=True)
+    last_reported_at = fields.DateTime(dump_only=True)
+
+
+class IncidentDetailSchema(IncidentSchema):
+    # Filled in by the handler as plain rows, see resources/incident.py
+    reports = fields.List(fields.Nested(AccidentMarkerSchema()), attribute="report_markers", dump_only=True)
+
+
+class IncidentQueryArgsSchema(Schema):
+    bbox = fields.Str(metadata={"description": "Viewport as west,south,east,north (lng/lat degrees)"})
+    status = fields.Str(validate=validate.OneOf(["not_confirmed", "confirmed", "false_report"]))
+    limit = fields.Int(load_default=DEFAULT_PAGE_SIZE, validate=validate.Range(min=1, max=MAX_PAGE_SIZE))
+    cursor = fields.Str(metadata={"description": "Value of the X-Next-Cursor header from the previous page"})
+
+    @validates_schema
+    def validate_args(self, data, **kwargs):
+        if "bbox" in data:
+            validate_bbox(data["bbox"])
+        if "cursor" in data:
+            try:
+                decode_cursor(data["cursor"])
+            except ValueError as e:
+                raise ValidationError(str(e), field_name="cursor")
+
+    @post_load
+    def parse_args(self, data, **kwargs):
+        if "bbox" in data:
+            data["bbox"] = tuple(parse_coordinates(data["bbox"], 4))
+        if "cursor" in data:
+            data["cursor"] = decode_cursor(data["cursor"])
+        return data
+
+
+class IncidentStatusSchema(Schema):
+    status = fields.Str(required=True, validate=validate.OneOf(["confirmed", "false_report"]))
@@ -0,0 +1,49 @@
+from marshmallow import Schema, fields, validate, validates_schema, ValidationError
+from schemas.accident import AccidentMarkerSchema
+
+MAX_ROUTE_POINTS = 5000
+
+
+class RouteHazardQuerySchema(Schema):
+    path = fields.List(
+        fields.List(fields.Float(), validate=validate.Length(equal=2)),
+        required=True, validate=validate.Length(min=2, max=MAX_ROUTE_POINTS),
+        metadata={"description": "The route as [[lat, lng], ...], e.g. from the routing engine's geometry"}
+    )
+    buffer_m = fields.Float(
+        load_default=100, validate=validate.Range(min=1, max=5000),
+        metadata={"description": "How far either side of the route counts, in metres"}
+    )
+
+    @validates_schema
+    def validate_path(self, data, **kwargs):
+        for lat, lng in data.get("path", []):
+            if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+                raise ValidationError("Invalid coordinates.", field_name="path")
+
+
+class ClosedRouteSchema(Schema):
+    id = fields.Str(dump_only=True)
+    route_name = fields.Str(dump_only=True)
+    accident_id = fields.Str(dump_only=True)
+
+
+class RouteSegmentSchema(Schema):
+    index = fields.Int(dump_only=True, metadata={"description": "Segment from path[index] to path[index + 1]"})
+    length_m = fields.Float(dump_only=True)
+    accident_count = fields.Int(dump_only=True)
+    risk = fields.Float(dump_only=True, metadata={"description": "Sum of the severities of the crashes closest to this segment"})
+    risk_per_km = fields.Float(dump_only=True)
+
+
+class RouteHazardSchema(AccidentMarkerSchema):
+    segment = fields.Int(dump_only=True)
+
+
+class RouteHazardsSchema(Schema):
+    buffer_m = fields.Float(dump_only=True)
+    length_m = fields.Float(dump_only=True)
+    risk = fields.Float(dump_only=True)
+    segments = fields.List(fields.Nested(RouteSegmentSchema()), dump_only=True)
+    accidents = fields.List(fields.Nested(RouteHazardSchema()), dump_only=True)
+    closed_routes = fields.List(fields.Nested(ClosedRouteSchema()), dump_only=True)
@@ -1,5 +1,6 @@
-from marshmallow import Schema, fields, post_dump, validate, ValidationError
+from marshmallow import Schema, fields, post_dump, post_load, validate, validates_schema, ValidationError
 import re
+from utils.pagination import decode_token
 
 class AdminIdSecurityMixin:
     @post_dump
@@ -57,6 +58,49 @@ class LeaderboardUserSchema(Schema):
     points = fields.Int(dump_only=True)
     badges = fields.Str(dump_only=True)
 
+class LeaderboardArgsSchema(Schema):
+    period = fields.Str(
+        load_default="all", validate=validate.OneOf(["all", "week", "month"]),
+        metadata={"description": "all: lifetime points; week/month: points earned this calendar week/month (UTC)"}
+    )
+    limit = fields.Int(load_default=10, validate=validate.Range(min=1, max=100))
+    start = fields.Int(
+        validate=validate.Range(min=1),
+        metadata={"description": "1-based position to start from"}
+    )
+    cursor = fields.Str(metadata={"description": "Value of the X-Next-Cursor header from the previous page"})
+
+    @validates_schema
+    def validate_cursor(self, data, **kwargs):
+        if "cursor" in data:
+            if data.get("period", "all") != "all":
+                raise ValidationError("Weekly and monthly boards page with start, not cursor.", field_name="cursor")
+            if "start" in data:
+                raise ValidationError("Use either start or cursor, not both.", field_name="cursor")
+            try:
+                points, user_id = decode_token(data["cursor"])
+            except (TypeError, ValueError):
+                raise ValidationError("Invalid cursor.", field_name="cursor")
+            if not isinstance(points, int) or not isinstance(user_id, str):
+                raise ValidationError("Invalid cursor.", field_name="cursor")
+
+    @post_load
+    def parse_cursor(self, data, **kwargs):
+        if "cursor" in data:
+            data["cursor"] = tuple(decode_token(data["cursor"]))
+        return data
+
+class LeaderboardWindowArgsSchema(Schema):
+    k = fields.Int(
+        load_default=5, validate=validate.Range(min=0, max=50),
+        metadata={"description": "Neighbours to include on each side"}
+    )
+
+class LeaderboardWindowSchema(Schema):
+    rank = fields.Int(dump_only=True)
+    points = fields.Int(dump_only=True)
+    window = fields.List(fields.Nested(LeaderboardUserSchema()), dump_only=True)
+
 class UserPublicSchema(Schema):
     username = fields.Str(dump_only=True)
     points = fields.Int(dump_only=True)
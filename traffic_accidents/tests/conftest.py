@@ -0,0 +1,81 @@
+from contextlib import contextmanager
+import pytest
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event
+from app import create_app
+from blocklist import blocklist
+from db import db
+from models.accident import Accident
+from models.comment import Comment
+from models.user import User, UserStatus
+from utils import user_cache
+from utils.rate_limit import limiter
+
+
+@pytest.fixture
+def app():
+    """The testing profile on a fresh in-memory database (strict query budgets and plan checks)."""
+    # Process-wide caches outlive an app; start each test from scratch
+    user_cache._cache.clear()
+    blocklist.__init__()
+    limiter.memory.__init__()
+    app = create_app("testing")
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def make_user(app):
+    """make_user(username, role="user", points=0) -> (user id, auth headers)."""
+    def make(username, role="user", points=0):
+        with app.app_context():
+            user = User(username=username, password="unused", role=role, points=points,
+                        status=UserStatus.APPROVED)
+            db.session.add(user)
+            db.session.commit()
+            token = create_access_token(identity=user.id)
+            return user.id, {"Authorization": f"Bearer {token}"}
+    return make
+
+
+@pytest.fixture
+def make_accident(app):
+    """make_accident(user_id, commenters=(user ids...), **columns) -> accident id."""
+    def make(user_id, latitude=36.8, longitude=10.1, severity=3, commenters=(), **fields):
+        with app.app_context():
+            accident = Accident(user_id=user_id, latitude=latitude, longitude=longitude, severity=severity,
+                                description="Two cars at the roundabout", **fields)
+            db.session.add(accident)
+            db.session.flush()
+            for n, commenter_id in enumerate(commenters):
+                db.session.add(Comment(content=f"comment {n}", accident_id=accident.id, user_id=commenter_id))
+            db.session.commit()
+            return accident.id
+    return make
+
+
+@pytest.fixture
+def count_queries(app):
+    """with count_queries() as statements: ... -> every SQL statement sent meanwhile."""
+    @contextmanager
+    def counter():
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        with app.app_context():
+            engine = db.engine
+        event.listen(engine, "before_cursor_execute", record)
+        try:
+            yield statements
+        finally:
+            event.remove(engine, "before_cursor_execute", record)
+    return counter
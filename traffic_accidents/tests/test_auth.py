@@ -0,0 +1,45 @@
+import pytest
+from db import db
+from models.user import User, UserStatus
+from utils import passwords
+
+
+@pytest.fixture
+def hashes(monkeypatch):
+    """Records the stored hash every password check runs against."""
+    seen = []
+    verify = passwords._verify
+
+    def recording_verify(password, stored, rounds):
+        seen.append(stored)
+        return verify(password, stored, rounds)
+
+    monkeypatch.setattr(passwords, "_verify", recording_verify)
+    return seen
+
+
+@pytest.fixture
+def driver(app):
+    with app.app_context():
+        hashed = passwords.hash_password("Passw0rd!")
+        db.session.add(User(username="driver", password=hashed, status=UserStatus.APPROVED))
+        db.session.commit()
+        return hashed
+
+
+def test_login_succeeds_with_the_right_password(client, driver):
+    response = client.post("/login", json={"username": "driver", "password": "Passw0rd!"})
+    assert response.status_code == 200
+    assert response.get_json()["access_token"]
+
+
+def test_unknown_username_costs_a_hash_like_a_wrong_password(client, driver, hashes):
+    wrong = client.post("/login", json={"username": "driver", "password": "nope"})
+    unknown = client.post("/login", json={"username": "nobody", "password": "nope"})
+
+    assert wrong.status_code == unknown.status_code == 401
+    assert wrong.get_json()["message"] == unknown.get_json()["message"]
+    assert len(hashes) == 2
+    # Same scheme and cost as a real hash, so both checks take as long
+    assert hashes[1] != driver
+    assert hashes[1].rsplit("$", 2)[0] == driver.rsplit("$", 2)[0]
@@ -0,0 +1,124 @@
+"""Check-ins: the write-behind buffer and the compaction of old rows into daily summaries."""
+import uuid
+from datetime import datetime, timedelta
+import pytest
+from db import db
+from models.checkin import CheckIn, CheckInSummary
+from models.points import PointsLedger
+from models.user import User
+from utils import checkins
+from utils.checkins import CheckInBuffer, compact_checkins, SUMMARY_PRECISION
+from utils.geo import encode_geohash
+
+
+@pytest.fixture
+def buffer(app, monkeypatch):
+    """A buffer that only writes when flushed by the test."""
+    app.config["BACKGROUND_INLINE"] = False
+    buffer = CheckInBuffer()
+    monkeypatch.setattr(buffer, "start", lambda app: None)
+    return buffer
+
+
+def check_in(app, buffer, user_id, longitude=10.1):
+    with app.app_context():
+        return buffer.add(user_id, 36.8, longitude, "Lac")["id"]
+
+
+def flush(app, buffer):
+    with app.app_context():
+        return buffer.flush()
+
+
+def test_flush_awards_points_once_per_user(app, buffer, make_user):
+    busy, _ = make_user("busy")
+    quiet, _ = make_user("quiet")
+    for _ in range(3):
+        check_in(app, buffer, busy)
+    check_in(app, buffer, quiet)
+    assert buffer.pending() == 4
+
+    assert flush(app, buffer) == 4
+    assert buffer.pending() == 0
+    with app.app_context():
+        assert CheckIn.query.count() == 4
+        ledger = {row.user_id: row.delta for row in PointsLedger.query}
+        assert ledger == {busy: 6, quiet: 2}  # one ledger row each
+        assert db.session.get(User, busy).points == 6
+
+
+def test_failed_flush_puts_rows_back_in_front(app, buffer, make_user, monkeypatch):
+    user_id, _ = make_user("driver")
+    first = [check_in(app, buffer, user_id, 10.1 + n / 100) for n in range(2)]
+
+    def broken(rows):
+        raise RuntimeError("database is locked")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(checkins, "write_checkins", broken)
+        with pytest.raises(RuntimeError):
+            flush(app, buffer)
+    later = check_in(app, buffer, user_id, 10.5)
+    assert [row["id"] for row in buffer._rows] == first + [later]
+
+    assert flush(app, buffer) == 3
+    with app.app_context():
+        assert {row.id for row in CheckIn.query} == set(first + [later])
+
+
+def test_rows_of_deleted_users_are_dropped(app, buffer, make_user):
+    user_id, _ = make_user("driver")
+    check_in(app, buffer, user_id)
+    check_in(app, buffer, str(uuid.uuid4()))  # account deleted since
+    assert flush(app, buffer) == 1
+    with app.app_context():
+        assert [row.user_id for row in CheckIn.query] == [user_id]
+
+
+def old_checkin(user_id, latitude, longitude, name, days_ago):
+    created_at = datetime.combine(datetime.utcnow().date() - timedelta(days=days_ago), datetime.min.time())
+    db.session.add(CheckIn(user_id=user_id, latitude=latitude, longitude=longitude, location_name=name,
+                           created_at=created_at + timedelta(hours=9)))
+
+
+def summaries(app):
+    with app.app_context():
+        return {summary.cell: summary for summary in CheckInSummary.query}
+
+
+def test_compaction_summarizes_per_cell_and_day(app, make_user):
+    ids = [make_user(f"driver{n}")[0] for n in range(3)]
+    with app.app_context():
+        old_checkin(ids[0], 36.80000, 10.10000, "Lac", 100)
+        old_checkin(ids[1], 36.80002, 10.10002, "Lac", 100)
+        old_checkin(ids[1], 36.80004, 10.10004, "Lake", 100)
+        old_checkin(ids[2], 35.0, 9.0, None, 100)
+        old_checkin(ids[2], 35.0, 9.0, None, 101)
+        old_checkin(ids[0], 36.8, 10.1, "Lac", 1)  # within retention
+        db.session.commit()
+        assert compact_checkins(90) == (5, 2)
+        assert CheckIn.query.count() == 1
+
+    cell = encode_geohash(36.8, 10.1, SUMMARY_PRECISION)
+    lake = summaries(app)[cell]
+    assert (lake.checkin_count, lake.user_count, lake.location_name) == (3, 2, "Lac")
+    assert lake.latitude == pytest.approx((36.8 + 36.80002 + 36.80004) / 3, abs=1e-9)
+    with app.app_context():
+        assert CheckInSummary.query.count() == 3  # two days at the far cell
+
+
+def test_late_rows_merge_into_a_compacted_day(app, make_user):
+    ids = [make_user(f"driver{n}")[0] for n in range(3)]
+    with app.app_context():
+        old_checkin(ids[0], 36.80000, 10.1, "Lac", 100)
+        old_checkin(ids[1], 36.80002, 10.1, "Lac", 100)
+        db.session.commit()
+        compact_checkins(90)
+        # A straggler for the same day, e.g. written by a buffer that flushed late
+        old_checkin(ids[2], 36.80006, 10.1, None, 100)
+        db.session.commit()
+        assert compact_checkins(90) == (1, 1)
+
+    (lake,) = summaries(app).values()
+    assert (lake.checkin_count, lake.user_count, lake.location_name) == (3, 3, "Lac")
+    assert lake.latitude == pytest.approx((36.8 + 36.80002 + 36.80006) / 3, abs=1e-9)
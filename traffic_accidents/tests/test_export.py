@@ -0,0 +1,25 @@
+"""Exports read whole tables on purpose; the streamed body must survive the full-scan check."""
+import json
+import pytest
+from sqlalchemy import text
+from db import db
+
+
+@pytest.mark.parametrize("export_format", ["csv", "geojson", "ndjson"])
+def test_export_streams_every_accident(app, client, make_user, make_accident, export_format):
+    user_id, _ = make_user("reporter")
+    ids = {make_accident(user_id, latitude=36.8 + n / 100) for n in range(3)}
+    with app.app_context():
+        # Without the feed index the planner has to scan, as it may for any filtered export
+        db.session.execute(text("DROP INDEX ix_accidents_created_at_id"))
+        db.session.commit()
+
+    response = client.get(f"/accidents/export?format={export_format}&severity_min=2")
+    body = response.get_data(as_text=True)  # the plan check runs while the body is generated
+    assert response.status_code == 200
+    if export_format == "geojson":
+        assert {feature["properties"]["id"] for feature in json.loads(body)["features"]} == ids
+    elif export_format == "ndjson":
+        assert {json.loads(line)["id"] for line in body.splitlines()} == ids
+    else:
+        assert all(accident_id in body for accident_id in ids)
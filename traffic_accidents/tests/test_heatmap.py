@@ -0,0 +1,35 @@
+"""Incremental heat updates: batched per write, and in step with a full rebuild."""
+from db import db
+from models.heatmap_cell import HeatmapCell
+from utils.heatmap import add_heat, rebuild_heatmap
+
+
+def heat(app):
+    with app.app_context():
+        return {(c.z, c.tx, c.ty, c.cell): c.weight for c in HeatmapCell.query if c.weight}
+
+
+def test_add_heat_is_one_batch_for_every_zoom(app, count_queries):
+    with count_queries() as statements:
+        with app.app_context():
+            add_heat(36.8, 10.1, 3.0)
+            db.session.commit()
+    # Insert the missing cells, add the weights, commit
+    assert len([s for s in statements if s.lstrip().upper().startswith(("INSERT", "UPDATE"))]) == 2
+
+
+def test_writes_keep_the_heatmap_in_step_with_a_rebuild(app, make_user, make_accident, client):
+    user_id, headers = make_user("reporter")
+    make_accident(user_id, latitude=36.8, longitude=10.1, severity=4)
+    doomed = make_accident(user_id, latitude=-33.9, longitude=151.2, severity=2)
+    with app.app_context():
+        add_heat(36.8, 10.1, 4.0)  # make_accident bypasses the handlers' bookkeeping
+        add_heat(-33.9, 151.2, 2.0)
+        db.session.commit()
+    assert client.delete(f"/accidents/{doomed}", headers=headers).status_code == 200
+
+    incremental = heat(app)
+    with app.app_context():
+        rebuild_heatmap()
+    assert incremental == heat(app)
+    assert len({key[0] for key in incremental}) == 15  # zooms 0-14
@@ -0,0 +1,45 @@
+"""Deleting a report recomputes its incident from the reports that remain."""
+import pytest
+from db import db
+from models.accident import Accident
+from models.incident import Incident
+from utils.incidents import assign_incident
+
+
+@pytest.fixture
+def reports(app, make_user):
+    """Three reports of one crash: [(accident id, auth headers)], the last one the most severe."""
+    made = []
+    with app.app_context():
+        for n, (latitude, severity) in enumerate([(36.8000, 2), (36.8002, 3), (36.8004, 5)]):
+            user_id, headers = make_user(f"witness{n}")
+            accident = Accident(user_id=user_id, latitude=latitude, longitude=10.1, severity=severity,
+                                description="Two cars at the roundabout")
+            db.session.add(accident)
+            db.session.flush()
+            assign_incident(accident)
+            db.session.commit()
+            made.append((accident.id, headers))
+    return made
+
+
+def incident_of(app, accident_id):
+    with app.app_context():
+        incident = db.session.get(Accident, accident_id).incident
+        return incident.latitude, incident.severity, incident.report_count
+
+
+def test_incident_is_recomputed_from_remaining_reports(app, client, reports):
+    (first, _), (second, _), (worst, headers) = reports
+    assert incident_of(app, first) == (pytest.approx(36.8002), 5, 3)
+
+    assert client.delete(f"/accidents/{worst}", headers=headers).status_code == 200
+    assert incident_of(app, first) == (pytest.approx(36.8001), 3, 2)
+    assert incident_of(app, second) == incident_of(app, first)
+
+
+def test_incident_goes_with_its_last_report(app, client, reports):
+    for accident_id, headers in reports:
+        assert client.delete(f"/accidents/{accident_id}", headers=headers).status_code == 200
+    with app.app_context():
+        assert Incident.query.count() == 0
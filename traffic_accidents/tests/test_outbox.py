@@ -0,0 +1,109 @@
+"""Outbox delivery against a local SMTP server (aiosmtpd on TEST_MAIL_SERVER:TEST_MAIL_PORT)."""
+from datetime import datetime, timedelta
+import pytest
+from db import db
+from models.outbox_email import OutboxEmail
+from utils.mailer import OutboxSender, outbox, queue_email
+
+controller_module = pytest.importorskip("aiosmtpd.controller")
+
+
+class RecordingHandler:
+    """Keeps what it accepts; answers 451 (try again later) to the next `fail_next` messages."""
+
+    def __init__(self):
+        self.messages = []
+        self.fail_next = 0
+
+    async def handle_DATA(self, server, session, envelope):
+        if self.fail_next:
+            self.fail_next -= 1
+            return "451 Temporary failure, try again later"
+        self.messages.append(envelope)
+        return "250 OK"
+
+
+@pytest.fixture
+def smtp(app):
+    app.config["MAIL_DEFAULT_SENDER"] = "noreply@example.com"
+    handler = RecordingHandler()
+    controller = controller_module.Controller(handler, hostname=app.config["MAIL_SERVER"], port=app.config["MAIL_PORT"])
+    controller.start()
+    yield handler
+    controller.stop()
+
+
+def queue(app, recipient="driver@example.com"):
+    with app.app_context():
+        email = queue_email(recipient, "Report confirmed", "<p>Thanks!</p>")
+        db.session.commit()
+        return email.id
+
+
+def load(app, email_id):
+    with app.app_context():
+        return db.session.get(OutboxEmail, email_id)
+
+
+def drain(app, sender=outbox):
+    with app.app_context():
+        try:
+            return sender.drain()
+        finally:
+            sender._connection.close()
+
+
+def test_delivers_queued_email(app, smtp):
+    email_id = queue(app)
+    assert drain(app) == 1
+
+    assert len(smtp.messages) == 1
+    assert smtp.messages[0].rcpt_tos == ["driver@example.com"]
+    assert b"Report confirmed" in smtp.messages[0].content
+    email = load(app, email_id)
+    assert email.status == "sent" and email.attempts == 1 and email.sent_at is not None
+
+
+def test_failed_send_is_retried_later(app, smtp):
+    smtp.fail_next = 1
+    email_id = queue(app)
+    assert drain(app) == 0
+
+    email = load(app, email_id)
+    assert email.status == "pending" and email.attempts == 1
+    assert email.last_error and "451" in email.last_error
+    assert email.next_attempt_at > datetime.utcnow()
+    # Not due yet: nothing goes out
+    assert drain(app) == 0 and smtp.messages == []
+
+    with app.app_context():
+        db.session.get(OutboxEmail, email_id).next_attempt_at = datetime.utcnow() - timedelta(seconds=1)
+        db.session.commit()
+    assert drain(app) == 1
+    assert len(smtp.messages) == 1
+    email = load(app, email_id)
+    assert email.status == "sent" and email.attempts == 2
+
+
+def test_accepted_email_is_never_sent_twice(app, smtp):
+    email_id = queue(app)
+    assert drain(app) == 1
+
+    # Even once its time comes round again, and from another worker's sender
+    with app.app_context():
+        db.session.get(OutboxEmail, email_id).next_attempt_at = datetime.utcnow() - timedelta(seconds=1)
+        db.session.commit()
+    assert drain(app) == 0
+    assert drain(app, OutboxSender()) == 0
+    assert len(smtp.messages) == 1
+
+
+def test_claimed_email_is_not_sent_by_another_sender(app, smtp):
+    queue(app)
+    with app.app_context():
+        # One worker has leased the row and is about to send it...
+        claimed = OutboxSender()._claim(10)
+        assert len(claimed) == 1
+    # ...so another worker draining at the same time leaves it alone
+    assert drain(app, OutboxSender()) == 0
+    assert smtp.messages == []
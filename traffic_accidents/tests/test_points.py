@@ -0,0 +1,78 @@
+"""Points: the ledger and the daily rollup always add up to the user's total."""
+import threading
+import time
+import pytest
+from sqlalchemy import func
+from app import create_app
+from db import db
+from models.points import PointsDaily, PointsLedger
+from models.user import User, UserStatus
+from utils.gamification import add_points
+
+
+@pytest.fixture
+def file_app(tmp_path):
+    """A file database, so two threads really run two transactions."""
+    app = create_app("testing", {"SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'points.db'}"})
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+
+def make_user(app, points):
+    with app.app_context():
+        user = User(username="driver", password="unused", points=points, status=UserStatus.APPROVED)
+        db.session.add(user)
+        db.session.commit()
+        return user.id
+
+
+def totals(app, user_id):
+    with app.app_context():
+        return (
+            db.session.get(User, user_id).points,
+            db.session.query(func.sum(PointsLedger.delta)).filter_by(user_id=user_id).scalar(),
+            db.session.query(func.sum(PointsDaily.points)).filter_by(user_id=user_id).scalar(),
+        )
+
+
+def test_penalty_is_capped_at_the_total(app):
+    user_id = make_user(app, 10)
+    with app.app_context():
+        result = add_points(db.session.get(User, user_id), -20, "False Report Penalty")
+        db.session.commit()
+    assert result["total_points"] == 0
+    assert totals(app, user_id) == (0, -10, -10)
+
+
+def test_concurrent_penalties_record_what_they_took(file_app):
+    user_id = make_user(file_app, 40)
+    first_done, release = threading.Event(), threading.Event()
+    errors = []
+
+    def penalize(hold):
+        try:
+            with file_app.app_context():
+                add_points(db.session.get(User, user_id), -30, "False Report Penalty")
+                if hold:
+                    first_done.set()
+                    release.wait(5)
+                db.session.commit()
+                db.session.remove()
+        except Exception as e:  # surfaced below
+            errors.append(e)
+
+    first = threading.Thread(target=penalize, args=(True,))
+    first.start()
+    assert first_done.wait(5)
+    # The second penalty starts while the first is still open, then must wait for it
+    second = threading.Thread(target=penalize, args=(False,))
+    second.start()
+    time.sleep(0.3)
+    release.set()
+    first.join(10)
+    second.join(10)
+
+    assert errors == []
+    assert totals(file_app, user_id) == (0, -40, -40)
@@ -0,0 +1,87 @@
+"""Late commits on PostgreSQL, where sequence values are handed out at INSERT time.
+
+Needs a scratch database: DATABASE_URL=postgresql+psycopg://... (skipped otherwise).
+"""
+import os
+import uuid
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import delete, insert
+from app import create_app
+from blocklist import blocklist
+from db import db
+from models.accident_change import AccidentChange
+from models.revoked_token import RevokedToken
+
+DATABASE_URL = os.environ.get("DATABASE_URL", "")
+pytestmark = pytest.mark.skipif(
+    not DATABASE_URL.startswith(("postgres://", "postgresql")), reason="set DATABASE_URL to a PostgreSQL database"
+)
+
+
+@pytest.fixture
+def pg_app():
+    pytest.importorskip("psycopg")
+    blocklist.__init__()
+    app = create_app("testing", {"SQLALCHEMY_DATABASE_URI": DATABASE_URL, "DATABASE_READ_URL": None})
+    yield app
+    with app.app_context():
+        with db.engine.begin() as conn:
+            conn.execute(delete(AccidentChange).where(AccidentChange.accident_id.like("pgtest-%")))
+            conn.execute(delete(RevokedToken).where(RevokedToken.jti.like("pgtest-%")))
+        db.session.remove()
+        db.engine.dispose()
+
+
+def test_change_feed_keeps_a_change_that_commits_late(pg_app):
+    client = pg_app.test_client()
+    token = client.get("/accidents/changes").get_json()["token"]
+    slow_id, fast_id = f"pgtest-{uuid.uuid4()}", f"pgtest-{uuid.uuid4()}"
+
+    with pg_app.app_context():
+        slow = db.engine.connect()
+        slow_tx = slow.begin()
+        # Takes the next seq but doesn't commit yet...
+        slow.execute(insert(AccidentChange).values(accident_id=slow_id, op="deleted"))
+        # ...while a later seq commits straight away
+        with db.engine.begin() as fast:
+            fast.execute(insert(AccidentChange).values(accident_id=fast_id, op="deleted"))
+
+    try:
+        body = client.get(f"/accidents/changes?since={token}").get_json()
+        # Handing out the later seq as the token would lose the slow change for good
+        assert slow_id not in body["deleted"]
+        assert body["token"] == token
+    finally:
+        slow_tx.commit()
+        slow.close()
+
+    body = client.get(f"/accidents/changes?since={token}").get_json()
+    assert body["deleted"] == [slow_id, fast_id]
+
+
+def test_revocation_that_commits_late_is_still_picked_up(pg_app):
+    expires_at = datetime.utcnow() + timedelta(hours=1)
+    slow_jti, fast_jti = f"pgtest-{uuid.uuid4().hex}", f"pgtest-{uuid.uuid4().hex}"
+
+    def synced(jti):
+        with pg_app.app_context():
+            blocklist._last_sync = float("-inf")
+            return blocklist.is_revoked(jti)
+
+    synced("nothing")  # catch up with rows from earlier runs
+    with pg_app.app_context():
+        slow = db.engine.connect()
+        slow_tx = slow.begin()
+        slow.execute(insert(RevokedToken).values(jti=slow_jti, expires_at=expires_at, revoked_at=datetime.utcnow()))
+        with db.engine.begin() as fast:
+            fast.execute(insert(RevokedToken).values(jti=fast_jti, expires_at=expires_at, revoked_at=datetime.utcnow()))
+
+    try:
+        assert synced(fast_jti)
+        assert not synced(slow_jti)
+    finally:
+        slow_tx.commit()
+        slow.close()
+    # Another worker's revocation must reach this one even though a later id was seen first
+    assert synced(slow_jti)
@@ -0,0 +1,89 @@
+"""Read endpoints must cost the same number of queries whatever the row count (no N+1)."""
+import re
+import pytest
+from flask import g
+from blocklist import blocklist
+from db import db
+from models.checkin import CheckIn
+from utils import user_cache
+from utils.query_budget import query_budget
+
+
+def query_count(client, count_queries, url, headers=None):
+    with count_queries() as statements:
+        response = client.get(url, headers=headers)
+    assert response.status_code == 200, response.get_json()
+    return len(statements)
+
+
+def seed_users(make_user, n, prefix="user"):
+    """n users with distinct points; returns their ids."""
+    return [make_user(f"{prefix}{n}_{i}", points=10 * i)[0] for i in range(n)]
+
+
+@pytest.mark.parametrize("url", ["/accidents", "/accidents?view=marker", "/accidents?fields=id,author,comments"])
+def test_accident_list_queries_do_not_grow_with_rows(client, make_user, make_accident, count_queries, url):
+    # Distinct reporters and commenters, so lazy loads can't hide in the identity map
+    user_id, _ = make_user("reporter")
+    make_accident(user_id, commenters=seed_users(make_user, 1, "commenter"))
+    one = query_count(client, count_queries, url)
+
+    for n in range(10):
+        other_id, _ = make_user(f"reporter{n}")
+        make_accident(other_id, commenters=seed_users(make_user, 3, f"commenter{n}_"))
+    many = query_count(client, count_queries, url)
+    assert many == one
+
+
+def test_accident_detail_queries_do_not_grow_with_comments(client, make_user, make_accident, count_queries):
+    user_id, _ = make_user("reporter")
+    few = make_accident(user_id, commenters=seed_users(make_user, 1, "few"))
+    lots = make_accident(user_id, commenters=seed_users(make_user, 20, "lots"))
+    assert query_count(client, count_queries, f"/accidents/{lots}") == query_count(client, count_queries, f"/accidents/{few}")
+
+
+@pytest.mark.parametrize("period", ["all", "week"])
+def test_leaderboard_queries_do_not_grow_with_users(client, make_user, count_queries, period):
+    seed_users(make_user, 1)
+    one = query_count(client, count_queries, f"/leaderboard?period={period}")
+    seed_users(make_user, 15)
+    many = query_count(client, count_queries, f"/leaderboard?period={period}&limit=10")
+    assert many == one
+
+
+def statement_kind(statement):
+    """("SELECT", "checkins") and the like."""
+    verb = statement.split()[0].upper()
+    return verb, re.search(r'(?:FROM|INTO|UPDATE)\s+"?(\w+)', statement).group(1)
+
+
+def test_checkin_list_budget_ignores_the_token_loaders(app, client, make_user, count_queries):
+    user_ids = seed_users(make_user, 5, "checker")
+    _, headers = make_user("reader")
+    with app.app_context():
+        for n, user_id in enumerate(user_ids):
+            db.session.add(CheckIn(user_id=user_id, latitude=36.8, longitude=10.1 + n / 100, location_name="Lac"))
+        db.session.commit()
+    # A worker that hasn't seen this user yet: the JWT loaders query before the view runs
+    user_cache._cache.clear()
+    blocklist._last_sync = float("-inf")
+    with count_queries() as statements:
+        response = client.get("/safe-checkin", headers=headers)
+    assert response.status_code == 200, response.get_json()
+    assert len(response.get_json()) == 5
+
+    kinds = [statement_kind(statement) for statement in statements]
+    # Outside the budget: revocation sync (read, then the due purge) and the user snapshot
+    assert kinds[:-1] == [("SELECT", "revoked_tokens"), ("DELETE", "revoked_tokens"), ("SELECT", "user")]
+    # Inside @query_budget(1): the page, reporters joined in
+    assert kinds[-1] == ("SELECT", "checkins")
+
+
+def test_budget_overrun_fails_under_testing(app):
+    @query_budget(1)
+    def chatty():
+        g.query_count = g.get("query_count", 0) + 2
+
+    with app.test_request_context():
+        with pytest.raises(AssertionError, match="budget 1"):
+            chatty()
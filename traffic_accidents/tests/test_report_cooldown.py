@@ -0,0 +1,27 @@
+"""One report per user every 2 minutes, across workers: the database has the last word."""
+from datetime import datetime, timedelta
+from utils.rate_limit import limiter
+
+REPORT = {"latitude": "36.8", "longitude": "10.1", "severity": "2", "description": "Two cars at the roundabout"}
+
+
+def other_worker():
+    """A fresh process-local bucket store, as in another gunicorn worker."""
+    limiter.memory.__init__()
+
+
+def test_second_report_is_refused_by_another_worker(client, make_user):
+    _, headers = make_user("reporter")
+    assert client.post("/accidents", data=REPORT, headers=headers).status_code == 201
+
+    other_worker()
+    response = client.post("/accidents", data=REPORT, headers=headers)
+    assert response.status_code == 429
+    assert 0 < int(response.headers["Retry-After"]) <= 120
+
+
+def test_cooldown_runs_out(client, make_user, make_accident):
+    user_id, headers = make_user("reporter")
+    make_accident(user_id, created_at=datetime.utcnow() - timedelta(minutes=3))
+    assert client.post("/accidents", data=REPORT, headers=headers).status_code == 201
+
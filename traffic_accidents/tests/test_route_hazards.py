@@ -0,0 +1,100 @@
+"""POST /navigation/hazards: the corridor, per-segment attribution, incidents and ±180°."""
+import math
+import pytest
+from db import db
+from models.incident import Incident
+from models.route import Route
+from utils import route_hazards
+
+
+@pytest.fixture
+def reporter(make_user):
+    return make_user("reporter")[0]
+
+
+def hazards(client, path, buffer_m=100):
+    response = client.post("/navigation/hazards", json={"path": path, "buffer_m": buffer_m})
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()
+
+
+def test_only_accidents_within_the_buffer_count(client, make_accident, reporter):
+    # ~55 m and ~330 m north of an east-west road
+    near = make_accident(reporter, latitude=36.8005, longitude=10.02)
+    far = make_accident(reporter, latitude=36.803, longitude=10.02)
+    path = [[36.8, 10.0], [36.8, 10.05]]
+
+    body = hazards(client, path)
+    assert [hit["id"] for hit in body["accidents"]] == [near]
+    assert body["accidents"][0]["distance_m"] == pytest.approx(55.6, abs=1)
+
+    wide = hazards(client, path, buffer_m=500)
+    assert {hit["id"] for hit in wide["accidents"]} == {near, far}
+
+
+def test_accidents_go_to_their_nearest_segment(client, make_accident, reporter):
+    # East along the road, then north at the junction
+    path = [[36.8, 10.0], [36.8, 10.02], [36.82, 10.02]]
+    first = make_accident(reporter, latitude=36.8003, longitude=10.01, severity=2)
+    second = make_accident(reporter, latitude=36.81, longitude=10.0203, severity=4)
+    # Next to the junction but closer to the northbound leg
+    corner = make_accident(reporter, latitude=36.8008, longitude=10.0201, severity=1)
+
+    body = hazards(client, path)
+    assert {hit["id"]: hit["segment"] for hit in body["accidents"]} == {first: 0, second: 1, corner: 1}
+    assert [(s["accident_count"], s["risk"]) for s in body["segments"]] == [(1, 2.0), (2, 5.0)]
+    assert body["risk"] == 7.0
+
+
+def test_reports_of_one_incident_count_once(app, client, make_accident, reporter):
+    with app.app_context():
+        incident = Incident(latitude=36.8004, longitude=10.02, severity=5, report_count=2)
+        db.session.add(incident)
+        db.session.commit()
+        incident_id = incident.id
+    make_accident(reporter, latitude=36.8003, longitude=10.02, severity=3, incident_id=incident_id)
+    make_accident(reporter, latitude=36.8005, longitude=10.0201, severity=5, incident_id=incident_id)
+    make_accident(reporter, latitude=36.8002, longitude=10.03, severity=2)
+
+    body = hazards(client, [[36.8, 10.0], [36.8, 10.05]])
+    assert len(body["accidents"]) == 3
+    assert body["segments"][0]["accident_count"] == 3
+    # The incident at its worst report, plus the lone crash
+    assert body["risk"] == 7.0
+
+
+def test_route_across_the_antimeridian(client, make_accident, reporter):
+    west_of_line = make_accident(reporter, latitude=-16.7003, longitude=179.995)
+    east_of_line = make_accident(reporter, latitude=-16.6997, longitude=-179.996)
+    make_accident(reporter, latitude=-16.7, longitude=0.0)
+
+    body = hazards(client, [[-16.7, 179.99], [-16.7, -179.99]])
+    # Two kilometres across the line, not the long way round the world
+    assert body["length_m"] == pytest.approx(2131, rel=0.01)
+    assert {hit["id"] for hit in body["accidents"]} == {west_of_line, east_of_line}
+    assert all(hit["distance_m"] < 40 for hit in body["accidents"])
+
+
+@pytest.mark.parametrize("ranges_per_query", [route_hazards.RANGES_PER_QUERY, 25])
+def test_long_route_stays_within_the_query_budget(app, client, make_accident, reporter, count_queries,
+                                                   monkeypatch, ranges_per_query):
+    # ~100 km north-east with 4000 points, wiggling so it isn't a straight line
+    points = 4000
+    path = [
+        [36.0 + 0.9 * i / points, 10.0 + 0.2 * i / points + 0.001 * math.sin(i / 10)]
+        for i in range(points)
+    ]
+    on_route = [make_accident(reporter, latitude=lat, longitude=lng) for lat, lng in path[::500]]
+    with app.app_context():
+        db.session.add(Route(accident_id=on_route[0], route_name="RN1", is_closed=True))
+        db.session.commit()
+    # Smaller batches: a route whose cover needs the most range queries
+    monkeypatch.setattr(route_hazards, "RANGES_PER_QUERY", ranges_per_query)
+
+    with count_queries() as statements:
+        body = hazards(client, path)
+    # The endpoint's @query_budget(6) fails the request under testing, the count is checked too
+    assert len(statements) <= 6
+    assert {hit["id"] for hit in body["accidents"]} == set(on_route)
+    assert [route["route_name"] for route in body["closed_routes"]] == ["RN1"]
+    assert body["length_m"] == pytest.approx(100_000, rel=0.1)
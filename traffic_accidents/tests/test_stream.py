@@ -0,0 +1,55 @@
+"""/accidents/stream: nothing committed while a stream opens is lost, and only marker changes are pushed."""
+import pytest
+from db import db
+from models.accident_change import AccidentChange
+from utils import event_broker
+from utils.accident_events import current_token
+
+
+def read_events(response):
+    """The event names streamed up to the first heartbeat."""
+    names = []
+    try:
+        for chunk in response.response:
+            chunk = chunk.decode() if isinstance(chunk, bytes) else chunk
+            if chunk.startswith(": keep-alive"):
+                return names
+            names += [line[len("event: "):] for line in chunk.splitlines() if line.startswith("event: ")]
+    finally:
+        response.close()
+    return names
+
+
+@pytest.fixture
+def stream_app(app):
+    app.config["EVENT_STREAM_HEARTBEAT_SECONDS"] = 0.1
+    return app
+
+
+def test_change_committed_while_subscribing_is_replayed(stream_app, client, make_user, make_accident, monkeypatch):
+    user_id, _ = make_user("reporter")
+    accident_id = make_accident(user_id)
+    broker = event_broker.get_broker(stream_app)
+    subscribe = broker.subscribe
+
+    def late_subscribe(since, bbox=None):
+        # Another request commits (and publishes to nobody) after the stream read its token
+        db.session.add(AccidentChange(accident_id=accident_id, op="status"))
+        db.session.commit()
+        return subscribe(since, bbox)
+
+    monkeypatch.setattr(broker, "subscribe", late_subscribe)
+    assert read_events(client.get("/accidents/stream", buffered=False)) == ["status"]
+
+
+def test_photo_changes_are_not_streamed(stream_app, client, make_user, make_accident):
+    user_id, _ = make_user("reporter")
+    accident_id = make_accident(user_id)
+    with stream_app.app_context():
+        since = current_token()
+        db.session.add(AccidentChange(accident_id=accident_id, op="photo"))
+        db.session.add(AccidentChange(accident_id=accident_id, op="status"))
+        db.session.commit()
+
+    response = client.get("/accidents/stream", headers={"Last-Event-ID": str(since)}, buffered=False)
+    assert read_events(response) == ["status"]
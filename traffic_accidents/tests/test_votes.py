@@ -0,0 +1,39 @@
+"""Comment votes, and the /upvote alias older clients still call."""
+import pytest
+from db import db
+from models.comment import Comment
+from models.user import User
+
+
+@pytest.fixture
+def comment(app, make_user, make_accident):
+    author_id, _ = make_user("author")
+    accident_id = make_accident(author_id, commenters=[author_id])
+    with app.app_context():
+        return Comment.query.filter_by(accident_id=accident_id).one().id
+
+
+def points(app, username):
+    with app.app_context():
+        return User.query.filter_by(username=username).one().points
+
+
+def test_upvote_alias_keeps_its_message(client, make_user, comment, app):
+    _, headers = make_user("reader")
+    body = client.post(f"/comments/{comment}/upvote", headers=headers).get_json()
+    assert body == {"comment_id": comment, "vote": 1, "score": 1, "message": "Upvoted! author gained 5 points."}
+    assert points(app, "author") == 5
+
+    again = client.post(f"/comments/{comment}/upvote", headers=headers).get_json()
+    assert again["score"] == 1 and again["message"] == "You already upvoted this comment."
+    assert points(app, "author") == 5
+
+
+def test_vote_counts_once_per_user(client, make_user, comment, app):
+    _, headers = make_user("reader")
+    for value, score in [(1, 1), (1, 1), (-1, -1), (0, 0)]:
+        body = client.post(f"/comments/{comment}/vote", json={"value": value}, headers=headers).get_json()
+        assert body == {"comment_id": comment, "vote": value, "score": score}
+    assert points(app, "author") == 0
+    with app.app_context():
+        assert db.session.get(Comment, comment).score == 0
@@ -0,0 +1,75 @@
+from sqlalchemy import func, insert
+from db import db
+from models.accident_change import AccidentChange
+from utils.log_tail import settled
+from utils.analytics import rollup_accident, rollup_many
+from utils.event_broker import event_from_change
+from utils.heatmap import add_heat, add_heat_many, accident_weight
+
+# Called by the accident handlers inside their own transaction, so the change
+# log, rollups and heatmap move if and only if the write they describe is committed.
+# Each returns the stream event to hand to event_broker.publish() after the commit.
+
+
+def record_created(accident):
+    db.session.flush()  # assigns accident.id
+    change = AccidentChange(accident_id=accident.id, op="created")
+    db.session.add(change)
+    rollup_accident(accident, 1)
+    add_heat(accident.latitude, accident.longitude, accident_weight(accident.severity, accident.status))
+    return changed(change, accident)
+
+
+def record_created_many(rows):
+    """record_created() for rows bulk-inserted as dicts (id, coordinates, severity, status, created_at...)."""
+    db.session.execute(insert(AccidentChange), [{"accident_id": row["id"], "op": "created"} for row in rows])
+    rollup_many(rows)
+    add_heat_many(
+        (row["latitude"], row["longitude"], accident_weight(row["severity"], row["status"])) for row in rows
+    )
+
+
+def record_status_changed(accident, old_status):
+    if accident.status != old_status:
+        change = AccidentChange(accident_id=accident.id, op="status")
+        db.session.add(change)
+        rollup_accident(accident, -1, status=old_status)
+        rollup_accident(accident, 1)
+        add_heat(
+            accident.latitude, accident.longitude,
+            accident_weight(accident.severity, accident.status) - accident_weight(accident.severity, old_status)
+        )
+        return changed(change, accident)
+    return None
+
+
+def record_deleted(accident):
+    change = AccidentChange(accident_id=accident.id, op="deleted")
+    db.session.add(change)
+    rollup_accident(accident, -1)
+    add_heat(accident.latitude, accident.longitude, -accident_weight(accident.severity, accident.status))
+    return changed(change, accident)
+
+
+def changed(change, accident):
+    db.session.flush()  # assigns change.seq, the event id
+    return event_from_change(change, accident)
+
+
+# Latest seqs looked at for a gap that may still fill in
+TOKEN_WINDOW = 100
+
+
+def current_token():
+    """Sequence number of the latest change with nothing possibly still committing below it (0 if none yet)."""
+    latest = db.session.query(func.max(AccidentChange.seq)).scalar_subquery()
+    recent = (
+        db.session.query(AccidentChange.seq, AccidentChange.created_at)
+        .filter(AccidentChange.seq > latest - TOKEN_WINDOW)
+        .order_by(AccidentChange.seq)
+        .all()
+    )
+    if not recent:
+        return 0
+    count = settled(recent, recent[0].seq - 1)
+    return recent[count - 1].seq
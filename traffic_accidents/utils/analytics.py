@@ -0,0 +1,114 @@
+from collections import defaultdict
+from db import db, increment, increment_many
+from models.accident import Accident
+from models.accident_rollup import AccidentRollup
+
+WEEKDAYS = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+
+
+def rollup_key(created_at, severity, status):
+    return created_at.date(), created_at.hour, severity, status
+
+
+def bump_rollup(key, count, injured=0, dead=0):
+    """Adds the deltas to one rollup row inside the caller's transaction."""
+    day, hour, severity, status = key
+    increment(
+        AccidentRollup,
+        {"day": day, "hour": hour, "severity": severity, "status": status},
+        {"count": count, "casualties_injured": injured, "casualties_dead": dead}
+    )
+
+
+def rollup_accident(accident, sign, status=None):
+    """Counts (sign=1) or uncounts (sign=-1) one accident."""
+    if accident.created_at is None:
+        return
+    key = rollup_key(accident.created_at, accident.severity, status or accident.status)
+    bump_rollup(
+        key, sign,
+        sign * (accident.casualties_injured or 0),
+        sign * (accident.casualties_dead or 0)
+    )
+
+
+def rollup_many(rows):
+    """Counts a batch of new accidents (dicts with the Accident columns) in one go."""
+    totals = defaultdict(lambda: [0, 0, 0])
+    for row in rows:
+        bucket = totals[rollup_key(row["created_at"], row["severity"], row["status"])]
+        bucket[0] += 1
+        bucket[1] += row.get("casualties_injured") or 0
+        bucket[2] += row.get("casualties_dead") or 0
+    increment_many(AccidentRollup, [
+        {
+            "day": day, "hour": hour, "severity": severity, "status": status,
+            "count": count, "casualties_injured": injured, "casualties_dead": dead,
+        }
+        for (day, hour, severity, status), (count, injured, dead) in totals.items()
+    ], ["count", "casualties_injured", "casualties_dead"])
+
+
+def rebuild_rollups():
+    """Recomputes every rollup row from the accidents table. Returns the row count."""
+    totals = defaultdict(lambda: [0, 0, 0])
+    rows = db.session.query(
+        Accident.created_at, Accident.severity, Accident.status,
+        Accident.casualties_injured, Accident.casualties_dead
+    ).execution_options(yield_per=1000)
+    for created_at, severity, status, injured, dead in rows:
+        if created_at is None:
+            continue
+        bucket = totals[rollup_key(created_at, severity, status)]
+        bucket[0] += 1
+        bucket[1] += injured or 0
+        bucket[2] += dead or 0
+
+    AccidentRollup.query.delete(synchronize_session=False)
+    db.session.bulk_insert_mappings(AccidentRollup, [
+        {
+            "day": day, "hour": hour, "severity": severity, "status": status,
+            "count": count, "casualties_injured": injured, "casualties_dead": dead,
+        }
+        for (day, hour, severity, status), (count, injured, dead) in totals.items()
+    ])
+    db.session.commit()
+    return len(totals)
+
+
+def ensure_rollups():
+    """Builds the rollups once for databases that predate them."""
+    if AccidentRollup.query.first() is None and Accident.query.first() is not None:
+        rebuild_rollups()
+
+
+def accident_summary(since_day=None):
+    """Dashboard aggregates read from the rollups only, never from accidents."""
+    query = AccidentRollup.query.filter(AccidentRollup.count != 0)
+    if since_day is not None:
+        query = query.filter(AccidentRollup.day >= since_day)
+
+    summary = {
+        "total": 0,
+        "casualties_injured": 0,
+        "casualties_dead": 0,
+        "by_status": defaultdict(int),
+        "by_severity": {str(level): 0 for level in range(1, 6)},
+        "by_weekday": [{"day": day, "severe": 0, "moderate": 0} for day in WEEKDAYS],
+        "by_hour": [0] * 24,
+        "by_day": defaultdict(int),
+    }
+    for row in query:
+        summary["total"] += row.count
+        summary["casualties_injured"] += row.casualties_injured
+        summary["casualties_dead"] += row.casualties_dead
+        summary["by_status"][row.status] += row.count
+        severity = str(row.severity)
+        summary["by_severity"][severity] = summary["by_severity"].get(severity, 0) + row.count
+        weekday = summary["by_weekday"][row.day.weekday()]
+        weekday["severe" if row.severity >= 4 else "moderate"] += row.count
+        summary["by_hour"][row.hour] += row.count
+        summary["by_day"][row.day.isoformat()] += row.count
+    summary["by_status"] = dict(summary["by_status"])
+    summary["by_day"] = dict(sorted(summary["by_day"].items()))
+    return summary
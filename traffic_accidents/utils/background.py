@@ -0,0 +1,53 @@
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_pid = None
+_lock = threading.Lock()
+
+
+def get_executor():
+    """Process-wide worker pool, recreated after a fork (pre-forking servers)."""
+    global _executor, _executor_pid
+    with _lock:
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ThreadPoolExecutor(
+                max_workers=current_app.config.get("BACKGROUND_WORKERS", 4),
+                thread_name_prefix="background"
+            )
+            _executor_pid = os.getpid()
+        return _executor
+
+
+def submit(fn, *args, **kwargs):
+    """Runs fn(*args, **kwargs) off the request thread inside an app context.
+
+    With BACKGROUND_INLINE (on by default when testing) the job runs right away
+    so tests can assert on its effects.
+    """
+    app = current_app._get_current_object()
+
+    def run():
+        with app.app_context():
+            try:
+                return fn(*args, **kwargs)
+            except Exception:
+                logger.exception("Background job %s failed", getattr(fn, "__name__", fn))
+
+    if app.config.get("BACKGROUND_INLINE", app.testing):
+        return run()
+    return get_executor().submit(run)
+
+
+def shutdown(wait=True):
+    """Stops accepting jobs and, by default, waits for queued ones to finish."""
+    global _executor
+    with _lock:
+        executor, _executor = _executor, None
+    if executor is not None and _executor_pid == os.getpid():
+        executor.shutdown(wait=wait)
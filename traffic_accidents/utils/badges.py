@@ -0,0 +1,27 @@
+from sqlalchemy import case
+
+# (bit, points needed, name). Bits are stable: never renumber an existing badge.
+BADGES = [
+    (1, 10, "First Responder"),  # Awarded after first report (+10 points)
+    (2, 100, "Safe Driver"),
+    (4, 500, "Road Watcher"),
+    (8, 1000, "Guardian"),
+    (16, 5000, "Traffic Legend"),
+]
+
+
+def badge_names(mask):
+    return [name for bit, _, name in BADGES if (mask or 0) & bit]
+
+
+def mask_from_names(names):
+    wanted = set(names)
+    return sum(bit for bit, _, name in BADGES if name in wanted)
+
+
+def earned_mask(points_expr):
+    """SQL expression for the badge bits a points total qualifies for."""
+    expr = case((points_expr >= BADGES[0][1], BADGES[0][0]), else_=0)
+    for bit, needed, _ in BADGES[1:]:
+        expr = expr + case((points_expr >= needed, bit), else_=0)
+    return expr
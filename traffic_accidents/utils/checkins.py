@@ -0,0 +1,201 @@
+import logging
+import os
+import threading
+import uuid
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import func, insert
+from db import db
+from models.checkin import CheckIn, CheckInSummary
+from models.user import User
+from utils.gamification import add_points
+from utils.geo import encode_geohash
+
+logger = logging.getLogger(__name__)
+
+CHECKIN_REASON = "Safe Zone Confirmation"
+# ~150 m cells: one summary row per spot and day
+SUMMARY_PRECISION = 7
+
+
+class CheckInBuffer:
+    """Write-behind buffer for check-ins, our busiest write.
+
+    Requests only append to an in-process list; one thread per process writes
+    it out in a single transaction when CHECKIN_BUFFER_SIZE rows are waiting or
+    CHECKIN_FLUSH_SECONDS have passed, with one points award per user per
+    flush. A crash loses at most the unflushed rows; a clean shutdown flushes
+    them. With BACKGROUND_INLINE (on by default when testing) every check-in is
+    written right away.
+    """
+
+    def __init__(self):
+        self._rows = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    def add(self, user_id, latitude, longitude, location_name):
+        """Queues a check-in. Returns its row, or None when the buffer is full (writes are failing)."""
+        app = current_app._get_current_object()
+        row = {
+            "id": str(uuid.uuid4()), "user_id": str(user_id), "latitude": latitude,
+            "longitude": longitude, "location_name": location_name, "created_at": datetime.utcnow(),
+        }
+        with self._lock:
+            if self._pid != os.getpid():
+                self._rows = []  # a forked child must not write its parent's rows again
+                self._pid = os.getpid()
+            if len(self._rows) >= app.config.get("CHECKIN_BUFFER_MAX", 20000):
+                return None
+            self._rows.append(row)
+            pending = len(self._rows)
+
+        if app.config.get("BACKGROUND_INLINE", app.testing):
+            self.flush()
+        else:
+            self.start(app)
+            if pending >= app.config.get("CHECKIN_BUFFER_SIZE", 500):
+                self._wake.set()
+        return row
+
+    def start(self, app):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            if self._pid != os.getpid():
+                self._rows = []
+                self._pid = os.getpid()
+            self._stop.clear()
+            self._wake.clear()
+            self._thread = threading.Thread(target=self._run, args=(app,), name="checkin-flusher", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=10):
+        """Stops the flusher thread; it writes out whatever is still buffered first."""
+        with self._lock:
+            thread = self._thread if self._pid == os.getpid() else None
+            self._thread = None
+        if thread is not None:
+            self._stop.set()
+            self._wake.set()
+            thread.join(timeout)
+
+    def _run(self, app):
+        with app.app_context():
+            interval = app.config.get("CHECKIN_FLUSH_SECONDS", 2)
+            while True:
+                stopping = self._stop.is_set()
+                try:
+                    self.flush()
+                except Exception:
+                    # The rows went back into the buffer; try again next round
+                    logger.exception("Check-in flush failed")
+                finally:
+                    db.session.remove()
+                if stopping:
+                    break
+                self._wake.wait(interval)
+                self._wake.clear()
+
+    def flush(self):
+        """Writes every buffered check-in and its points in one transaction. Returns how many."""
+        with self._flush_lock:
+            with self._lock:
+                rows, self._rows = self._rows, []
+            if not rows:
+                return 0
+            try:
+                written = write_checkins(rows)
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                # Back in front of anything queued meanwhile, for the next attempt
+                with self._lock:
+                    self._rows[:0] = rows
+                raise
+            return written
+
+    def pending(self):
+        with self._lock:
+            return len(self._rows)
+
+
+def write_checkins(rows):
+    """Inserts the rows in one statement and awards each user's points once. Caller commits."""
+    users = {user.id: user for user in User.query.filter(User.id.in_({row["user_id"] for row in rows}))}
+    # Accounts deleted since they checked in have nowhere to go
+    rows = [row for row in rows if row["user_id"] in users]
+    if not rows:
+        return 0
+    db.session.execute(insert(CheckIn.__table__), rows)
+
+    points = current_app.config.get("CHECKIN_POINTS", 2)
+    per_user = Counter(row["user_id"] for row in rows)
+    for user_id, count in per_user.items():
+        add_points(users[user_id], points * count, CHECKIN_REASON)
+    return len(rows)
+
+
+checkin_buffer = CheckInBuffer()
+
+
+def compact_checkins(retention_days, batch_size=5000):
+    """Folds check-ins older than `retention_days` (whole UTC days) into CheckInSummary rows.
+
+    One transaction per day: the day's rows are summarized per geohash cell
+    and deleted together, so an interrupted run just resumes at that day.
+    Returns (check-ins compacted, days processed).
+    """
+    cutoff = datetime.combine(datetime.utcnow().date() - timedelta(days=retention_days), datetime.min.time())
+    compacted = days = 0
+    while True:
+        oldest = db.session.query(func.min(CheckIn.created_at)).filter(CheckIn.created_at < cutoff).scalar()
+        if oldest is None:
+            return compacted, days
+        day_start = datetime.combine(oldest.date(), datetime.min.time())
+        day_end = min(day_start + timedelta(days=1), cutoff)
+
+        cells = defaultdict(lambda: {"count": 0, "lat": 0.0, "lng": 0.0, "users": set(), "names": Counter()})
+        in_day = (CheckIn.created_at >= day_start, CheckIn.created_at < day_end)
+        rows = (
+            db.session.query(CheckIn.user_id, CheckIn.latitude, CheckIn.longitude, CheckIn.location_name)
+            .filter(*in_day)
+            .execution_options(yield_per=batch_size)
+        )
+        for user_id, latitude, longitude, location_name in rows:
+            cell = cells[encode_geohash(latitude, longitude, SUMMARY_PRECISION)]
+            cell["count"] += 1
+            cell["lat"] += latitude
+            cell["lng"] += longitude
+            cell["users"].add(user_id)
+            if location_name:
+                cell["names"][location_name] += 1
+
+        existing = {summary.cell: summary for summary in CheckInSummary.query.filter_by(day=day_start.date())}
+        for key, cell in cells.items():
+            name = cell["names"].most_common(1)[0][0] if cell["names"] else None
+            summary = existing.get(key)
+            if summary is None:
+                db.session.add(CheckInSummary(
+                    day=day_start.date(), cell=key, location_name=name,
+                    latitude=cell["lat"] / cell["count"], longitude=cell["lng"] / cell["count"],
+                    checkin_count=cell["count"], user_count=len(cell["users"]),
+                ))
+                continue
+            # Stragglers for a day compacted before: blend them in (user_count may double count)
+            total = summary.checkin_count + cell["count"]
+            summary.latitude = (summary.latitude * summary.checkin_count + cell["lat"]) / total
+            summary.longitude = (summary.longitude * summary.checkin_count + cell["lng"]) / total
+            summary.checkin_count = total
+            summary.user_count += len(cell["users"])
+            summary.location_name = summary.location_name or name
+
+        CheckIn.query.filter(*in_day).delete(synchronize_session=False)
+        db.session.commit()
+        compacted += sum(cell["count"] for cell in cells.values())
+        days += 1
@@ -0,0 +1,295 @@
+import json
+import logging
+import os
+import queue
+import threading
+from flask import current_app
+from db import db
+from models.accident import Accident
+from models.accident_change import AccidentChange
+from models.user import User
+from schemas.accident import AccidentMarkerSchema
+from utils.geo import in_bbox
+from utils.log_tail import settled
+
+logger = logging.getLogger(__name__)
+
+marker_schema = AccidentMarkerSchema()
+# Changes that alter a map marker; "photo" changes only matter to /accidents/changes
+STREAM_OPS = ("created", "status", "deleted")
+
+
+def accident_event(seq, op, accident_id, marker=None):
+    """An event as pushed to /accidents/stream: the change seq, its op and the accident marker."""
+    if op == "deleted" or marker is None:
+        # The row is gone; clients only need to know which marker to drop
+        return {"seq": seq, "op": op, "accident": {"id": accident_id}}
+    return {"seq": seq, "op": op, "accident": marker_schema.dump(marker)}
+
+
+def event_from_change(change, accident):
+    """Builds the event for a flushed AccidentChange from the accident it describes."""
+    if change.op == "deleted":
+        return accident_event(change.seq, change.op, accident.id)
+    author = accident.author
+    marker = {
+        "id": accident.id, "latitude": accident.latitude, "longitude": accident.longitude,
+        "severity": accident.severity, "status": accident.status, "created_at": accident.created_at,
+        "incident_id": accident.incident_id, "role": author.role if author else None,
+    }
+    return accident_event(change.seq, change.op, accident.id, marker)
+
+
+def load_events(after_seq, limit):
+    """Events for the changes after `after_seq`, oldest first, read back from the change log.
+
+    Changes to accidents deleted since are skipped: their tombstone follows.
+    So are ops outside STREAM_OPS, which leave the marker as it was.
+    Reading stops before a gap in the seqs that may still be committing
+    (utils/log_tail.py); the next call picks up from there.
+    """
+    rows = (
+        db.session.query(
+            AccidentChange.seq, AccidentChange.created_at.label("changed_at"),
+            AccidentChange.op, AccidentChange.accident_id,
+            Accident.id.label("id"), Accident.latitude, Accident.longitude, Accident.severity,
+            Accident.status, Accident.created_at, Accident.incident_id, User.role.label("role"),
+        )
+        .outerjoin(Accident, Accident.id == AccidentChange.accident_id)
+        .outerjoin(User, User.id == Accident.user_id)
+        .filter(AccidentChange.seq > after_seq)
+        .order_by(AccidentChange.seq)
+        .limit(limit)
+        .all()
+    )
+    more = len(rows) == limit
+    count = settled([(row.seq, row.changed_at) for row in rows], after_seq)
+    if count < len(rows):
+        rows, more = rows[:count], False
+    events = []
+    for row in rows:
+        if row.op not in STREAM_OPS or (row.op != "deleted" and row.id is None):
+            continue
+        marker = row._asdict() if row.id is not None else None
+        events.append(accident_event(row.seq, row.op, row.accident_id, marker))
+    return events, (rows[-1].seq if rows else after_seq), more
+
+
+def backlog(last_event_id, limit):
+    """Events a reconnecting client missed, and the seq it is caught up to.
+
+    When more than `limit` changes were missed, or the log no longer reaches
+    back that far, a single reset event tells the client to reload the list.
+    """
+    events, last_seq, more = load_events(last_event_id, limit)
+    oldest = db.session.query(db.func.min(AccidentChange.seq)).scalar()
+    if more or (oldest is not None and last_event_id < oldest - 1):
+        latest = db.session.query(db.func.max(AccidentChange.seq)).scalar() or 0
+        return [{"seq": latest, "op": "reset", "accident": {}}], latest
+    return events, last_seq
+
+
+def format_event(event):
+    return f"id: {event['seq']}\nevent: {event['op']}\ndata: {json.dumps(event['accident'])}\n\n"
+
+
+class Subscription:
+    """One open stream: a bounded queue of events inside an optional bounding box."""
+
+    def __init__(self, broker, bbox, since, maxsize):
+        self.broker = broker
+        self.bbox = bbox
+        # Last seq the client has; anything at or below it is not sent again
+        self.since = since
+        self.queue = queue.Queue(maxsize)
+        # Set when the client falls too far behind; it reconnects and replays from the log
+        self.overflowed = False
+
+    def wants(self, event):
+        if self.bbox is None or event["op"] in ("deleted", "reset"):
+            return True
+        accident = event["accident"]
+        return in_bbox(accident["latitude"], accident["longitude"], self.bbox)
+
+    def offer(self, event):
+        if self.overflowed or not self.wants(event):
+            return
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            self.overflowed = True
+
+    def stream(self, replay, heartbeat, retry_ms):
+        """SSE body: the replayed backlog, then live events with comment heartbeats."""
+        yield f"retry: {retry_ms}\n\n"
+        for event in replay:
+            if self.wants(event):
+                yield format_event(event)
+        while not self.overflowed:
+            try:
+                event = self.queue.get(timeout=heartbeat)
+            except queue.Empty:
+                yield ": keep-alive\n\n"
+                continue
+            if event is None:  # broker shutting down
+                break
+            if event["seq"] > self.since:
+                yield format_event(event)
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class MemoryBroker:
+    """Fans committed accident events out to the streams open in this process.
+
+    Handlers publish after their commit. Only streams served by the same
+    process see the event, so this suits the development server or a single
+    worker; DatabaseBroker covers several workers or hosts.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions = set()
+
+    def subscribe(self, since, bbox=None):
+        """Returns a Subscription for events after `since`, or None when
+        EVENT_STREAM_MAX_CLIENTS streams are already open in this process."""
+        config = current_app.config
+        with self._lock:
+            if len(self._subscriptions) >= config.get("EVENT_STREAM_MAX_CLIENTS", 16):
+                return None
+            subscription = Subscription(self, bbox, since, config.get("EVENT_STREAM_QUEUE_SIZE", 1000))
+            self._subscriptions.add(subscription)
+            return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def publish(self, event):
+        if event is not None:
+            self._fan_out([event])
+
+    def _fan_out(self, events):
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        for event in events:
+            for subscription in subscriptions:
+                subscription.offer(event)
+
+    def start(self, app):
+        pass
+
+    def stop(self):
+        """Ends every open stream so workers can exit."""
+        with self._lock:
+            subscriptions, self._subscriptions = self._subscriptions, set()
+        for subscription in subscriptions:
+            try:
+                subscription.queue.put_nowait(None)
+            except queue.Full:
+                subscription.overflowed = True
+
+
+class DatabaseBroker(MemoryBroker):
+    """Tails the accident_changes log so every worker sees every write.
+
+    While streams are open, one thread per process reads the changes after
+    the last seq it saw every EVENT_STREAM_POLL_SECONDS: one primary key range
+    query, however many clients. A local publish() just wakes it, so writes
+    made by this worker go out immediately.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._pid = None
+        self._last_seq = None
+
+    def subscribe(self, since, bbox=None):
+        subscription = super().subscribe(since, bbox)
+        if subscription is not None:
+            self.start(current_app._get_current_object())
+            self._wake.set()
+        return subscription
+
+    def publish(self, event):
+        self._wake.set()
+
+    def start(self, app):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._stop.clear()
+            self._last_seq = None
+            self._thread = threading.Thread(target=self._run, args=(app,), name="event-broker", daemon=True)
+            self._pid = os.getpid()
+            self._thread.start()
+
+    def stop(self, timeout=5):
+        with self._lock:
+            thread = self._thread if self._pid == os.getpid() else None
+            self._thread = None
+        if thread is not None:
+            self._stop.set()
+            self._wake.set()
+            thread.join(timeout)
+        super().stop()
+
+    def _run(self, app):
+        with app.app_context():
+            poll = app.config.get("EVENT_STREAM_POLL_SECONDS", 1)
+            while not self._stop.is_set():
+                try:
+                    self._poll()
+                except Exception:
+                    logger.exception("Event broker poll failed")
+                    db.session.rollback()
+                finally:
+                    db.session.remove()
+                self._wake.wait(poll)
+                self._wake.clear()
+
+    def _poll(self):
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        if not subscriptions:
+            # Nobody listening: don't read what no one will see
+            self._last_seq = None
+            return
+        if self._last_seq is None:
+            self._last_seq = min(subscription.since for subscription in subscriptions)
+        more = True
+        while more and not self._stop.is_set():
+            events, self._last_seq, more = load_events(self._last_seq, 500)
+            self._fan_out(events)
+
+
+BROKERS = {"memory": MemoryBroker, "database": DatabaseBroker}
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker(app=None):
+    """The process-wide broker picked by EVENT_BROKER ("memory" or "database")."""
+    global _broker
+    if _broker is None:
+        app = app or current_app
+        with _broker_lock:
+            if _broker is None:
+                _broker = BROKERS[app.config.get("EVENT_BROKER", "memory")]()
+    return _broker
+
+
+def publish(event):
+    """Pushes an event built by record_created/record_status_changed/record_deleted. Call after commit."""
+    get_broker().publish(event)
+
+
+def shutdown():
+    """Ends open streams and stops the polling thread, if this process has a broker."""
+    if _broker is not None:
+        _broker.stop()
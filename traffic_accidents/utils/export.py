@@ -0,0 +1,84 @@
+import csv
+import io
+import json
+from db import db
+from models.accident import Accident
+from models.user import User
+
+EXPORT_FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "geojson": ("application/geo+json", "geojson"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+}
+
+EXPORT_COLUMNS = (
+    "id", "created_at", "latitude", "longitude", "severity", "status",
+    "casualties_injured", "casualties_dead", "description", "photo_url", "role",
+)
+
+# Rows fetched per round trip; also how many CSV rows go out per chunk
+EXPORT_BATCH_SIZE = 1000
+
+
+def export_query():
+    """Plain columns in feed order (oldest first), no ORM objects to pile up."""
+    return db.session.query(
+        Accident.id, Accident.created_at, Accident.latitude, Accident.longitude,
+        Accident.severity, Accident.status, Accident.casualties_injured,
+        Accident.casualties_dead, Accident.description, Accident.photo_url,
+        User.role.label("role"),
+    ).outerjoin(User, User.id == Accident.user_id).order_by(Accident.created_at, Accident.id)
+
+
+def export_rows(query):
+    """Yields each row as a dict, streamed from the database in batches.
+
+    yield_per keeps only one batch in memory (a server-side cursor on
+    PostgreSQL). Ids of admin reports are blanked like AccidentSchema does.
+    """
+    for row in query.yield_per(EXPORT_BATCH_SIZE):
+        item = row._asdict()
+        if item["role"] == "admin":
+            item["id"] = None
+        if item["created_at"] is not None:
+            item["created_at"] = item["created_at"].isoformat()
+        yield item
+
+
+def export_csv(rows):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_COLUMNS)
+    writer.writeheader()
+    for count, row in enumerate(rows, start=1):
+        writer.writerow(row)
+        if count % EXPORT_BATCH_SIZE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def export_ndjson(rows):
+    for row in rows:
+        yield json.dumps(row) + "\n"
+
+
+def export_geojson(rows):
+    yield '{"type": "FeatureCollection", "features": ['
+    separator = "\n"
+    for row in rows:
+        geometry = {"type": "Point", "coordinates": [row.pop("longitude"), row.pop("latitude")]}
+        feature = {"type": "Feature", "geometry": geometry, "properties": row}
+        if row["id"] is not None:
+            feature["id"] = row["id"]
+        yield separator + json.dumps(feature)
+        separator = ",\n"
+    yield "\n]}\n"
+
+
+EXPORT_WRITERS = {"csv": export_csv, "geojson": export_geojson, "ndjson": export_ndjson}
+
+
+def export_accidents(query, fmt):
+    """Generator of text chunks for a streamed response body."""
+    return EXPORT_WRITERS[fmt](export_rows(query))
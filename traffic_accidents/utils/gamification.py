@@ -1,29 +1,60 @@
-from db import db
+from datetime import datetime
+from sqlalchemy import case, inspect, text, update
+from sqlalchemy.orm.attributes import set_committed_value
+from db import db, increment
+from models.user import User
+from models.points import PointsLedger, PointsDaily
+from utils.badges import badge_names, earned_mask, mask_from_names
 
 def add_points(user, amount, reason=""):
-    """Adds points to a user and checks for badge upgrades."""
-    user.points += amount
-    if user.points < 0:
-        user.points = 0
-    
-    # Badge Milestones
-    milestones = [
-        (10, "First Responder"),  # Awarded after first report (+10 points)
-        (100, "Safe Driver"),
-        (500, "Road Watcher"),
-        (1000, "Guardian"),
-        (5000, "Traffic Legend")
-    ]
-    
-    current_badges = user.badges.split(",") if user.badges else []
-    new_added = False
-    
-    for score, name in milestones:
-        if user.points >= score and name not in current_badges:
-            current_badges.append(name)
-            new_added = True
-            
-    if new_added:
-        user.badges = ",".join([b for b in current_badges if b])
-    
-    return {"points_added": amount, "total_points": user.points, "new_badges": new_added}
\ No newline at end of file
+    """Adds points to a user and checks for badge upgrades.
+
+    The update is a single atomic UPDATE (points never drop below 0, badges are
+    OR-ed into the bitmask), so concurrent awards to the same user can't lose
+    each other. Each award is also written to the ledger and the daily rollup.
+    """
+    current = None
+    if amount < 0:
+        # Penalties are capped at the current total. A no-op UPDATE takes the
+        # row's write lock (SQLite ignores FOR UPDATE) and returns the total as
+        # it stands, so no other award can slip in before the real UPDATE
+        current = db.session.execute(
+            update(User).where(User.id == user.id).values(points=User.points)
+            .returning(User.points).execution_options(synchronize_session=False)
+        ).scalar() or 0
+
+    new_points = case((User.points + amount < 0, 0), else_=User.points + amount)
+    old_mask = user.badge_mask or 0
+    points, mask = db.session.execute(
+        update(User)
+        .where(User.id == user.id)
+        .values(points=new_points, badge_mask=User.badge_mask.op("|")(earned_mask(new_points)))
+        .returning(User.points, User.badge_mask)
+        .execution_options(synchronize_session=False)
+    ).one()
+    # Reflect the database values without marking the user dirty
+    set_committed_value(user, "points", points)
+    set_committed_value(user, "badge_mask", mask)
+    # What the UPDATE actually took, so the ledger always sums to user.points
+    applied = amount if current is None else (points or 0) - current
+
+    db.session.add(PointsLedger(user_id=user.id, delta=applied, reason=reason))
+    increment(PointsDaily, {"user_id": user.id, "day": datetime.utcnow().date()}, {"points": applied})
+
+    new_badges = badge_names(mask & ~old_mask)
+    return {"points_added": amount, "total_points": points, "new_badges": bool(new_badges)}
+
+def backfill_badge_masks():
+    """Converts the old comma-separated badges column into the bitmask, once."""
+    columns = {column["name"] for column in inspect(db.engine).get_columns("user")}
+    if "badges" not in columns:
+        return
+    rows = db.session.execute(text(
+        "SELECT id, badges FROM \"user\" WHERE badge_mask = 0 AND badges IS NOT NULL AND badges != ''"
+    )).all()
+    for user_id, badges in rows:
+        db.session.execute(
+            update(User).where(User.id == user_id)
+            .values(badge_mask=earned_mask(User.points).op("|")(mask_from_names(badges.split(","))))
+        )
+    db.session.commit()
@@ -0,0 +1,169 @@
+import math
+from sqlalchemy import and_, or_
+from utils.query_plans import expect_full_scan
+
+# Geohash base32 alphabet. Digits and lowercase letters sort the same under the
+# C collation and the linguistic ones PostgreSQL defaults to, so the rows under
+# a prefix p are the index range [p, prefix_successor(p)) on every backend.
+BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+GEOHASH_PRECISION = 9  # ~5m cells, plenty for accident reports
+EARTH_RADIUS_M = 6371008.8
+MAX_COVER_CELLS = 32
+MAX_SEARCH_RADIUS_M = 20037508.0  # half the circumference, covers the whole planet
+
+
+def encode_geohash(lat, lng, precision=GEOHASH_PRECISION):
+    """Encodes a coordinate as a geohash string."""
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True
+    while len(chars) < precision:
+        rng, value = (lng_range, lng) if even else (lat_range, lat)
+        mid = (rng[0] + rng[1]) / 2
+        bits <<= 1
+        if value >= mid:
+            bits |= 1
+            rng[0] = mid
+        else:
+            rng[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(BASE32[bits])
+            bits = 0
+            bit_count = 0
+    return "".join(chars)
+
+
+def cell_size(precision):
+    """Returns the (lat, lng) size in degrees of a geohash cell."""
+    lng_bits = (5 * precision + 1) // 2
+    lat_bits = (5 * precision) // 2
+    return 180.0 / (1 << lat_bits), 360.0 / (1 << lng_bits)
+
+
+def split_antimeridian(bbox):
+    """Splits a (min_lng, min_lat, max_lng, max_lat) box crossing 180° into two."""
+    min_lng, min_lat, max_lng, max_lat = bbox
+    if min_lng <= max_lng:
+        return [bbox]
+    return [(min_lng, min_lat, 180.0, max_lat), (-180.0, min_lat, max_lng, max_lat)]
+
+
+def cover_bbox(bbox, max_cells=MAX_COVER_CELLS):
+    """Returns the geohash prefixes whose cells cover the box.
+
+    Picks the longest precision that still needs at most `max_cells` cells, so
+    the candidate set stays close to the box without exploding the query.
+    """
+    min_lng, min_lat, max_lng, max_lat = bbox
+    prefixes = [""]
+    for precision in range(1, GEOHASH_PRECISION + 1):
+        lat_step, lng_step = cell_size(precision)
+        ix0 = math.floor((min_lng + 180.0) / lng_step)
+        ix1 = math.floor((min(max_lng, 179.9999999) + 180.0) / lng_step)
+        iy0 = math.floor((min_lat + 90.0) / lat_step)
+        iy1 = math.floor((min(max_lat, 89.9999999) + 90.0) / lat_step)
+        if (ix1 - ix0 + 1) * (iy1 - iy0 + 1) > max_cells:
+            break
+        prefixes = [
+            encode_geohash(-90.0 + (iy + 0.5) * lat_step, -180.0 + (ix + 0.5) * lng_step, precision)
+            for ix in range(ix0, ix1 + 1)
+            for iy in range(iy0, iy1 + 1)
+        ]
+    return prefixes
+
+
+def prefix_successor(prefix):
+    """Smallest geohash string above every string starting with `prefix`, or None."""
+    while prefix:
+        position = BASE32.index(prefix[-1])
+        if position + 1 < len(BASE32):
+            return prefix[:-1] + BASE32[position + 1]
+        prefix = prefix[:-1]
+    return None
+
+
+def prefix_filter(column, prefix):
+    upper = prefix_successor(prefix)
+    if upper is None:
+        return column >= prefix
+    return and_(column >= prefix, column < upper)
+
+
+def bbox_filter(model, bbox):
+    """SQL filter for rows of `model` inside the box, driven by the geohash index."""
+    clauses = []
+    for part in split_antimeridian(bbox):
+        min_lng, min_lat, max_lng, max_lat = part
+        prefixes = cover_bbox(part)
+        if len(prefixes[0]) <= 1:
+            # Continent-sized box: reading the table beats dozens of index ranges
+            expect_full_scan(model.__tablename__)
+        if prefixes == [""]:
+            ranges = model.geohash.isnot(None)
+        else:
+            ranges = or_(*[prefix_filter(model.geohash, p) for p in prefixes])
+        clauses.append(and_(
+            ranges,
+            model.latitude.between(min_lat, max_lat),
+            model.longitude.between(min_lng, max_lng),
+        ))
+    return or_(*clauses)
+
+
+def in_bbox(lat, lng, bbox):
+    """Whether a point falls inside a (min_lng, min_lat, max_lng, max_lat) box, which may cross 180°."""
+    return any(
+        min_lat <= lat <= max_lat and min_lng <= lng <= max_lng
+        for min_lng, min_lat, max_lng, max_lat in split_antimeridian(bbox)
+    )
+
+
+def haversine_m(lat1, lng1, lat2, lng2):
+    """Great-circle distance in metres."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlmb = math.radians(lng2 - lng1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlmb / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+
+def bbox_around(lat, lng, radius_m):
+    """Smallest (min_lng, min_lat, max_lng, max_lat) box containing the circle."""
+    dlat = math.degrees(radius_m / EARTH_RADIUS_M)
+    min_lat, max_lat = lat - dlat, lat + dlat
+    if min_lat <= -90.0 or max_lat >= 90.0:
+        return (-180.0, max(min_lat, -90.0), 180.0, min(max_lat, 90.0))
+    dlng = math.degrees(radius_m / (EARTH_RADIUS_M * math.cos(math.radians(lat))))
+    if dlng >= 180.0:
+        return (-180.0, min_lat, 180.0, max_lat)
+    min_lng, max_lng = lng - dlng, lng + dlng
+    if min_lng < -180.0:
+        min_lng += 360.0
+    if max_lng > 180.0:
+        max_lng -= 360.0
+    return (min_lng, min_lat, max_lng, max_lat)
+
+
+def nearby(query, model, lat, lng, radius_m=None, k=None):
+    """Returns [(row, distance_m)] closest first, within `radius_m` and/or the `k` nearest.
+
+    Without a radius the search box starts small and grows until it holds k
+    rows, so a k-nearest lookup only touches the index around the point.
+    """
+    search_radius = radius_m if radius_m is not None else 500.0
+    while True:
+        candidates = query.filter(bbox_filter(model, bbox_around(lat, lng, search_radius))).all()
+        hits = []
+        for row in candidates:
+            distance = haversine_m(lat, lng, row.latitude, row.longitude)
+            if distance <= search_radius:
+                hits.append((row, distance))
+        hits.sort(key=lambda hit: hit[1])
+        if radius_m is not None or len(hits) >= k or search_radius >= MAX_SEARCH_RADIUS_M:
+            return hits[:k] if k else hits
+        search_radius = min(search_radius * 4, MAX_SEARCH_RADIUS_M)
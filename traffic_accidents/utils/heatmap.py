@@ -0,0 +1,113 @@
+import math
+import sys
+from array import array
+from collections import defaultdict
+from db import db, increment_many
+from models.accident import Accident
+from models.heatmap_cell import HeatmapCell
+from utils.geo import bbox_filter
+
+TILE_GRID = 32  # cells per tile side, i.e. 8px cells on a 256px tile
+MAX_PRECOMPUTED_ZOOM = 14  # deeper tiles are binned on the fly from the spatial index
+MAX_ZOOM = 22
+MAX_MERCATOR_LAT = 85.0511287798
+
+
+def accident_weight(severity, status):
+    """Heat contributed by one report; false reports do not count."""
+    if status == "false_report":
+        return 0.0
+    return float(severity or 0)
+
+
+def world_position(lat, lng):
+    """Web Mercator position in [0, 1) x [0, 1)."""
+    lat = max(-MAX_MERCATOR_LAT, min(MAX_MERCATOR_LAT, lat))
+    x = (lng + 180.0) / 360.0
+    sin_lat = math.sin(math.radians(lat))
+    y = 0.5 - math.log((1 + sin_lat) / (1 - sin_lat)) / (4 * math.pi)
+    return min(max(x, 0.0), 0.999999999), min(max(y, 0.0), 0.999999999)
+
+
+def cell_key(lat, lng, z):
+    """(tx, ty, cell) of the grid cell holding the point at zoom z."""
+    x, y = world_position(lat, lng)
+    scale = (1 << z) * TILE_GRID
+    gx, gy = int(x * scale), int(y * scale)
+    return gx // TILE_GRID, gy // TILE_GRID, (gy % TILE_GRID) * TILE_GRID + gx % TILE_GRID
+
+
+def tile_bbox(z, x, y):
+    """(west, south, east, north) of a slippy-map tile."""
+    n = 1 << z
+    west = x / n * 360.0 - 180.0
+    east = (x + 1) / n * 360.0 - 180.0
+    north = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y / n))))
+    south = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * (y + 1) / n))))
+    return west, south, east, north
+
+
+def add_heat(lat, lng, weight):
+    """Adds (or with a negative weight removes) heat at a point on every precomputed zoom."""
+    add_heat_many([(lat, lng, weight)])
+
+
+def add_heat_many(points):
+    """add_heat() for a batch of (lat, lng, weight), summed per cell first."""
+    totals = defaultdict(float)
+    for lat, lng, weight in points:
+        if weight:
+            for z in range(MAX_PRECOMPUTED_ZOOM + 1):
+                totals[(z,) + cell_key(lat, lng, z)] += weight
+    increment_many(HeatmapCell, [
+        {"z": z, "tx": tx, "ty": ty, "cell": cell, "weight": weight}
+        for (z, tx, ty, cell), weight in totals.items()
+    ], ["weight"])
+
+
+def rebuild_heatmap():
+    """Recomputes every precomputed tile from the accidents table. Returns the cell count."""
+    totals = defaultdict(float)
+    rows = db.session.query(
+        Accident.latitude, Accident.longitude, Accident.severity, Accident.status
+    ).execution_options(yield_per=1000)
+    for lat, lng, severity, status in rows:
+        weight = accident_weight(severity, status)
+        if weight:
+            for z in range(MAX_PRECOMPUTED_ZOOM + 1):
+                totals[(z,) + cell_key(lat, lng, z)] += weight
+
+    HeatmapCell.query.delete(synchronize_session=False)
+    db.session.bulk_insert_mappings(HeatmapCell, [
+        {"z": z, "tx": tx, "ty": ty, "cell": cell, "weight": weight}
+        for (z, tx, ty, cell), weight in totals.items()
+    ])
+    db.session.commit()
+    return len(totals)
+
+
+def ensure_heatmap():
+    """Builds the heatmap once for databases that predate it."""
+    if HeatmapCell.query.first() is None and Accident.query.first() is not None:
+        rebuild_heatmap()
+
+
+def heatmap_tile(z, x, y):
+    """Packed little-endian float32 grid (TILE_GRID x TILE_GRID, row-major, north first)."""
+    grid = array("f", bytes(4 * TILE_GRID * TILE_GRID))
+    if z <= MAX_PRECOMPUTED_ZOOM:
+        cells = db.session.query(HeatmapCell.cell, HeatmapCell.weight).filter_by(z=z, tx=x, ty=y)
+        for cell, weight in cells:
+            grid[cell] = max(weight, 0.0)
+    else:
+        # Tiny tiles hold few points: bin them straight from the spatial index
+        rows = db.session.query(
+            Accident.latitude, Accident.longitude, Accident.severity, Accident.status
+        ).filter(bbox_filter(Accident, tile_bbox(z, x, y)))
+        for lat, lng, severity, status in rows:
+            tx, ty, cell = cell_key(lat, lng, z)
+            if (tx, ty) == (x, y):
+                grid[cell] += accident_weight(severity, status)
+    if sys.byteorder == "big":
+        grid.byteswap()
+    return grid.tobytes()
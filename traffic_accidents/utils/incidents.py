@@ -0,0 +1,120 @@
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import func
+from sqlalchemy.orm import joinedload
+from db import db
+from models.accident import Accident
+from models.incident import Incident
+from models.user import User
+from utils.accident_events import record_status_changed
+from utils.gamification import add_points
+from utils.geo import nearby
+
+# Reporter points when an officer rules on their report
+VERIFICATION_POINTS = {"confirmed": (50, "Verification Bonus"), "false_report": (-20, "False Report Penalty")}
+
+
+def assign_incident(accident):
+    """Merges a new report into the nearest open incident, or opens a new one.
+
+    Open means unverified and last reported within INCIDENT_WINDOW_MINUTES;
+    the candidates come from the geohash index around the report, within
+    INCIDENT_RADIUS_M. Call after the report is flushed, in the same
+    transaction: the matched row is locked (on PostgreSQL; SQLite already holds
+    the write lock) so concurrent reports of the same crash all count.
+    """
+    config = current_app.config
+    now = accident.created_at or datetime.utcnow()
+    window = timedelta(minutes=config.get("INCIDENT_WINDOW_MINUTES", 30))
+    candidates = Incident.query.filter(
+        Incident.status == "not_confirmed",
+        Incident.last_reported_at >= now - window,
+    ).with_for_update()
+    hits = nearby(candidates, Incident, accident.latitude, accident.longitude,
+                  radius_m=config.get("INCIDENT_RADIUS_M", 75))
+
+    if not hits:
+        incident = Incident(
+            latitude=accident.latitude, longitude=accident.longitude, severity=accident.severity,
+            report_count=1, created_at=now, last_reported_at=now,
+        )
+        db.session.add(incident)
+        db.session.flush()  # assigns incident.id
+    else:
+        incident = hits[0][0]
+        count = incident.report_count
+        incident.latitude = (incident.latitude * count + accident.latitude) / (count + 1)
+        incident.longitude = (incident.longitude * count + accident.longitude) / (count + 1)
+        incident.severity = max(incident.severity, accident.severity)
+        incident.report_count = count + 1
+        incident.last_reported_at = max(incident.last_reported_at, now)
+    accident.incident_id = incident.id
+    return incident
+
+
+def detach_incident(accident):
+    """Takes a report being deleted out of its incident, before the delete is flushed.
+
+    The position, severity, count and last report time are recomputed from the
+    reports that remain; an incident with none left is deleted.
+    """
+    if accident.incident_id is None:
+        return
+    incident = (
+        Incident.query.filter_by(id=accident.incident_id)
+        .with_for_update()
+        .populate_existing()
+        .one_or_none()
+    )
+    accident.incident_id = None
+    if incident is None:
+        return
+    count, latitude, longitude, severity, last_reported_at = (
+        db.session.query(
+            func.count(Accident.id), func.avg(Accident.latitude), func.avg(Accident.longitude),
+            func.max(Accident.severity), func.max(Accident.created_at),
+        )
+        .filter(Accident.incident_id == incident.id, Accident.id != accident.id)
+        .one()
+    )
+    if not count:
+        db.session.flush()
+        db.session.delete(incident)
+        return
+    incident.latitude, incident.longitude = latitude, longitude
+    incident.severity = severity
+    incident.report_count = count
+    incident.last_reported_at = last_reported_at or incident.last_reported_at
+
+
+def verify_accident(accident, new_status, officer_id, reporter=None):
+    """Sets one report's status and settles its reporter's points. Returns the stream event (or None)."""
+    old_status = accident.status
+    accident.status = new_status
+    accident.verified_by = officer_id
+    event = record_status_changed(accident, old_status)
+    if reporter is None and event is not None:
+        reporter = db.session.get(User, accident.user_id) if accident.user_id else None
+    # Only a change of status pays out, so repeating a verification can't farm points
+    if reporter is not None and event is not None:
+        amount, reason = VERIFICATION_POINTS[new_status]
+        add_points(reporter, amount, reason)
+    return event
+
+
+def verify_incident(incident, new_status, officer_id):
+    """Applies one verification to every pending report of the incident. Returns their events.
+
+    Reports an officer already ruled on one by one keep their status.
+    """
+    incident.status = new_status
+    incident.verified_by = officer_id
+    # The reporters come along in the same query, for their points and the events
+    reports = incident.reports.options(joinedload(Accident.author)).filter(Accident.status == "not_confirmed").all()
+
+    events = []
+    for report in reports:
+        event = verify_accident(report, new_status, officer_id, report.author)
+        if event is not None:
+            events.append(event)
+    return events
@@ -0,0 +1,114 @@
+import csv
+import io
+import json
+import uuid
+from datetime import datetime
+from flask import current_app
+from marshmallow import ValidationError
+from sqlalchemy import insert
+from sqlalchemy.exc import SQLAlchemyError
+from db import db
+from models.accident import Accident
+from schemas.accident import AccidentIngestSchema
+from utils.accident_events import record_created_many
+from utils.geo import encode_geohash
+
+INGEST_FORMATS = ("ndjson", "csv")
+
+
+def read_rows(stream, fmt):
+    """Yields (line number, dict or None, error or None) without loading the whole body."""
+    if not hasattr(stream, "read1"):
+        stream = io.BufferedReader(stream)
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    if fmt == "csv":
+        reader = csv.DictReader(text)
+        try:
+            for row in reader:
+                yield reader.line_num, row, None
+        except csv.Error as e:
+            yield reader.line_num, None, {"_row": [f"Malformed CSV: {e}"]}
+        return
+
+    for line_number, line in enumerate(text, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield line_number, None, {"_row": [f"Invalid JSON: {e}"]}
+            continue
+        if not isinstance(row, dict):
+            yield line_number, None, {"_row": ["Each line must be a JSON object."]}
+            continue
+        yield line_number, row, None
+
+
+def ingest_accidents(stream, fmt, user_id):
+    """Validates and inserts an official feed in chunked transactions.
+
+    Rows are checked with AccidentIngestSchema (AccidentSchema's rules), stored
+    as confirmed reports verified by the uploader, and written INGEST_CHUNK_SIZE
+    at a time with executemany together with their change log, rollup and
+    heatmap updates. No cooldown and no points. A chunk that fails to write
+    is rolled back on its own and reported per row; earlier chunks stay.
+    """
+    config = current_app.config
+    chunk_size = config.get("INGEST_CHUNK_SIZE", 1000)
+    max_errors = config.get("INGEST_MAX_ERRORS", 1000)
+    schema = AccidentIngestSchema()
+    report = {"inserted": 0, "failed": 0, "errors": [], "errors_truncated": False}
+
+    def fail(line, errors):
+        report["failed"] += 1
+        if len(report["errors"]) < max_errors:
+            report["errors"].append({"line": line, "errors": errors})
+        else:
+            report["errors_truncated"] = True
+
+    def flush(chunk, lines):
+        try:
+            db.session.execute(insert(Accident), chunk)
+            record_created_many(chunk)
+            db.session.commit()
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            current_app.logger.warning("Bulk ingest chunk failed: %s", e)
+            for line in lines:
+                fail(line, {"_row": ["Database error, row not stored."]})
+            return
+        report["inserted"] += len(chunk)
+
+    chunk, lines = [], []
+    for line, row, error in read_rows(stream, fmt):
+        if error is None:
+            try:
+                data = schema.load(row)
+            except ValidationError as e:
+                error = e.messages
+        if error is not None:
+            fail(line, error)
+            continue
+
+        # Bulk inserts skip the ORM events, so fill in what they would have
+        chunk.append({
+            "id": str(uuid.uuid4()),
+            "user_id": user_id,
+            "verified_by": user_id,
+            "status": "confirmed",
+            "latitude": data["latitude"],
+            "longitude": data["longitude"],
+            "geohash": encode_geohash(data["latitude"], data["longitude"]),
+            "description": data["description"],
+            "severity": data["severity"],
+            "casualties_injured": data["casualties_injured"],
+            "casualties_dead": data["casualties_dead"],
+            "created_at": data["created_at"] or datetime.utcnow(),
+        })
+        lines.append(line)
+        if len(chunk) >= chunk_size:
+            flush(chunk, lines)
+            chunk, lines = [], []
+    if chunk:
+        flush(chunk, lines)
+    return report
@@ -0,0 +1,116 @@
+from datetime import datetime, timedelta
+from sqlalchemy import and_, func, or_
+from db import db
+from models.user import User
+from models.points import PointsDaily
+
+# Ranking order; ties on points are broken by id so every user has one position
+RANK_ORDER = (User.points.desc(), User.id.desc())
+
+
+def ranked_before(points, user_id):
+    """Users placed ahead of (points, user_id) in RANK_ORDER."""
+    return or_(User.points > points, and_(User.points == points, User.id > user_id))
+
+
+def ranked_after(points, user_id):
+    return or_(User.points < points, and_(User.points == points, User.id < user_id))
+
+
+def rank_of(points):
+    """Competition rank (1, 1, 3, ...) for a points total: an index range count."""
+    return db.session.query(func.count(User.id)).filter(User.points > points).scalar() + 1
+
+
+def assign_ranks(users):
+    """Sets .rank on consecutive users from RANK_ORDER; tied users share a rank."""
+    if not users:
+        return users
+    first = users[0]
+    position = db.session.query(func.count(User.id)).filter(ranked_before(first.points, first.id)).scalar()
+    first.rank = rank_of(first.points)
+    for offset, (previous, user) in enumerate(zip(users, users[1:]), start=1):
+        user.rank = previous.rank if user.points == previous.points else position + offset + 1
+    return users
+
+
+def leaderboard_page(limit, cursor=None, start=None):
+    """A page of the ranking, from the top, from a 1-based position or after a cursor.
+
+    Returns (users, next_cursor) where the cursor is (points, id) of the last user.
+    """
+    query = User.query.order_by(*RANK_ORDER)
+    if cursor is not None:
+        query = query.filter(ranked_after(*cursor))
+    elif start is not None:
+        query = query.offset(start - 1)
+    users = query.limit(limit + 1).all()
+    next_cursor = None
+    if len(users) > limit:
+        users = users[:limit]
+        next_cursor = (users[-1].points, users[-1].id)
+    return assign_ranks(users), next_cursor
+
+
+def leaderboard_window(user, k):
+    """The user plus up to k neighbours on each side, ranked."""
+    above = (
+        User.query.filter(ranked_before(user.points, user.id))
+        .order_by(User.points.asc(), User.id.asc())
+        .limit(k)
+        .all()
+    )
+    below = (
+        User.query.filter(ranked_after(user.points, user.id))
+        .order_by(*RANK_ORDER)
+        .limit(k)
+        .all()
+    )
+    return assign_ranks(list(reversed(above)) + [user] + below)
+
+
+def period_start(period):
+    """First UTC day of the current calendar week (Monday) or month."""
+    today = datetime.utcnow().date()
+    if period == "week":
+        return today - timedelta(days=today.weekday())
+    return today.replace(day=1)
+
+
+def period_leaderboard(period, limit, start=1):
+    """Ranking by points earned this week/month, summed from the daily ledger rollup.
+
+    Returns (entries, has_more); entries are dicts shaped like LeaderboardUserSchema.
+    """
+    since = period_start(period)
+    total = func.sum(PointsDaily.points)
+    rows = (
+        db.session.query(User, total.label("period_points"))
+        .join(PointsDaily, PointsDaily.user_id == User.id)
+        .filter(PointsDaily.day >= since)
+        .group_by(User.id)
+        .order_by(total.desc(), User.id.desc())
+        .offset(start - 1)
+        .limit(limit + 1)
+        .all()
+    )
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    entries = []
+    for position, (user, points) in enumerate(rows, start=start):
+        if entries and entries[-1]["points"] == points:
+            rank = entries[-1]["rank"]
+        elif not entries:
+            # Number of users with a strictly better total
+            better = (
+                db.session.query(PointsDaily.user_id)
+                .filter(PointsDaily.day >= since)
+                .group_by(PointsDaily.user_id)
+                .having(func.sum(PointsDaily.points) > points)
+                .subquery()
+            )
+            rank = db.session.query(func.count()).select_from(better).scalar() + 1
+        else:
+            rank = position
+        entries.append({"rank": rank, "username": user.username, "points": points, "badges": user.badges})
+    return entries, has_more
@@ -0,0 +1,24 @@
+"""Reading append-only logs (accident_changes, revoked_tokens) by increasing id.
+
+PostgreSQL hands out sequence values at INSERT, not at COMMIT: a transaction
+holding id 10 can commit after id 11 has been read, and a reader that moved on
+to "after 11" would skip 10 for good. So readers stop at the first gap in the
+ids that is younger than LOG_SETTLE_SECONDS (the missing row may still be
+committing) and read from there again next time. Older gaps are rollbacks or
+pruned rows and are stepped over. On SQLite ids are handed out under the write
+lock, so this never holds anything back.
+"""
+from datetime import datetime, timedelta
+from flask import current_app
+
+
+def settled(rows, after):
+    """How many of `rows`, (id, created_at) pairs read as id > after in id order, are safe to consume."""
+    cutoff = datetime.utcnow() - timedelta(seconds=current_app.config.get("LOG_SETTLE_SECONDS", 5))
+    expected = after + 1
+    for count, (row_id, created_at) in enumerate(rows):
+        # The row after a gap was inserted after the missing one; while it is recent, so is the gap
+        if row_id != expected and (created_at is None or created_at > cutoff):
+            return count
+        expected = row_id + 1
+    return len(rows)
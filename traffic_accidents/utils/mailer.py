@@ -0,0 +1,221 @@
+import logging
+import os
+import smtplib
+import threading
+import time
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+from flask import current_app
+from sqlalchemy import select, update
+from db import db
+from models.outbox_email import OutboxEmail
+
+logger = logging.getLogger(__name__)
+
+# SMTP failures that won't go away by retrying the same message
+PERMANENT_ERRORS = (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused)
+
+
+def queue_email(recipient, subject, html):
+    """Adds an email to the outbox in the caller's transaction.
+
+    Nothing is sent until the transaction commits; call outbox.notify()
+    afterwards so the sender picks it up right away instead of on its next poll.
+    """
+    email = OutboxEmail(recipient=recipient, subject=subject, html=html)
+    db.session.add(email)
+    return email
+
+
+class SmtpConnection:
+    """A single SMTP session reused across messages until it idles out or breaks."""
+
+    def __init__(self):
+        self._smtp = None
+        self._last_used = 0.0
+
+    def send(self, message):
+        config = current_app.config
+        if self._smtp is not None and time.monotonic() - self._last_used > config.get("MAIL_IDLE_SECONDS", 30):
+            self.close()
+        try:
+            self._connect().send_message(message)
+        except smtplib.SMTPServerDisconnected:
+            # The server dropped an idle session: reconnect once and resend
+            self.close()
+            self._connect().send_message(message)
+        self._last_used = time.monotonic()
+
+    def _connect(self):
+        if self._smtp is None:
+            config = current_app.config
+            smtp = smtplib.SMTP(config["MAIL_SERVER"], config.get("MAIL_PORT", 587),
+                                timeout=config.get("MAIL_TIMEOUT_SECONDS", 10))
+            try:
+                if config.get("MAIL_USE_TLS"):
+                    smtp.starttls()
+                if config.get("MAIL_USERNAME") and config.get("MAIL_PASSWORD"):
+                    smtp.login(config["MAIL_USERNAME"], config["MAIL_PASSWORD"])
+            except Exception:
+                smtp.close()
+                raise
+            self._smtp = smtp
+        return self._smtp
+
+    def close(self):
+        if self._smtp is not None:
+            try:
+                self._smtp.quit()
+            except (smtplib.SMTPException, OSError):
+                self._smtp.close()
+            self._smtp = None
+
+
+class OutboxSender:
+    """Drains the outbox from one thread per process over a reused SMTP session.
+
+    Rows are claimed by pushing their `next_attempt_at` forward with a
+    conditional UPDATE, so several workers can drain the same table without
+    sending a message twice. Failures are retried with exponential backoff
+    (MAIL_RETRY_BASE_SECONDS doubling up to MAIL_RETRY_MAX_SECONDS) and marked
+    failed after MAIL_MAX_ATTEMPTS.
+    """
+
+    def __init__(self):
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._connection = SmtpConnection()
+
+    def notify(self):
+        """Wakes the sender after a commit that queued mail."""
+        app = current_app._get_current_object()
+        if app.config.get("BACKGROUND_INLINE", app.testing):
+            self.drain()
+            self._connection.close()
+            return
+        self.start(app)
+        self._wake.set()
+
+    def start(self, app):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._stop.clear()
+            self._connection = SmtpConnection()  # never share a socket across a fork
+            self._thread = threading.Thread(target=self._run, args=(app,), name="outbox-sender", daemon=True)
+            self._pid = os.getpid()
+            self._thread.start()
+
+    def stop(self, timeout=10):
+        """Stops the sender thread after the batch it is working on."""
+        with self._lock:
+            thread = self._thread if self._pid == os.getpid() else None
+            self._thread = None
+        if thread is not None:
+            self._stop.set()
+            self._wake.set()
+            thread.join(timeout)
+
+    def _run(self, app):
+        with app.app_context():
+            poll = app.config.get("MAIL_POLL_SECONDS", 30)
+            while not self._stop.is_set():
+                try:
+                    self.drain()
+                except Exception:
+                    logger.exception("Outbox drain failed")
+                    db.session.rollback()
+                finally:
+                    db.session.remove()
+                self._wake.wait(poll)
+                self._wake.clear()
+            self._connection.close()
+
+    def drain(self):
+        """Sends every due message, a batch at a time. Returns how many were sent."""
+        config = current_app.config
+        if not config.get("MAIL_SERVER"):
+            return 0
+        sent = 0
+        while not self._stop.is_set():
+            batch = self._claim(config.get("MAIL_BATCH_SIZE", 50))
+            if not batch:
+                break
+            sent += self._send_batch(batch)
+        return sent
+
+    def _claim(self, limit):
+        now = datetime.utcnow()
+        lease = now + timedelta(seconds=current_app.config.get("MAIL_LEASE_SECONDS", 120))
+        due = db.session.execute(
+            select(OutboxEmail.id, OutboxEmail.next_attempt_at)
+            .where(OutboxEmail.status == "pending", OutboxEmail.next_attempt_at <= now)
+            .order_by(OutboxEmail.next_attempt_at, OutboxEmail.id)
+            .limit(limit)
+        ).all()
+        claimed = []
+        for email_id, next_attempt_at in due:
+            result = db.session.execute(
+                update(OutboxEmail)
+                .where(OutboxEmail.id == email_id,
+                       OutboxEmail.status == "pending",
+                       OutboxEmail.next_attempt_at == next_attempt_at)
+                .values(next_attempt_at=lease)
+            )
+            if result.rowcount == 1:
+                claimed.append(email_id)
+        db.session.commit()
+        if not claimed:
+            return []
+        return db.session.scalars(select(OutboxEmail).where(OutboxEmail.id.in_(claimed)).order_by(OutboxEmail.id)).all()
+
+    def _send_batch(self, batch):
+        config = current_app.config
+        sender = config.get("MAIL_DEFAULT_SENDER") or config.get("MAIL_USERNAME")
+        sent = 0
+        connection_error = None
+        for email in batch:
+            if connection_error is None:
+                message = EmailMessage()
+                message["Subject"] = email.subject
+                message["From"] = sender
+                message["To"] = email.recipient
+                message.set_content(email.html, subtype="html")
+                try:
+                    self._connection.send(message)
+                except PERMANENT_ERRORS as e:
+                    self._connection.close()
+                    self._fail(email, e, permanent=True)
+                    continue
+                except (smtplib.SMTPException, OSError) as e:
+                    # The server is unreachable or unhappy; don't hammer it for the rest of the batch
+                    self._connection.close()
+                    connection_error = e
+                else:
+                    email.status = "sent"
+                    email.sent_at = datetime.utcnow()
+                    email.attempts += 1
+                    email.last_error = None
+                    sent += 1
+                    continue
+            self._fail(email, connection_error)
+        db.session.commit()
+        return sent
+
+    def _fail(self, email, error, permanent=False):
+        config = current_app.config
+        email.attempts += 1
+        email.last_error = str(error)[:500]
+        if permanent or email.attempts >= config.get("MAIL_MAX_ATTEMPTS", 8):
+            email.status = "failed"
+            logger.warning("Giving up on email %s to %s: %s", email.id, email.recipient, error)
+            return
+        delay = min(config.get("MAIL_RETRY_BASE_SECONDS", 30) * 2 ** (email.attempts - 1),
+                    config.get("MAIL_RETRY_MAX_SECONDS", 3600))
+        email.next_attempt_at = datetime.utcnow() + timedelta(seconds=delay)
+
+
+outbox = OutboxSender()
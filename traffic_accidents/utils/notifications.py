@@ -0,0 +1,44 @@
+from html import escape
+from flask import current_app
+from utils.mailer import queue_email
+
+
+def queue_admin_approval_email(user):
+    """Asks the site owner to approve a new admin. Needs user.id, so flush first."""
+    recipient = current_app.config.get("MAIL_ADMIN_ADDRESS") or current_app.config.get("MAIL_USERNAME")
+    if not recipient:
+        current_app.logger.warning("No MAIL_ADMIN_ADDRESS configured, admin %s needs manual approval", user.username)
+        return None
+
+    body = f"""
+    <html>
+        <body>
+            <h2 style="color: #d9534f;">New Admin Registration Request</h2>
+            <hr>
+            <p><strong>Username:</strong> {escape(user.username)}</p>
+            <p><strong>Full Name:</strong> {escape(user.full_name or 'N/A')}</p>
+            <p><strong>Department:</strong> {escape(user.department or 'N/A')}</p>
+            <p style="font-size: 1.2em;"><strong>SECRET USER ID:</strong> <code style="background: #f4f4f4; padding: 5px;">{user.id}</code></p>
+            <hr>
+            <p>To approve this admin, use the <b>/admin/process-admin</b> endpoint in Insomnia with the Secret ID above.</p>
+        </body>
+    </html>
+    """
+    return queue_email(recipient, f"🚨 URGENT: New Admin Approval Required ({user.username})", body)
+
+
+def queue_status_email(user, new_status):
+    """Tells an applicant their account was approved or rejected, if we have their email."""
+    if not user.email:
+        return None
+
+    body = f"""
+    <html>
+        <body>
+            <h2>Your account has been {new_status}</h2>
+            <p>Hello {escape(user.full_name or user.username)},</p>
+            <p>An administrator has <strong>{new_status}</strong> your account on the Traffic Accident platform.</p>
+        </body>
+    </html>
+    """
+    return queue_email(user.email, f"Your account has been {new_status}", body)
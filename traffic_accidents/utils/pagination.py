@@ -0,0 +1,58 @@
+import base64
+import json
+from datetime import datetime
+from sqlalchemy import and_, or_
+
+DEFAULT_PAGE_SIZE = 200
+MAX_PAGE_SIZE = 500
+
+
+def encode_token(values):
+    """Packs a list of JSON values into an opaque, URL-safe token."""
+    raw = json.dumps(values).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_token(token):
+    """Inverse of encode_token; raises ValueError on anything that isn't one of ours."""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded))
+    except Exception as e:
+        raise ValueError("Invalid cursor.") from e
+    if not isinstance(values, list):
+        raise ValueError("Invalid cursor.")
+    return values
+
+
+def encode_cursor(created_at, row_id):
+    """Opaque cursor pointing just after (created_at, id) in newest-first order."""
+    return encode_token([created_at.isoformat(), row_id])
+
+
+def decode_cursor(cursor):
+    """Returns (created_at, id); raises ValueError on anything that isn't one of ours."""
+    try:
+        created_at, row_id = decode_token(cursor)
+        return datetime.fromisoformat(created_at), row_id
+    except (TypeError, ValueError) as e:
+        raise ValueError("Invalid cursor.") from e
+
+
+def keyset_page(query, created_col, id_col, limit, cursor=None):
+    """Newest-first page keyed on (created_at, id), stable while rows are inserted.
+
+    Returns (rows, next_cursor); next_cursor is None on the last page.
+    """
+    if cursor is not None:
+        created_at, row_id = cursor
+        query = query.filter(or_(
+            created_col < created_at,
+            and_(created_col == created_at, id_col < row_id),
+        ))
+    rows = query.order_by(created_col.desc(), id_col.desc()).limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor(getattr(last, created_col.key), getattr(last, id_col.key))
@@ -0,0 +1,110 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+from flask import current_app
+from flask_smorest import abort
+from passlib.context import CryptContext
+from werkzeug.security import check_password_hash
+
+# Hashes written by werkzeug's generate_password_hash (the old /register-admin in
+# resources/user.py). Still accepted, and replaced with the current scheme on login.
+WERKZEUG_PREFIXES = ("pbkdf2:", "scrypt:")
+
+_executor = None
+_executor_pid = None
+_slots = None
+_lock = threading.Lock()
+
+
+@lru_cache(maxsize=None)
+def _context(rounds):
+    # min_rounds makes hashes below the configured cost count as outdated
+    return CryptContext(schemes=["pbkdf2_sha256"], pbkdf2_sha256__rounds=rounds, pbkdf2_sha256__min_rounds=rounds)
+
+
+@lru_cache(maxsize=None)
+def _dummy_hash(rounds):
+    """Stands in for the hash of a user that doesn't exist, at the current cost."""
+    return _context(rounds).hash("not-a-real-password")
+
+
+# --- Run inside the pool processes, so they take plain arguments only ---
+
+def _hash(password, rounds):
+    return _context(rounds).hash(password)
+
+
+def _verify(password, stored, rounds):
+    """Returns (valid, replacement hash or None)."""
+    context = _context(rounds)
+    if stored.startswith(WERKZEUG_PREFIXES):
+        if not check_password_hash(stored, password):
+            return False, None
+        return True, context.hash(password)
+    try:
+        return context.verify_and_update(password, stored)
+    except ValueError:  # not a hash we recognise
+        return False, None
+
+
+# --- Request side ---
+
+def _run(fn, *args):
+    """Runs a hashing call on the pool, bounded so a login burst queues instead of piling up."""
+    global _executor, _executor_pid, _slots
+    config = current_app.config
+    if config.get("PASSWORD_HASH_INLINE", current_app.testing):
+        return fn(*args)
+
+    with _lock:
+        if _executor is None or _executor_pid != os.getpid():
+            # spawn: pool processes must not inherit sockets or threads from a forked worker
+            _executor = ProcessPoolExecutor(
+                max_workers=config.get("PASSWORD_HASH_WORKERS", 2),
+                mp_context=multiprocessing.get_context("spawn")
+            )
+            _executor_pid = os.getpid()
+            _slots = threading.BoundedSemaphore(config.get("PASSWORD_HASH_MAX_PENDING", 16))
+        executor, slots = _executor, _slots
+
+    if not slots.acquire(timeout=config.get("PASSWORD_HASH_WAIT_SECONDS", 5)):
+        abort(503, message="Too many sign-ins right now, please try again.", headers={"Retry-After": "1"})
+    try:
+        return executor.submit(fn, *args).result()
+    except BrokenProcessPool:
+        # A pool process died (OOM killer etc.); start a fresh pool for the next call
+        with _lock:
+            if _executor is executor:
+                _executor = None
+        raise
+    finally:
+        slots.release()
+
+
+def hash_password(password):
+    return _run(_hash, password, current_app.config.get("PASSWORD_PBKDF2_ROUNDS", 29000))
+
+
+def verify_password(password, stored):
+    """Checks a password once. Returns (valid, new_hash) where new_hash is set when
+    the stored hash uses an outdated scheme or cost and should be replaced.
+
+    With no stored hash (unknown user) it still hashes once, against a dummy,
+    so response times don't tell which usernames exist.
+    """
+    rounds = current_app.config.get("PASSWORD_PBKDF2_ROUNDS", 29000)
+    if not stored:
+        _run(_verify, password, _dummy_hash(rounds), rounds)
+        return False, None
+    return _run(_verify, password, stored, rounds)
+
+
+def shutdown():
+    global _executor
+    with _lock:
+        executor, _executor = _executor, None
+    if executor is not None and _executor_pid == os.getpid():
+        executor.shutdown(wait=True)
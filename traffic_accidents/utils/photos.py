@@ -0,0 +1,134 @@
+import hashlib
+import io
+import os
+import tempfile
+from flask import current_app
+from PIL import Image, ImageOps, UnidentifiedImageError
+from db import db
+from models.accident import Accident
+from models.accident_change import AccidentChange
+
+UPLOAD_FOLDER = 'static/uploads'
+STAGING_FOLDER = os.path.join(UPLOAD_FOLDER, "incoming")
+ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
+CHUNK_SIZE = 64 * 1024
+
+for folder in (UPLOAD_FOLDER, STAGING_FOLDER):
+    if not os.path.exists(folder):
+        os.makedirs(folder)
+
+
+class PhotoTooLarge(Exception):
+    pass
+
+
+def allowed_file(filename):
+    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+
+
+def stage_upload(file):
+    """Streams an uploaded file to a staging temp file, enforcing MAX_PHOTO_BYTES."""
+    limit = current_app.config.get("MAX_PHOTO_BYTES", 8 * 1024 * 1024)
+    fd, path = tempfile.mkstemp(dir=STAGING_FOLDER, suffix=".upload")
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = file.stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > limit:
+                    raise PhotoTooLarge(f"Photo exceeds the {limit} byte limit.")
+                out.write(chunk)
+    except BaseException:
+        os.remove(path)
+        raise
+    return path
+
+
+def thumbnail_name(photo_name):
+    return photo_name.rsplit(".", 1)[0] + "_thumb.jpg"
+
+
+def write_once(name, data):
+    """Stores content-addressed bytes; a file that already exists is identical."""
+    path = os.path.join(UPLOAD_FOLDER, name)
+    if os.path.exists(path):
+        return
+    fd, tmp = tempfile.mkstemp(dir=UPLOAD_FOLDER, suffix=".tmp")
+    with os.fdopen(fd, "wb") as out:
+        out.write(data)
+    os.replace(tmp, path)
+
+
+def encode_photo(staged_path):
+    """Verifies the image and re-encodes it without metadata. Returns (name, bytes, thumb bytes)."""
+    with Image.open(staged_path) as probe:
+        probe.verify()  # raises on truncated / corrupt files
+    with Image.open(staged_path) as image:
+        if image.format not in ("JPEG", "PNG", "GIF"):
+            raise UnidentifiedImageError(f"Unsupported image format {image.format}")
+        # Bake the EXIF rotation into the pixels. Pillow only writes metadata
+        # that is passed to save() explicitly, so re-encoding drops EXIF/GPS.
+        clean = ImageOps.exif_transpose(image)
+        clean.info = {}
+
+        body = io.BytesIO()
+        if image.format == "JPEG":
+            clean.convert("RGB").save(body, "JPEG", quality=85, optimize=True)
+            ext = "jpg"
+        else:
+            if clean.mode not in ("RGB", "RGBA", "L", "LA"):
+                clean = clean.convert("RGBA")
+            clean.save(body, "PNG", optimize=True)
+            ext = "png"
+
+        size = current_app.config.get("PHOTO_THUMB_SIZE", 320)
+        thumb = clean.convert("RGB")
+        thumb.thumbnail((size, size))
+        thumb_body = io.BytesIO()
+        thumb.save(thumb_body, "JPEG", quality=80)
+
+    data = body.getvalue()
+    name = f"{hashlib.sha256(data).hexdigest()}.{ext}"
+    return name, data, thumb_body.getvalue()
+
+
+def process_photo(accident_id, staged_path):
+    """Background job: validate, strip, thumbnail and store a photo, then attach it."""
+    try:
+        try:
+            name, data, thumb = encode_photo(staged_path)
+        except (UnidentifiedImageError, OSError, SyntaxError, ValueError) as e:
+            current_app.logger.warning("Rejected photo for accident %s: %s", accident_id, e)
+            return None
+        write_once(name, data)
+        write_once(thumbnail_name(name), thumb)
+
+        updated = Accident.query.filter_by(id=accident_id).update(
+            {Accident.photo_url: name}, synchronize_session=False
+        )
+        if updated:
+            # Lets delta-sync clients pick up the new photo_url
+            db.session.add(AccidentChange(accident_id=accident_id, op="photo"))
+        db.session.commit()
+        if not updated:
+            delete_photo(name)  # report was deleted while we worked
+        return name
+    finally:
+        if os.path.exists(staged_path):
+            os.remove(staged_path)
+
+
+def delete_photo(name, exclude_accident_id=None):
+    """Removes a stored photo and its thumbnail unless another report still uses it."""
+    others = Accident.query.filter(Accident.photo_url == name)
+    if exclude_accident_id is not None:
+        others = others.filter(Accident.id != exclude_accident_id)
+    if others.first() is not None:
+        return
+    for filename in (name, thumbnail_name(name)):
+        path = os.path.join(UPLOAD_FOLDER, filename)
+        if os.path.exists(path):
+            os.remove(path)
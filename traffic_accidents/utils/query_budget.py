@@ -0,0 +1,39 @@
+import logging
+from functools import wraps
+from flask import current_app, g, has_request_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def count_query(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context():
+        g.query_count = g.get("query_count", 0) + 1
+
+
+def query_budget(max_queries):
+    """Caps the number of SQL statements an endpoint may issue, serialization included.
+
+    Goes above the blueprint decorators (@blp.etag, @blp.arguments,
+    @blp.response) so lazy loads triggered while dumping the response are
+    counted, but below @jwt_required(): the token loaders' queries (revocation
+    sync, user lookups) depend on cache state, not on the endpoint. Over
+    budget, the request fails when testing (or with QUERY_BUDGET_STRICT) and
+    logs a warning otherwise.
+    """
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = g.get("query_count", 0)
+            response = fn(*args, **kwargs)
+            used = g.get("query_count", 0) - start
+            if used > max_queries:
+                message = f"{fn.__qualname__} issued {used} queries (budget {max_queries})"
+                if current_app.config.get("QUERY_BUDGET_STRICT", current_app.testing):
+                    raise AssertionError(message)
+                logger.warning(message)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,58 @@
+import logging
+import re
+import sqlite3
+from functools import wraps
+from flask import current_app, g, has_request_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from db import db
+
+logger = logging.getLogger(__name__)
+
+# "SCAN accidents" is a full table scan; "SCAN accidents USING INDEX ..." walks an index
+FULL_SCAN = re.compile(r"^SCAN (\w+)(?: AS \w+)?$")
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def check_query_plan(conn, cursor, statement, parameters, context, executemany):
+    """Fails SELECTs issued while serving a request that scan a whole table.
+
+    On with QUERY_PLAN_CHECK (default: when testing). Uses SQLite's EXPLAIN
+    QUERY PLAN, so it is a no-op on other backends, where the planner picks
+    sequential scans on small tables anyway. Tables listed in
+    QUERY_PLAN_ALLOWED_SCANS, tables passed to expect_full_scan() and endpoints
+    marked @allow_full_scan are exempt.
+    """
+    if executemany or not has_request_context() or g.get("allow_full_scan"):
+        return
+    if not current_app.config.get("QUERY_PLAN_CHECK", current_app.testing):
+        return
+    if not isinstance(cursor.connection, sqlite3.Connection):
+        return
+    if not statement.lstrip().upper().startswith(("SELECT", "WITH")):
+        return
+
+    allowed = set(current_app.config.get("QUERY_PLAN_ALLOWED_SCANS", ())) | g.get("expected_scans", set())
+    rows = cursor.connection.execute(f"EXPLAIN QUERY PLAN {statement}", parameters or ()).fetchall()
+    for row in rows:
+        match = FULL_SCAN.match(row[-1])
+        if match and match.group(1) in db.metadata.tables and match.group(1) not in allowed:
+            message = f"Full table scan of {match.group(1)} in: {' '.join(statement.split())}"
+            if current_app.config.get("QUERY_PLAN_STRICT", current_app.testing):
+                raise AssertionError(message)
+            logger.warning(message)
+
+
+def expect_full_scan(table_name):
+    """Tells the check that scanning `table_name` is the right plan for this request."""
+    if has_request_context():
+        g.expected_scans = g.get("expected_scans", set()) | {table_name}
+
+
+def allow_full_scan(fn):
+    """Marks an endpoint whose full scan is intended (e.g. exporting a whole table)."""
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        g.allow_full_scan = True
+        return fn(*args, **kwargs)
+    return wrapper
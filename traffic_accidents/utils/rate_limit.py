@@ -0,0 +1,187 @@
+import logging
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+from flask import current_app, g
+
+logger = logging.getLogger(__name__)
+
+PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+LIMIT_FORMAT = re.compile(r"^\s*(\d+)\s*/\s*(\d*)\s*(second|minute|hour|day)s?\s*$")
+
+# Full buckets are dropped from memory once there are this many
+MAX_MEMORY_BUCKETS = 10000
+# How often (seconds) each process purges full buckets from the shared store
+SHARED_PURGE_SECONDS = 60
+
+
+def parse_limit(limit):
+    """'10/minute', '5/hour', '1/2 minutes' -> (capacity, refill rate in tokens per second)."""
+    match = LIMIT_FORMAT.match(limit)
+    if not match:
+        raise ValueError(f"Invalid rate limit: {limit!r}")
+    count = int(match.group(1))
+    period = int(match.group(2) or 1) * PERIODS[match.group(3)]
+    if count < 1:
+        raise ValueError(f"Invalid rate limit: {limit!r}")
+    return count, count / period
+
+
+class MemoryStore:
+    """Token buckets for this process only. Checked first, so a flood is turned
+    away without touching anything shared."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = {}  # key -> (tokens, updated, full_at)
+
+    def take(self, key, capacity, rate, now):
+        """Takes a token if there is one. Returns (allowed, tokens left)."""
+        with self._lock:
+            tokens, updated, _ = self._buckets.get(key, (capacity, now, now))
+            tokens = min(capacity, tokens + (now - updated) * rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[key] = (tokens, now, now + (capacity - tokens) / rate)
+            if len(self._buckets) > MAX_MEMORY_BUCKETS:
+                self._buckets = {k: v for k, v in self._buckets.items() if v[2] > now}
+            return allowed, tokens
+
+    def refund(self, key, capacity, rate, now):
+        with self._lock:
+            if key in self._buckets:
+                tokens, updated, _ = self._buckets[key]
+                tokens = min(capacity, tokens + (now - updated) * rate + 1)
+                self._buckets[key] = (tokens, now, now + (capacity - tokens) / rate)
+
+
+class SqliteStore:
+    """Token buckets shared by every worker on this host, in a small SQLite file.
+
+    One atomic upsert per check, on its own file and connection so it never
+    waits on the application database. Losing it on a crash only resets the limits.
+    """
+
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS buckets ("
+        "key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL, "
+        "full_at REAL NOT NULL, allowed INTEGER NOT NULL) WITHOUT ROWID"
+    )
+    # SET expressions all see the old row, so `allowed` and `tokens` agree
+    TAKE = (
+        "INSERT INTO buckets (key, tokens, updated, full_at, allowed) "
+        "VALUES (:key, :capacity - 1, :now, :now + 1 / :rate, 1) "
+        "ON CONFLICT (key) DO UPDATE SET "
+        "allowed = min(:capacity, tokens + (:now - updated) * :rate) >= 1, "
+        "tokens = min(:capacity, tokens + (:now - updated) * :rate)"
+        " - (min(:capacity, tokens + (:now - updated) * :rate) >= 1), "
+        "updated = :now, full_at = :now + :capacity / :rate "
+        "RETURNING allowed, tokens"
+    )
+    REFUND = (
+        "UPDATE buckets SET tokens = min(:capacity, tokens + (:now - updated) * :rate + 1), "
+        "updated = :now WHERE key = :key"
+    )
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._last_purge = 0.0
+
+    def _connection(self):
+        # sqlite3 connections stay with the thread (and process) that opened them
+        if getattr(self._local, "pid", None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=1, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")
+            conn.execute(self.SCHEMA)
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return self._local.conn
+
+    def take(self, key, capacity, rate, now):
+        conn = self._connection()
+        allowed, tokens = conn.execute(
+            self.TAKE, {"key": key, "capacity": capacity, "rate": rate, "now": now}
+        ).fetchone()
+        if now - self._last_purge >= SHARED_PURGE_SECONDS:
+            self._last_purge = now
+            conn.execute("DELETE FROM buckets WHERE full_at < ?", (now,))
+        return bool(allowed), tokens
+
+    def refund(self, key, capacity, rate, now):
+        self._connection().execute(self.REFUND, {"key": key, "capacity": capacity, "rate": rate, "now": now})
+
+
+class RateLimiter:
+    """Checks the in-process bucket, then the shared one when RATE_LIMIT_STORAGE
+    names a file ("memory" keeps limits per process)."""
+
+    def __init__(self):
+        self.memory = MemoryStore()
+        self._shared = None
+        self._lock = threading.Lock()
+
+    def shared(self):
+        storage = current_app.config.get("RATE_LIMIT_STORAGE", "memory")
+        if storage == "memory":
+            return None
+        if self._shared is None:
+            with self._lock:
+                if self._shared is None:
+                    path = os.path.join(current_app.instance_path, storage)
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    self._shared = SqliteStore(path)
+        return self._shared
+
+    def hit(self, key, capacity, rate):
+        """Spends a token from the key's bucket. Returns (allowed, tokens left)."""
+        now = time.time()
+        allowed, tokens = self.memory.take(key, capacity, rate, now)
+        if not allowed:
+            return False, tokens
+        shared = self.shared()
+        if shared is not None:
+            try:
+                allowed, tokens = shared.take(key, capacity, rate, now)
+            except sqlite3.Error as e:
+                # The per-process bucket already passed; don't fail requests over it
+                logger.warning("Shared rate limit store unavailable: %s", e)
+        return allowed, tokens
+
+    def refund(self, key, capacity, rate):
+        now = time.time()
+        self.memory.refund(key, capacity, rate, now)
+        shared = self.shared()
+        if shared is not None:
+            try:
+                shared.refund(key, capacity, rate, now)
+            except sqlite3.Error as e:
+                logger.warning("Shared rate limit store unavailable: %s", e)
+
+
+limiter = RateLimiter()
+
+
+def limit_headers(capacity, rate, tokens):
+    """X-RateLimit-* values for a bucket holding `tokens`; Reset is seconds until it is full."""
+    return {
+        "X-RateLimit-Limit": str(capacity),
+        "X-RateLimit-Remaining": str(max(0, math.floor(tokens))),
+        "X-RateLimit-Reset": str(math.ceil((capacity - tokens) / rate)),
+    }
+
+
+def retry_after(rate, tokens):
+    return str(max(1, math.ceil((1 - tokens) / rate)))
+
+
+def add_rate_limit_headers(response):
+    """after_request hook: reports the tightest bucket the request went through."""
+    headers = g.get("rate_limit_headers")
+    if headers and "X-RateLimit-Remaining" not in response.headers:
+        response.headers.update(headers)
+    return response
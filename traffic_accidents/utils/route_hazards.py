@@ -0,0 +1,204 @@
+import math
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import and_, or_
+from db import db
+from models.accident import Accident
+from models.route import Route
+from models.user import User
+from utils.geo import EARTH_RADIUS_M, cover_bbox, haversine_m, prefix_successor, split_antimeridian
+from utils.heatmap import accident_weight
+
+# The route is covered in stretches about this long (longer for long routes, so
+# there are at most MAX_CHUNKS), each by at most CHUNK_COVER_CELLS geohash cells
+CHUNK_M = 2000.0
+MAX_CHUNKS = 48
+CHUNK_COVER_CELLS = 16
+# Index ranges per statement; SQLite caps expression depth at 1000
+RANGES_PER_QUERY = 200
+
+
+def unwrap(points):
+    """Shifts longitudes by 360° where needed so no segment jumps across the antimeridian."""
+    unwrapped = [tuple(points[0])]
+    for lat, lng in points[1:]:
+        previous = unwrapped[-1][1]
+        lng += 360.0 * round((previous - lng) / 360.0)
+        unwrapped.append((lat, lng))
+    return unwrapped
+
+
+def buffered_bbox(min_lat, min_lng, max_lat, max_lng, buffer_m):
+    """The box grown by buffer_m on every side, in bbox_filter's (west, south, east, north) order."""
+    dlat = math.degrees(buffer_m / EARTH_RADIUS_M)
+    min_lat, max_lat = max(-90.0, min_lat - dlat), min(90.0, max_lat + dlat)
+    widest = max(abs(min_lat), abs(max_lat))
+    if widest >= 89.9:
+        return (-180.0, min_lat, 180.0, max_lat)
+    dlng = math.degrees(buffer_m / (EARTH_RADIUS_M * math.cos(math.radians(widest))))
+    min_lng, max_lng = min_lng - dlng, max_lng + dlng
+    if max_lng - min_lng >= 360.0:
+        return (-180.0, min_lat, 180.0, max_lat)
+    # Back into [-180, 180); a box crossing 180° ends up with west > east
+    return ((min_lng + 180.0) % 360.0 - 180.0, min_lat, (max_lng + 180.0) % 360.0 - 180.0, max_lat)
+
+
+def route_chunks(points, buffer_m):
+    """Splits the route into stretches and returns [(segment indexes, buffered bbox)].
+
+    Long segments are cut into pieces so a straight 20 km motorway segment
+    doesn't turn into one huge box.
+    """
+    lengths = [haversine_m(*points[i], *points[i + 1]) for i in range(len(points) - 1)]
+    chunk_m = max(CHUNK_M, sum(lengths) / MAX_CHUNKS)
+    chunks = []
+    segments, box, length = set(), None, 0.0
+
+    for index, segment_m in enumerate(lengths):
+        (lat1, lng1), (lat2, lng2) = points[index], points[index + 1]
+        pieces = max(1, math.ceil(segment_m / chunk_m))
+        for piece in range(pieces):
+            t0, t1 = piece / pieces, (piece + 1) / pieces
+            lats = (lat1 + (lat2 - lat1) * t0, lat1 + (lat2 - lat1) * t1)
+            lngs = (lng1 + (lng2 - lng1) * t0, lng1 + (lng2 - lng1) * t1)
+            piece_box = (min(lats), min(lngs), max(lats), max(lngs))
+            if box is None:
+                box = piece_box
+            else:
+                box = (min(box[0], piece_box[0]), min(box[1], piece_box[1]),
+                       max(box[2], piece_box[2]), max(box[3], piece_box[3]))
+            segments.add(index)
+            length += segment_m / pieces
+            if length >= chunk_m:
+                chunks.append((segments, buffered_bbox(*box, buffer_m)))
+                segments, box, length = set(), None, 0.0
+    if segments:
+        chunks.append((segments, buffered_bbox(*box, buffer_m)))
+    return chunks
+
+
+def merge_ranges(prefixes):
+    """Geohash prefixes -> as few [low, high) index ranges as cover them (high None = open)."""
+    ranges = sorted((prefix, prefix_successor(prefix)) for prefix in prefixes)
+    merged = []
+    for low, high in ranges:
+        if merged and (merged[-1][1] is None or low <= merged[-1][1]):
+            if merged[-1][1] is not None and (high is None or high > merged[-1][1]):
+                merged[-1] = (merged[-1][0], high)
+            continue
+        merged.append((low, high))
+    return merged
+
+
+def range_filter(column, low, high):
+    if high is None:
+        return column >= low
+    return and_(column >= low, column < high)
+
+
+def segment_distance_m(lat, lng, start, end):
+    """Distance from a point to a segment, on a plane fitted around the segment."""
+    (lat1, lng1), (lat2, lng2) = start, end
+    scale = math.cos(math.radians((lat1 + lat2) / 2))
+    # Metres relative to the segment start
+    k = math.radians(1) * EARTH_RADIUS_M
+    px, py = (lng - lng1) * scale * k, (lat - lat1) * k
+    dx, dy = (lng2 - lng1) * scale * k, (lat2 - lat1) * k
+    squared = dx * dx + dy * dy
+    t = 0.0 if squared == 0 else max(0.0, min(1.0, (px * dx + py * dy) / squared))
+    return math.hypot(px - t * dx, py - t * dy)
+
+
+def route_hazards(points, buffer_m):
+    """Active accidents and closed routes within buffer_m of the polyline, with a risk per segment.
+
+    The candidates come from the geohash index over a cover of the corridor,
+    chunk by chunk; only those are measured against the nearby segments. An
+    accident counts for the segment it is closest to, weighted like on the
+    heatmap. Reports merged into one incident count once, at the heaviest.
+    """
+    points = unwrap(points)
+    chunks = route_chunks(points, buffer_m)
+
+    # Which chunks each cell belongs to, to find the segments near a candidate
+    cells = {}
+    for chunk_index, (_, box) in enumerate(chunks):
+        for part in split_antimeridian(box):
+            for prefix in cover_bbox(part, CHUNK_COVER_CELLS):
+                cells.setdefault(prefix, set()).add(chunk_index)
+    prefix_lengths = sorted({len(prefix) for prefix in cells})
+
+    max_age = timedelta(hours=current_app.config.get("ROUTE_HAZARD_MAX_AGE_HOURS", 24))
+    columns = (
+        Accident.id, Accident.latitude, Accident.longitude, Accident.severity, Accident.status,
+        Accident.created_at, Accident.incident_id, Accident.geohash, User.role.label("role"),
+    )
+    ranges = merge_ranges(cells)
+    candidates = []
+    for start in range(0, len(ranges), RANGES_PER_QUERY):
+        batch = ranges[start:start + RANGES_PER_QUERY]
+        candidates.extend(
+            db.session.query(*columns)
+            .outerjoin(User, User.id == Accident.user_id)
+            .filter(
+                or_(*[range_filter(Accident.geohash, low, high) for low, high in batch]),
+                Accident.status != "false_report",
+                Accident.created_at >= datetime.utcnow() - max_age,
+            )
+            .all()
+        )
+
+    hits = []
+    for row in candidates:
+        nearby_segments = set()
+        for length in prefix_lengths:
+            for chunk_index in cells.get(row.geohash[:length], ()):
+                nearby_segments |= chunks[chunk_index][0]
+        best = None
+        for index in nearby_segments:
+            start, end = points[index], points[index + 1]
+            # The route may run past ±180°; bring the accident next to this segment
+            lng = row.longitude + 360.0 * round((start[1] - row.longitude) / 360.0)
+            distance = segment_distance_m(row.latitude, lng, start, end)
+            if best is None or distance < best[0]:
+                best = (distance, index)
+        if best is not None and best[0] <= buffer_m:
+            hits.append(dict(row._mapping, distance_m=round(best[0], 1), segment=best[1]))
+    hits.sort(key=lambda hit: (hit["segment"], hit["distance_m"]))
+
+    # One weight per crash: the heaviest report of each incident
+    weights = {}
+    for hit in hits:
+        key = hit["incident_id"] or hit["id"]
+        weight = accident_weight(hit["severity"], hit["status"])
+        if key not in weights or weight > weights[key][0]:
+            weights[key] = (weight, hit["segment"])
+
+    segments = [
+        {"index": index, "length_m": round(haversine_m(*points[index], *points[index + 1]), 1),
+         "risk": 0.0, "accident_count": 0}
+        for index in range(len(points) - 1)
+    ]
+    for hit in hits:
+        segments[hit["segment"]]["accident_count"] += 1
+    for weight, index in weights.values():
+        segments[index]["risk"] += weight
+    for segment in segments:
+        km = segment["length_m"] / 1000.0
+        segment["risk_per_km"] = round(segment["risk"] / km, 2) if km else 0.0
+
+    closed_routes = []
+    if hits:
+        closed_routes = (
+            Route.query.filter(Route.accident_id.in_([hit["id"] for hit in hits]), Route.is_closed.is_(True))
+            .order_by(Route.route_name, Route.id)
+            .all()
+        )
+    return {
+        "buffer_m": buffer_m,
+        "length_m": round(sum(segment["length_m"] for segment in segments), 1),
+        "risk": sum(weight for weight, _ in weights.values()),
+        "segments": segments,
+        "accidents": hits,
+        "closed_routes": closed_routes,
+    }
@@ -0,0 +1,55 @@
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from flask import current_app, g
+from db import db
+from models.user import User
+
+# What the JWT loaders need to know about a user, cheap enough to cache
+UserSnapshot = namedtuple("UserSnapshot", ["id", "role", "status", "banned_until"])
+
+MAX_CACHED_USERS = 10000
+
+_cache = OrderedDict()  # user id -> (snapshot, monotonic expiry)
+_lock = threading.Lock()
+
+
+def get_user_snapshot(user_id):
+    """(role, status, banned_until) of a user from a small TTL cache, or None if unknown.
+
+    Entries live USER_CACHE_TTL_SECONDS. Writes in this process invalidate
+    them at once; changes made by other workers show up once the TTL runs out.
+    """
+    user_id = str(user_id)
+    now = time.monotonic()
+    with _lock:
+        entry = _cache.get(user_id)
+        if entry and entry[1] > now:
+            _cache.move_to_end(user_id)
+            return entry[0]
+
+    row = db.session.query(User.id, User.role, User.status, User.banned_until).filter(User.id == user_id).first()
+    snapshot = UserSnapshot(*row) if row else None
+    if snapshot is not None:
+        ttl = current_app.config.get("USER_CACHE_TTL_SECONDS", 30)
+        with _lock:
+            _cache[user_id] = (snapshot, now + ttl)
+            _cache.move_to_end(user_id)
+            while len(_cache) > MAX_CACHED_USERS:
+                _cache.popitem(last=False)
+    return snapshot
+
+
+def invalidate_user(user_id):
+    """Drops a user from the cache after their role, status or ban changed."""
+    with _lock:
+        _cache.pop(str(user_id), None)
+
+
+def load_user(user_id):
+    """Full User row, fetched at most once per request."""
+    users = g.setdefault("loaded_users", {})
+    user_id = str(user_id)
+    if user_id not in users:
+        users[user_id] = db.session.get(User, user_id)
+    return users[user_id]
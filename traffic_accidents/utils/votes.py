@@ -0,0 +1,52 @@
+from sqlalchemy import delete, update
+from db import db, insert_ignore
+from models.comment import Comment
+from models.comment_vote import CommentVote
+from models.user import User
+from utils.gamification import add_points
+
+# What the comment author gets while a comment holds someone's upvote
+UPVOTE_POINTS = 5
+
+
+def cast_vote(comment, user_id, value):
+    """Sets `user_id`'s vote on `comment` to +1, -1 or 0 (no vote). Returns the new score.
+
+    Every step is a single conditional statement, so concurrent or repeated
+    clicks can't count twice: the vote row changes only if it differs, and the
+    score and author points move by exactly the difference. The author holds
+    UPVOTE_POINTS per upvote, handed back if the vote is withdrawn or flipped.
+    Runs in the caller's transaction.
+    """
+    key = (CommentVote.comment_id == comment.id, CommentVote.user_id == user_id)
+    if value == 0:
+        old = db.session.execute(
+            delete(CommentVote).where(*key).returning(CommentVote.value)
+            .execution_options(synchronize_session=False)
+        ).scalar() or 0
+    elif insert_ignore(CommentVote, {"comment_id": comment.id, "user_id": user_id, "value": value}):
+        old = 0
+    else:
+        # Votes are +1 or -1, so a row we had to change held the opposite
+        flipped = db.session.execute(
+            update(CommentVote).where(*key, CommentVote.value != value)
+            .values(value=value).execution_options(synchronize_session=False)
+        ).rowcount
+        old = -value if flipped else value
+
+    delta = value - old
+    if delta == 0:
+        return comment.score
+    score = db.session.execute(
+        update(Comment).where(Comment.id == comment.id)
+        .values(score=Comment.score + delta).returning(Comment.score)
+        .execution_options(synchronize_session=False)
+    ).scalar()
+
+    points = UPVOTE_POINTS * ((value == 1) - (old == 1))
+    if points:
+        author = db.session.get(User, comment.user_id)
+        if author:
+            reason = "Comment Upvoted" if points > 0 else "Comment Upvote Withdrawn"
+            add_points(author, points, reason)
+    return score
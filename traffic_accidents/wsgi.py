@@ -0,0 +1,6 @@
+"""Production entry point: gunicorn -c gunicorn.conf.py wsgi:app"""
+import os
+from app import create_app, SERVER_MANAGED
+
+# preload_app imports this in the master: no schema setup or threads before the fork
+app = create_app(os.environ.get("APP_ENV", "production"), SERVER_MANAGED)